@@ -33,15 +33,22 @@ class ApiService {
   }
 
   /// Calls /live_translate — translates slang into polite senior-friendly text.
+  /// Passing [userGeneration] lets the server prefetch analogies for the highlighted words.
   static Future<Map<String, dynamic>> liveTranslate({
     required String text,
     required String userVibe,
     required String preferredLanguage,
+    String? userGeneration,
   }) async {
     final response = await http.post(
       Uri.parse('$baseUrl/live_translate'),
       headers: {'Content-Type': 'application/json'},
-      body: jsonEncode({'text': text, 'user_vibe': userVibe}),
+      body: jsonEncode({
+        'text': text,
+        'user_vibe': userVibe,
+        'preferred_language': preferredLanguage,
+        if (userGeneration != null) 'user_generation': userGeneration,
+      }),
     );
 
     if (response.statusCode == 200) {
@@ -95,12 +102,16 @@ class ApiService {
     required String filePath,
     required String userVibe,
     required String preferredLanguage,
+    String? userGeneration,
   }) async {
     final uri = Uri.parse('$baseUrl/live_translate_audio');
     final request = http.MultipartRequest('POST', uri);
 
     request.fields['user_vibe'] = userVibe;
     request.fields['preferred_language'] = preferredLanguage;
+    if (userGeneration != null) {
+      request.fields['user_generation'] = userGeneration;
+    }
 
     // Explicitly tell the server this is an m4a audio file
     request.files.add(
@@ -189,6 +189,7 @@ class _TranslateTabState extends State<TranslateTab>
         text: text,
         userVibe: UserProfile.dialect ?? 'Standard English',
         preferredLanguage: _preferredLanguage,
+        userGeneration: UserProfile.generation ?? 'Boomer',
       ).timeout(const Duration(seconds: 10));
 
       if (!mounted) return;
@@ -262,6 +263,7 @@ class _TranslateTabState extends State<TranslateTab>
             filePath: path,
             userVibe: UserProfile.dialect ?? 'Standard English',
             preferredLanguage: _preferredLanguage,
+            userGeneration: UserProfile.generation ?? 'Boomer',
           );
 
           if (!mounted) return;
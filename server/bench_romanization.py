@@ -0,0 +1,82 @@
+"""
+Micro-benchmark for the Hokkien romanization engine (core/utils.py).
+
+Builds a large hanzi corpus (phrases from the cached analogy cards plus
+random phrases drawn from common characters) and reports throughput for:
+  - cold:   every phrase converted with empty memo tables
+  - warm:   the same corpus again, served from the memo tables
+  - bulk:   romanize_many() over the whole corpus at once
+
+Usage:
+    python bench_romanization.py [--phrases 50000] [--distinct 2000] [--seed 7]
+"""
+import os
+import json
+import time
+import random
+import argparse
+
+from core.client import CACHE_DIR
+from core.utils import get_hokkien_romanization, romanize_many, _penang_syllable
+
+COMMON_HANZI = "我你伊阮恁咱人物事食飯茶水酒好歹大細紅烏白新舊來去行走看講聽買賣做工厝學校錢時間日月年今明昨天地山海風雨火家國話字書冊車船路街市店頭手腳目耳嘴心"
+
+def cached_hanzi():
+    """Hokkien hanzi already present on cached analogy cards."""
+    phrases = []
+    if not os.path.isdir(CACHE_DIR):
+        return phrases
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(CACHE_DIR, name), 'r', encoding='utf-8') as f:
+                card = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for entry in card.get("results", []) if isinstance(card, dict) else []:
+            hanzi = entry.get("translations", {}).get("hokkien", {}).get("hanzi") if isinstance(entry, dict) else None
+            if hanzi:
+                phrases.append(hanzi)
+    return phrases
+
+def build_corpus(total, distinct, rng):
+    chars = [c for c in COMMON_HANZI if '一' <= c <= '鿿']
+    vocabulary = cached_hanzi()
+    while len(vocabulary) < distinct:
+        vocabulary.append("".join(rng.choice(chars) for _ in range(rng.randint(1, 4))))
+    # Skewed draw: a few phrases are very common, like real traffic
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return rng.choices(vocabulary, weights=weights, k=total)
+
+def clear_memo():
+    get_hokkien_romanization.cache_clear()
+    _penang_syllable.cache_clear()
+
+def timed(label, corpus, fn):
+    start = time.perf_counter()
+    fn(corpus)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<6} {len(corpus) / elapsed:>12,.0f} phrases/s  ({elapsed * 1000:,.1f} ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Hanzi -> Penang romanization throughput.")
+    parser.add_argument("--phrases", type=int, default=50000, help="corpus size (default: 50000)")
+    parser.add_argument("--distinct", type=int, default=2000, help="distinct phrases in the corpus (default: 2000)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.phrases, args.distinct, random.Random(args.seed))
+    print(f"📊 Romanization benchmark: {len(corpus):,} phrases, {len(set(corpus)):,} distinct")
+
+    clear_memo()
+    timed("cold", corpus, lambda c: [get_hokkien_romanization(h) for h in c])
+    timed("warm", corpus, lambda c: [get_hokkien_romanization(h) for h in c])
+    clear_memo()
+    timed("bulk", corpus, romanize_many)
+
+    info = get_hokkien_romanization.cache_info()
+    print(f"  phrase memo: {info.currsize}/{info.maxsize} entries | syllable memo: {_penang_syllable.cache_info().currsize} entries")
+
+if __name__ == "__main__":
+    main()
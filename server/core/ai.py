@@ -1,18 +1,22 @@
-import json
 import os
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
-from core.client import client
+import json
+import logging
+from core.client import generate_content, generate_content_stream, unpack_batch, types
+from core.resilience import Fallback
+from core.scheduler import Overloaded
+
+logger = logging.getLogger(__name__)
 
-# Load API Key
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
+# Model behind every analogy prompt
+ANALOGY_MODEL = "gemini-3-flash-preview"
 
-if not API_KEY:
-    raise ValueError("❌ API Key missing! Check .env file.")
+# TTS synthesis settings (also part of the audio store's content key)
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_VOICE = "Aoede"
 
-client = genai.Client(api_key=API_KEY)
+# Per-call deadlines in seconds (0 = none). Past it, generate_analogy() serves its fallback
+ANALOGY_DEADLINE = float(os.getenv("ANALOGY_DEADLINE", "15"))
+ANALOGY_AUDIO_DEADLINE = float(os.getenv("ANALOGY_AUDIO_DEADLINE", "25"))
 
 LANG_MAP = {
     "en": "English",
@@ -20,6 +24,10 @@ LANG_MAP = {
     "ms": "Malay (Bahasa Melayu)"
 }
 
+# The personas the app offers (lib/profile_tab.dart), for offline jobs like prewarm_cache.py
+GENERATIONS = ["Boomer", "Gen X", "Gen Y", "Gen Z", "Gen Alpha"]
+VIBES = ["Standard English", "Manglish", "Penang Hokkien", "Cantonese", "Malay"]
+
 # --- GENBRIDGE ANALOGY ENGINE ---
 
 ANALOGY_PROMPT = """
@@ -48,6 +56,68 @@ Return a strict JSON object with this exact schema:
 }}
 """
 
+# Persona stage only: the persona-independent "core meaning" (slang_detected,
+# literal_translation, ambiguity_warning) is already known and cached per
+# slang + language, so only the analogies are generated for this generation / vibe.
+PERSONA_ANALOGY_PROMPT = """
+You are GenBridge, a master cultural translator. Your personality is a mix of an Oxford Dictionary (for literal meanings), Urban Dictionary (for slang), and a Meme Historian (for internet brainrot).
+
+The user belongs to the {user_generation} generation and their cultural background / dialect vibe is {user_vibe}. 
+Preferred Output Language: "{preferred_language}"
+
+The slang has already been decoded (JSON):
+{core}
+
+### 🧠 TASK:
+1. Explain this meaning through analogies only. Do NOT re-analyze or re-translate the slang.
+2. BE DIRECT: Be raw, accurate, and uncensored when explaining the true context of internet culture.
+3. OUTPUT LANGUAGE (CRITICAL): The analogies MUST be written fluently in {preferred_language}.
+
+Return a strict JSON object with this exact schema:
+{{
+  "analogies": [
+    "A highly relatable cultural analogy tailored specifically to the '{user_vibe}' vibe, written in {preferred_language}.",
+    "A relatable pop-culture or historical analogy tailored specifically for a {user_generation}, written in {preferred_language}."
+  ]
+}}
+"""
+
+# Fields of an analogy card that don't depend on the user's generation or vibe
+CORE_FIELDS = ("slang_detected", "literal_translation", "ambiguity_warning")
+
+# Batched variant: one shared preamble, many inputs. Each result echoes its "id".
+BATCH_ANALOGY_PROMPT = """
+You are GenBridge, a master cultural translator. Your personality is a mix of an Oxford Dictionary (for literal meanings), Urban Dictionary (for slang), and a Meme Historian (for internet brainrot).
+
+The user belongs to the {user_generation} generation and their cultural background / dialect vibe is {user_vibe}. 
+Preferred Output Language: "{preferred_language}"
+
+Inputs (JSON array; analyze EACH one independently):
+{inputs}
+
+### 🧠 ANALYSIS LOGIC (apply to every input):
+1. CHECK FOR AMBIGUITY (Crucial): Does this word have a standard meaning AND a street/meme meaning? (e.g., "Mata" = Eye OR Police; "Payung" = Umbrella OR Treat; "Ayam" = Chicken OR Noob/Prostitute).
+2. DECODE THE LORE: Identify if it is Gen Z (Cap, Bet, Drip, Sus, Mid), Gen Alpha Brainrot (Skibidi, Gyatt, Rizz, Fanum Tax, Mewing), or Numeric Slang (520, 6 7, 26889).
+3. BE DIRECT: Be raw, accurate, and uncensored when explaining the true context of internet culture.
+4. OUTPUT LANGUAGE (CRITICAL): The values for `literal_translation`, `analogies`, and `ambiguity_warning` MUST be translated and written fluently in {preferred_language}. Keep the `slang_detected` in its original slang form.
+
+Return a strict JSON object with exactly one entry in "results" per input, using this exact schema:
+{{
+  "results": [
+    {{
+      "id": "The id of the input this entry answers",
+      "slang_detected": "The core slang word or phrase normalized",
+      "literal_translation": "Direct, simple meaning written in {preferred_language}",
+      "analogies": [
+        "A highly relatable cultural analogy tailored specifically to the '{user_vibe}' vibe, written in {preferred_language}.",
+        "A relatable pop-culture or historical analogy tailored specifically for a {user_generation}, written in {preferred_language}."
+      ],
+      "ambiguity_warning": "If the word has conflicting meanings, explain briefly in {preferred_language}. Otherwise, output null."
+    }}
+  ]
+}}
+"""
+
 AUDIO_ANALOGY_PROMPT = """
 You are GenBridge, a master cultural translator. 
 The user belongs to the {user_generation} generation and their cultural background / dialect vibe is {user_vibe}. 
@@ -78,7 +148,7 @@ async def generate_analogy(slang_text: str, user_generation: str, user_vibe: str
     based on the user's generation and dialect/vibe.
     """
     actual_language = LANG_MAP.get(preferred_language, "English")
-    print(f"🧠 GenBridge Analogy: '{slang_text}' | Gen: {user_generation} | Vibe: {user_vibe} | Lang: {actual_language}")
+    logger.info("🧠 GenBridge Analogy: '%s' | Gen: %s | Vibe: %s | Lang: %s", slang_text, user_generation, user_vibe, actual_language)
     try:
         prompt = ANALOGY_PROMPT.format(
             slang_text=slang_text,
@@ -87,30 +157,154 @@ async def generate_analogy(slang_text: str, user_generation: str, user_vibe: str
             preferred_language=actual_language,
         )
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
+        response = await generate_content(
+            model=ANALOGY_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
                 temperature=0.7,
             ),
+            endpoint="generate_analogy",
+            deadline=ANALOGY_DEADLINE,
         )
         return json.loads(response.text)
+    except Overloaded:
+        raise  # Shed by the scheduler: the route answers 503 instead of a fallback
     except Exception as e:
-        print(f"❌ GenBridge Error: {e}")
-        return {
+        logger.error("❌ GenBridge Error: %s", e)
+        # Served to the user, but never cached (see FileSystemCache.set)
+        return Fallback({
             "slang_detected": slang_text,
             "literal_translation": "Error generating translation",
             "analogies": [],
             "ambiguity_warning": str(e),
-        }
+        })
+
+def core_meaning(card):
+    """The persona-independent part of an analogy card (see CORE_FIELDS)."""
+    return {field: card.get(field) for field in CORE_FIELDS}
+
+async def generate_persona_analogy(core: dict, user_generation: str, user_vibe: str, preferred_language: str):
+    """
+    Persona stage of generate_analogy(): reuses a cached `core` meaning and
+    only asks the model for the generation / vibe specific analogies, a
+    much shorter prompt and reply. Returns the full card.
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+    logger.info("🧠 GenBridge Persona Analogy: '%s' | Gen: %s | Vibe: %s | Lang: %s", core.get("slang_detected"), user_generation, user_vibe, actual_language)
+    try:
+        prompt = PERSONA_ANALOGY_PROMPT.format(
+            core=json.dumps(core, ensure_ascii=False),
+            user_generation=user_generation,
+            user_vibe=user_vibe,
+            preferred_language=actual_language,
+        )
+
+        response = await generate_content(
+            model=ANALOGY_MODEL,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                temperature=0.7,
+            ),
+            endpoint="generate_analogy",
+            deadline=ANALOGY_DEADLINE,
+        )
+        return {**core, "analogies": json.loads(response.text).get("analogies", [])}
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error("❌ GenBridge Persona Error: %s", e)
+        # Served to the user, but never cached (see FileSystemCache.set)
+        return Fallback({**core, "analogies": [], "ambiguity_warning": str(e)})
+
+async def stream_analogy(slang_text: str, user_generation: str, user_vibe: str, preferred_language: str, slot=None):
+    """
+    Streaming variant of generate_analogy(): yields the raw JSON text in
+    chunks as Gemini produces it. Errors propagate to the caller. `slot`:
+    a scheduler slot the caller already holds (see generate_content_stream).
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+    logger.info("🧠 GenBridge Analogy (stream): '%s' | Gen: %s | Vibe: %s | Lang: %s", slang_text, user_generation, user_vibe, actual_language)
+    prompt = ANALOGY_PROMPT.format(
+        slang_text=slang_text,
+        user_generation=user_generation,
+        user_vibe=user_vibe,
+        preferred_language=actual_language,
+    )
+    async for chunk in generate_content_stream(
+        model=ANALOGY_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.7,
+        ),
+        endpoint="generate_analogy",
+        slot=slot,
+    ):
+        if chunk.text:
+            yield chunk.text
+
+async def stream_persona_analogy(core: dict, user_generation: str, user_vibe: str, preferred_language: str, slot=None):
+    """
+    Streaming variant of generate_persona_analogy(): yields the raw JSON text
+    of `{"analogies": [...]}` as Gemini produces it. Errors propagate.
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+    logger.info("🧠 GenBridge Persona Analogy (stream): '%s' | Gen: %s | Vibe: %s | Lang: %s", core.get("slang_detected"), user_generation, user_vibe, actual_language)
+    prompt = PERSONA_ANALOGY_PROMPT.format(
+        core=json.dumps(core, ensure_ascii=False),
+        user_generation=user_generation,
+        user_vibe=user_vibe,
+        preferred_language=actual_language,
+    )
+    async for chunk in generate_content_stream(
+        model=ANALOGY_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.7,
+        ),
+        endpoint="generate_analogy",
+        slot=slot,
+    ):
+        if chunk.text:
+            yield chunk.text
+
+async def generate_analogy_batch(slang_texts: list, user_generation: str, user_vibe: str, preferred_language: str):
+    """
+    Generates analogies for several slang terms in ONE Gemini call.
+    All terms share the same generation / vibe / language.
+
+    Returns:
+        list: one result dict per input, in input order (None where the model
+        skipped an input). Errors propagate so the caller can fail the chunk.
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+    logger.info("🧠 GenBridge Analogy Batch: %s terms | Gen: %s | Vibe: %s | Lang: %s", len(slang_texts), user_generation, user_vibe, actual_language)
+    prompt = BATCH_ANALOGY_PROMPT.format(
+        inputs=json.dumps([{"id": i, "input": text} for i, text in enumerate(slang_texts)], ensure_ascii=False),
+        user_generation=user_generation,
+        user_vibe=user_vibe,
+        preferred_language=actual_language,
+    )
+    response = await generate_content(
+        model=ANALOGY_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.7,
+        ),
+        endpoint="generate_analogy_batch",
+    )
+    return unpack_batch(json.loads(response.text), len(slang_texts))
 
 async def generate_analogy_audio(audio_bytes: bytes, mime_type: str, user_generation: str, user_vibe: str, preferred_language: str):
     """
     Takes raw audio of a slang word and directly generates culturally tailored analogies in one shot.
     """
     actual_language = LANG_MAP.get(preferred_language, "English")
-    print(f"🎙️ Audio Analogy | Gen: {user_generation} | Vibe: {user_vibe} | Lang: {actual_language} | Size: {len(audio_bytes)} bytes")
+    logger.info("🎙️ Audio Analogy | Gen: %s | Vibe: %s | Lang: %s | Size: %s bytes", user_generation, user_vibe, actual_language, len(audio_bytes))
     try:
         prompt = AUDIO_ANALOGY_PROMPT.format(
             user_generation=user_generation,
@@ -118,8 +312,8 @@ async def generate_analogy_audio(audio_bytes: bytes, mime_type: str, user_genera
             preferred_language=actual_language,
         )
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
+        response = await generate_content(
+            model=ANALOGY_MODEL,
             contents=[
                 types.Part.from_bytes(data=audio_bytes, mime_type=mime_type),
                 prompt
@@ -128,16 +322,18 @@ async def generate_analogy_audio(audio_bytes: bytes, mime_type: str, user_genera
                 response_mime_type="application/json",
                 temperature=0.6,
             ),
+            endpoint="generate_analogy_audio",
+            deadline=ANALOGY_AUDIO_DEADLINE,
         )
         return json.loads(response.text)
     except Exception as e:
-        print(f"❌ Audio Analogy Error: {e}")
+        logger.error("❌ Audio Analogy Error: %s", e)
         raise e
 
 async def generate_gemini_tts(text: str, language: str):
     """Uses Gemini's native audio modality to generate TTS."""
     
-    print(f"🔊 Generating TTS | Auto-Detecting Lang | Text: {text[:30]}...")
+    logger.info("🔊 Generating TTS | Auto-Detecting Lang | Text: %s...", text[:30])
     
     try:
         # THE POLYGLOT DICTATION PROMPT:
@@ -150,15 +346,15 @@ async def generate_gemini_tts(text: str, language: str):
             f"Text to dictate: {text}"
         )
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-preview-tts",
+        response = await generate_content(
+            model=TTS_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_modalities=["AUDIO"],
                 speech_config=types.SpeechConfig(
                     voice_config=types.VoiceConfig(
                         prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name="Aoede" 
+                            voice_name=TTS_VOICE
                         )
                     )
                 ),
@@ -181,11 +377,12 @@ async def generate_gemini_tts(text: str, language: str):
                     ),
                 ]
             ),
+            endpoint="tts",
         )
         
         if not response.candidates or not response.candidates[0].content:
             finish_reason = response.candidates[0].finish_reason if response.candidates else "UNKNOWN"
-            print(f"⚠️ TTS Blocked! Finish Reason: {finish_reason}")
+            logger.warning("⚠️ TTS Blocked! Finish Reason: %s", finish_reason)
             raise ValueError(f"Audio blocked by safety filters (Reason: {finish_reason}).")
             
         for part in response.candidates[0].content.parts:
@@ -193,9 +390,9 @@ async def generate_gemini_tts(text: str, language: str):
                 return part.inline_data.data, part.inline_data.mime_type
                 
         fallback_text = response.text if response.text else "Unknown Output"
-        print(f"⚠️ TTS failed. Model returned text instead: {fallback_text}")
+        logger.warning("⚠️ TTS failed. Model returned text instead: %s", fallback_text)
         raise ValueError("Model failed to return audio bytes.")
         
     except Exception as e:
-        print(f"❌ TTS Error: {e}")
+        logger.error("❌ TTS Error: %s", e)
         raise e
\ No newline at end of file
@@ -0,0 +1,109 @@
+import io
+import os
+import sys
+import wave
+from array import array
+from operator import add
+
+# Peak level (of 32767) a 10ms window must reach to count as sound
+AUDIO_SILENCE_THRESHOLD = int(os.getenv("AUDIO_SILENCE_THRESHOLD", "500"))
+# Silence kept on each side of the speech, so words aren't clipped
+AUDIO_SILENCE_PAD_MS = int(os.getenv("AUDIO_SILENCE_PAD_MS", "150"))
+
+WAV_MIME_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+
+_WINDOW_MS = 10
+# 8-bit WAV bytes (0..255, 128 = silence) as the signed high byte of a 16-bit sample
+_UNSIGNED_TO_SIGNED = bytes((b + 128) % 256 for b in range(256))
+
+
+def is_wav(audio_bytes, mime_type):
+    return (mime_type or "").split(";")[0].strip().lower() in WAV_MIME_TYPES or (
+        audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE"
+    )
+
+
+def prepare_audio(audio_bytes, mime_type):
+    """
+    Shrinks a PCM WAV clip before it goes to the model: trims leading and
+    trailing silence and downmixes to 16-bit mono. The sample rate is kept:
+    Gemini resamples with a proper low-pass filter, which a plain decimator
+    here would not. Other formats (m4a, mp3, ...) and anything that can't be
+    parsed pass through unchanged, as does a result that wouldn't be smaller.
+
+    Returns:
+        (audio_bytes, mime_type)
+    """
+    if not is_wav(audio_bytes, mime_type):
+        return audio_bytes, mime_type
+    try:
+        samples, rate = _read_mono(audio_bytes)
+    except (wave.Error, EOFError, ValueError):
+        return audio_bytes, mime_type
+
+    samples = _trim_silence(samples, rate)
+    prepared = _write_wav(samples, rate)
+    if len(prepared) >= len(audio_bytes):
+        return audio_bytes, mime_type
+    return prepared, "audio/wav"
+
+
+def _read_mono(audio_bytes):
+    """Decodes PCM WAV into 16-bit mono samples. Returns (array('h'), rate)."""
+    with wave.open(io.BytesIO(audio_bytes), 'rb') as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        frames = w.readframes(w.getnframes())
+
+    if width not in (1, 2, 4):
+        raise ValueError(f"Unsupported sample width: {width}")
+    # Keep the top byte(s) of each little-endian sample as a 16-bit one, via slices rather than a loop
+    count = len(frames) // width
+    if width == 2:
+        pcm = frames[:count * 2]
+    else:
+        pcm = bytearray(count * 2)
+        if width == 1:
+            pcm[1::2] = frames[:count].translate(_UNSIGNED_TO_SIGNED)  # 8-bit WAV is unsigned
+        else:
+            pcm[0::2] = frames[2:count * 4:4]
+            pcm[1::2] = frames[3:count * 4:4]
+    samples = array('h', pcm)
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        tracks = [samples[c:usable:channels] for c in range(channels)]
+        if channels == 2:
+            samples = array('h', (s >> 1 for s in map(add, *tracks)))
+        else:
+            samples = array('h', (sum(frame) // channels for frame in zip(*tracks)))
+    return samples, rate
+
+
+def _trim_silence(samples, rate):
+    window = max(1, rate * _WINDOW_MS // 1000)
+    loud = [
+        start for start in range(0, len(samples), window)
+        if max(samples[start:start + window]) >= AUDIO_SILENCE_THRESHOLD
+        or min(samples[start:start + window]) <= -AUDIO_SILENCE_THRESHOLD
+    ]
+    if not loud:
+        return samples  # All quiet: let the model decide, don't send an empty clip
+    pad = rate * AUDIO_SILENCE_PAD_MS // 1000
+    start = max(0, loud[0] - pad)
+    end = min(len(samples), loud[-1] + window + pad)
+    return samples[start:end]
+
+
+def _write_wav(samples, rate):
+    if sys.byteorder == "big":
+        samples = array('h', samples)
+        samples.byteswap()
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return buffer.getvalue()
@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from core.client import CACHE_DIR
+
+# Synthesized speech lives in its own sub-directory of the cache
+TTS_STORE_DIR = os.path.join(CACHE_DIR, "tts")
+TTS_STORE_MAX_BYTES = int(os.getenv("TTS_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Blobs served within this window are never evicted, so an in-progress
+# download can't lose its file mid-response
+_EVICTION_GRACE_SECONDS = 60
+
+
+class AudioBlobStore:
+    """
+    Content-addressed store for synthesized audio.
+
+    Each blob is named by the SHA-256 of everything that determines its
+    bytes (model + voice + text), so the name doubles as a strong ETag.
+    `<digest>.bin` holds the audio and `<digest>.json` its MIME type.
+    Once the store passes `max_bytes`, the least recently served blobs are
+    evicted (every hit refreshes the blob's mtime).
+    """
+
+    def __init__(self, directory=TTS_STORE_DIR, max_bytes=TTS_STORE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, _, size in self._blobs())
+
+    @staticmethod
+    def key_for(text, voice, model):
+        return hashlib.sha256(f"{model}|{voice}|{text}".encode('utf-8')).hexdigest()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.bin")
+
+    def _meta_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, digest):
+        """Returns (path, mime_type, size) for a stored blob, or None."""
+        blob_path = self._blob_path(digest)
+        try:
+            size = os.path.getsize(blob_path)
+            with open(self._meta_path(digest), 'r', encoding='utf-8') as f:
+                mime_type = json.load(f)["mime_type"]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(blob_path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        return blob_path, mime_type, size
+
+    def put(self, digest, data, mime_type):
+        """Stores a blob atomically (metadata first, so a visible blob always has it)."""
+        self._write_atomic(self._meta_path(digest), json.dumps({"mime_type": mime_type}).encode('utf-8'))
+        self._write_atomic(self._blob_path(digest), data)
+        self.total_bytes += len(data)
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _write_atomic(self, path, payload):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _blobs(self):
+        """(mtime, digest, size) for every stored blob."""
+        with os.scandir(self.directory) as it:
+            return [
+                (e.stat().st_mtime, e.name[:-len(".bin")], e.stat().st_size)
+                for e in it if e.is_file() and e.name.endswith(".bin")
+            ]
+
+    def _evict(self):
+        """Drops least recently served blobs until the store is under 90% of its cap."""
+        blobs = sorted(self._blobs())
+        self.total_bytes = sum(size for _, _, size in blobs)
+        target = self.max_bytes * 0.9
+        cutoff = time.time() - _EVICTION_GRACE_SECONDS
+        evicted = 0
+        for mtime, digest, size in blobs:
+            if self.total_bytes <= target or mtime > cutoff:
+                break
+            for path in (self._blob_path(digest), self._meta_path(digest)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.total_bytes -= size
+            evicted += 1
+        print(f"🧹 TTS store eviction: removed {evicted} blobs ({self.total_bytes} bytes on disk)")
@@ -1,10 +1,108 @@
 import os
 import json
+import time
 import hashlib
+from collections import OrderedDict
+from core import metrics
 from core.client import CACHE_DIR
+from core.resilience import is_fallback
+from core.fuzzy import normalize_key
+from core.cache_backends import DirectoryBackend, SQLiteBackend, RecordLog
+from core.cache_sync import KeyLocks, SharedIndex
+
+# --- TIERING / EXPIRY CONFIG (0 = disabled / unbounded) ---
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "0"))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "0"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "2048"))
+CACHE_MEMORY_BYTES = int(os.getenv("CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+CACHE_MAX_DISK_BYTES = int(os.getenv("CACHE_MAX_DISK_BYTES", "0"))
+
+# --- DIRECTORY MODE STORAGE ---
+# "directory": one JSON file per key (original layout)
+# "sqlite":    one WAL-mode database file, compact JSON values
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "directory")
+CACHE_DB_FILE = os.getenv("CACHE_DB_FILE", "cache.db")
+
+# --- MULTI-WORKER COHERENCE ---
+# Host-wide shared-memory index of entry write times (directory mode only)
+CACHE_SHARED_INDEX = os.getenv("CACHE_SHARED_INDEX", "0") == "1"
+CACHE_SHARED_INDEX_SLOTS = int(os.getenv("CACHE_SHARED_INDEX_SLOTS", str(1 << 18)))
+# How long a worker waits for another worker generating the same key
+CACHE_GENERATION_LOCK_TIMEOUT = float(os.getenv("CACHE_GENERATION_LOCK_TIMEOUT", "30"))
+
+# Lookup states returned by FileSystemCache.lookup()
+FRESH = "fresh"
+STALE = "stale"
+
+
+class MemoryLRU:
+    """
+    Bounded in-memory front tier.
+    Evicts least-recently-used entries once either the entry count or the
+    byte budget is exceeded. Each entry carries its own expiry times.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at, fresh_until, stale_until)
+
+    def get(self, key, now=None, written_since=None):
+        """
+        Returns (value, state). `written_since` drops the entry if the key was
+        rewritten elsewhere after this copy was stored.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, _, stored_at, fresh_until, stale_until = entry
+        if written_since is not None and written_since > stored_at:
+            self.pop(key)
+            return None, None
+        now = now or time.time()
+        if now < fresh_until:
+            self._entries.move_to_end(key)
+            return value, FRESH
+        if now < stale_until:
+            self._entries.move_to_end(key)
+            return value, STALE
+        self.pop(key)
+        return None, None
+
+    def set(self, key, value, size, stored_at, fresh_until, stale_until):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (value, size, stored_at, fresh_until, stale_until)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted[1]
+
+    def pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_backend(name):
+    """Builds the storage backend for directory mode."""
+    if name == "sqlite":
+        return SQLiteBackend(os.path.join(CACHE_DIR, CACHE_DB_FILE))
+    if name != "directory":
+        print(f"⚠ Unknown CACHE_BACKEND '{name}', falling back to 'directory'")
+    return DirectoryBackend(CACHE_DIR)
+
 
 class FileSystemCache:
-    def __init__(self, cache_file=None):
+    def __init__(self, cache_file=None, ttl=CACHE_TTL_SECONDS, stale_ttl=CACHE_STALE_SECONDS,
+                 memory_entries=CACHE_MEMORY_ENTRIES, memory_bytes=CACHE_MEMORY_BYTES,
+                 max_disk_bytes=CACHE_MAX_DISK_BYTES, backend=CACHE_BACKEND,
+                 shared_index=CACHE_SHARED_INDEX):
         """
         Initialize the cache system.
         
@@ -14,6 +112,17 @@ class FileSystemCache:
                   Used for: OCR translations (fast, small lookups).
                 - If None, runs in DIRECTORY MODE (Hash -> File).
                   Used for: Main translation system (complex JSON objects).
+            ttl (float): Seconds an entry stays fresh (0 = never expires).
+            stale_ttl (float): Extra seconds an expired entry may still be served
+                while the caller revalidates it (stale-while-revalidate).
+            memory_entries / memory_bytes: Bounds of the in-memory LRU tier
+                that sits in front of the directory.
+            max_disk_bytes (int): Size cap for the directory (0 = unbounded).
+                Oldest entries are evicted first.
+            backend (str): Directory mode storage, "directory" or "sqlite".
+            shared_index (bool): Attach to the host-wide shared-memory index so
+                workers skip disk on misses and drop memory copies of keys
+                another worker rewrote.
         """
         # Ensure base cache directory exists
         if not os.path.exists(CACHE_DIR):
@@ -21,84 +130,289 @@ class FileSystemCache:
             print(f"📁 Created cache directory: {CACHE_DIR}/")
 
         self.cache_file = None
+        self.backend = None
+        self.index = None
         self.memory_cache = {}
+        # Cross-process per-key locks (all workers share CACHE_DIR).
+        # Separate files so a worker holding a generation lock can still write.
+        self.write_locks = KeyLocks(CACHE_DIR, "write")
+        # Generation locks are held for a whole model call, so stripe them finer.
+        self.generation_locks = KeyLocks(CACHE_DIR, "generate", stripe_chars=4)
 
         if cache_file:
             # --- MODE A: SINGLE FILE (OCR) ---
             self.mode = "single_file"
             self.cache_file = os.path.join(CACHE_DIR, cache_file)
-            self._load_single_file()
+            # Stored as an append-only record log next to the legacy JSON map
+            self.log = RecordLog(os.path.splitext(self.cache_file)[0] + ".log")
+            self.memory_cache = self.log.load(legacy_json_path=self.cache_file)
         else:
             # --- MODE B: DIRECTORY HASH (Main System) ---
             self.mode = "directory"
+            self.backend = make_backend(backend)
+
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = MemoryLRU(memory_entries, memory_bytes)
+        self.disk_bytes = self.backend.total_bytes() if self.mode == "directory" and max_disk_bytes else 0
+        if self.mode == "directory" and shared_index:
+            self._attach_shared_index()
+
+    def _attach_shared_index(self):
+        try:
+            self.index = SharedIndex(
+                SharedIndex.name_for(CACHE_DIR),
+                CACHE_SHARED_INDEX_SLOTS,
+                os.path.join(self.write_locks.directory, "index.lock"),
+                os.path.join(self.write_locks.directory, "index.owners"),
+            )
+        except Exception as e:
+            print(f"⚠ Shared cache index unavailable, using disk only: {e}")
+            return
+        if self.index.needs_build:
+            # First worker up loads every existing entry; the rest just attach
+            self.index.put_many(self.backend.iter_hashes())
+            self.index.mark_ready()
+            self.index.release_build_lock()
+            print(f"🗂️ Shared cache index built ({self.index.slots} slots)")
 
     # --- SHARED METHODS ---
     
     def get(self, key):
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """
+        Like get(), but also reports freshness.
+
+        Returns:
+            (value, state): state is FRESH, STALE (serve it, but refresh it
+            in the background) or None on a miss.
+        """
+        value, state = self._lookup(key)
+        metrics.CACHE_REQUESTS.inc(state or "miss")
+        return value, state
+
+    def peek(self, key):
+        """lookup() for probes and re-checks rather than requests: not counted in the cache metrics."""
+        return self._lookup(key)
+
+    def contains(self, key):
+        """True if `key` has a fresh entry (see peek())."""
+        return self._lookup(key)[1] == FRESH
+
+    def _lookup(self, key):
         if self.mode == "single_file":
-            return self.memory_cache.get(key)
-        else:
-            return self._get_from_dir(key)
+            value = self._get_single_file(key)
+            return value, (FRESH if value is not None else None)
+
+        file_hash = self._get_hash(key)
+        written_at = self._indexed_write_time(file_hash)
+        if written_at is False:
+            return None, None
+        value, state = self.memory.get(file_hash, written_since=written_at)
+        if state:
+            return value, state
+        return self._get_from_dir(file_hash, written_at)
 
     def set(self, key, value):
+        if is_fallback(value):
+            return  # An error stand-in must never outlive the outage that produced it
         if self.mode == "single_file":
             self.memory_cache[key] = value
-            self._save_single_file()
+            self._append_single_file({key: value})
         else:
             self._save_to_dir(key, value)
 
+    def get_many(self, keys):
+        """Bulk get. Returns {key: value} for every key that is cached (fresh or stale)."""
+        if self.mode == "single_file":
+            found = {k: self._get_single_file(k) for k in keys}
+            found = {k: v for k, v in found.items() if v is not None}
+            self._count_many(len(keys), {FRESH: len(found)})
+            return found
+
+        found, missing, states = {}, {}, {}
+        for key in keys:
+            file_hash = self._get_hash(key)
+            written_at = self._indexed_write_time(file_hash)
+            if written_at is False:
+                continue
+            value, state = self.memory.get(file_hash, written_since=written_at)
+            if state:
+                found[key] = value
+                states[state] = states.get(state, 0) + 1
+            else:
+                missing.setdefault(file_hash, []).append(key)
+        if not missing:
+            self._count_many(len(keys), states)
+            return found
+
+        try:
+            rows = self.backend.read_many(missing)
+        except Exception as e:
+            metrics.CACHE_ERRORS.inc("read")
+            print(f"⚠ Cache Read Error: {e}")
+            self._count_many(len(keys), states)
+            return found
+        now = time.time()
+        for file_hash, entry in rows.items():
+            value, state = self._from_backend_entry(file_hash, entry, now)
+            if value is not None:
+                for key in missing[file_hash]:
+                    found[key] = value
+                states[state] = states.get(state, 0) + len(missing[file_hash])
+        self._count_many(len(keys), states)
+        return found
+
+    @staticmethod
+    def _count_many(requested, states):
+        for state, count in states.items():
+            metrics.CACHE_REQUESTS.inc(state, amount=count)
+        if requested > sum(states.values()):
+            metrics.CACHE_REQUESTS.inc("miss", amount=requested - sum(states.values()))
+
+    def set_many(self, items):
+        """Bulk set from a {key: value} dict (one transaction on the sqlite backend)."""
+        items = {k: v for k, v in items.items() if not is_fallback(v)}
+        if self.mode == "single_file":
+            self.memory_cache.update(items)
+            self._append_single_file(items)
+        else:
+            self._save_many_to_dir([(self._get_hash(k), k, v) for k, v in items.items()])
+
+    def generation_lock(self, key, timeout=CACHE_GENERATION_LOCK_TIMEOUT):
+        """
+        Cross-worker lock for producing the value of `key`.
+        Usage:
+            async with cache.generation_lock(key) as locked:
+                if locked and (hit := cache.get(key)): ...  # another worker just filled it
+        Yields False (proceed unlocked) if the holder takes longer than `timeout`.
+        """
+        return self.generation_locks.hold_async(self._get_hash(key), timeout)
+
     # --- DIRECTORY MODE HELPERS (Original Logic) ---
 
     def _get_hash(self, text):
         """
-        Normalizes the text to prevent case-sensitivity cache misses,
-        then generates an MD5 hash.
+        Normalizes the key to prevent case / Unicode-form / spacing cache
+        misses (see fuzzy.normalize_key), then generates an MD5 hash.
+        Free-text parts of a key are normalized further by the caller
+        (fuzzy.normalize_text), before the key is built.
         """
-        # 1. Normalize: convert to lowercase and remove accidental edge spaces
-        normalized_text = str(text).strip().lower()
-        
-        # 2. Hash the normalized string
-        return hashlib.md5(normalized_text.encode('utf-8')).hexdigest()
+        return hashlib.md5(normalize_key(text).encode('utf-8')).hexdigest()
 
-    def _get_from_dir(self, text):
-        file_hash = self._get_hash(text)
-        file_path = os.path.join(CACHE_DIR, f"{file_hash}.json")
-        
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"⚠ Cache Read Error: {e}")
-                return None
-        return None
+    def _indexed_write_time(self, file_hash):
+        """
+        Consults the shared index. Returns the entry's write time, None when
+        there is no (trustworthy) index, or False when the index proves a miss.
+        """
+        if self.index is None:
+            return None
+        written_at = self.index.get(file_hash)
+        if written_at is None and self.index.ready:
+            self.memory.pop(file_hash)
+            return False
+        return written_at
+
+    def _expiry(self, stored_at):
+        """Returns (fresh_until, stale_until) for an entry written at `stored_at`."""
+        if not self.ttl:
+            return float("inf"), float("inf")
+        fresh_until = stored_at + self.ttl
+        return fresh_until, fresh_until + self.stale_ttl
+
+    def _from_backend_entry(self, file_hash, entry, now, written_at=None):
+        """Applies TTL to a (data, stored_at, size) row and promotes it to the memory tier."""
+        data, stored_at, size = entry
+        fresh_until, stale_until = self._expiry(stored_at)
+        if now >= stale_until:
+            self._delete_from_disk(file_hash)
+            return None, None
+        # Stamp the memory copy with the index's write time so it isn't seen as outdated
+        self.memory.set(file_hash, data, size, written_at or stored_at, fresh_until, stale_until)
+        return data, (FRESH if now < fresh_until else STALE)
+
+    def _get_from_dir(self, file_hash, written_at=None):
+        try:
+            entry = self.backend.read(file_hash)
+        except Exception as e:
+            metrics.CACHE_ERRORS.inc("read")
+            print(f"⚠ Cache Read Error: {e}")
+            return None, None
+        if entry is None:
+            return None, None
+        return self._from_backend_entry(file_hash, entry, time.time(), written_at)
 
     def _save_to_dir(self, text, data):
-        file_hash = self._get_hash(text)
-        file_path = os.path.join(CACHE_DIR, f"{file_hash}.json")
-        
+        self._save_many_to_dir([(self._get_hash(text), text, data)])
+
+    def _save_many_to_dir(self, entries):
+        stored_at = time.time()
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if self.backend.name == "directory":
+                # Serialize writers of the same key across workers
+                delta = 0
+                for file_hash, key, data in entries:
+                    with self.write_locks.hold(file_hash):
+                        delta += self.backend.write(file_hash, key, data)
+            else:
+                # SQLite does its own cross-process locking
+                delta = self.backend.write_many(entries)
         except Exception as e:
+            metrics.CACHE_ERRORS.inc("write")
             print(f"⚠ Cache Write Error: {e}")
+            return
+
+        expiry = self._expiry(stored_at)
+        for file_hash, _, data in entries:
+            # Byte size only matters for the memory budget; the JSON length is a fair estimate
+            self.memory.set(file_hash, data, len(json.dumps(data, ensure_ascii=False)), stored_at, *expiry)
+        if self.index is not None:
+            self.index.put_many((file_hash, stored_at) for file_hash, _, _ in entries)
+        if self.max_disk_bytes:
+            self.disk_bytes += delta
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    # --- DIRECTORY SIZE CAP ---
+
+    def _delete_from_disk(self, file_hash):
+        self.memory.pop(file_hash)
+        if self.index is not None:
+            self.index.remove(file_hash)
+        freed = self.backend.delete(file_hash)
+        if self.max_disk_bytes:
+            self.disk_bytes -= freed
+
+    def _evict_disk(self):
+        """
+        Deletes the oldest entries until the store is back under 90% of
+        its cap, so one eviction pass buys room for many future writes.
+        """
+        evicted, self.disk_bytes = self.backend.evict(self.max_disk_bytes * 0.9)
+        for file_hash in evicted:
+            self.memory.pop(file_hash)
+            if self.index is not None:
+                self.index.remove(file_hash)
+        print(f"🧹 Cache eviction: removed {len(evicted)} entries ({self.disk_bytes} bytes on disk)")
 
     # --- SINGLE FILE MODE HELPERS ---
 
-    def _load_single_file(self):
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.memory_cache = json.load(f)
-            except Exception as e:
-                print(f"⚠ Map Cache Read Error: {e}")
-                self.memory_cache = {}
-        else:
-            self.memory_cache = {}
+    def _get_single_file(self, key):
+        value = self.memory_cache.get(key)
+        # On a miss, pick up whatever other workers appended to the shared log
+        if value is None and self.log.refresh(self.memory_cache):
+            value = self.memory_cache.get(key)
+        return value
 
-    def _save_single_file(self):
+    def _append_single_file(self, items):
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory_cache, f, indent=2, ensure_ascii=False)
+            self.log.append(items)
         except Exception as e:
-            print(f"⚠ Map Cache Write Error: {e}")
\ No newline at end of file
+            metrics.CACHE_ERRORS.inc("write")
+            print(f"⚠ Map Cache Write Error: {e}")
+            return
+        if self.log.needs_compaction():
+            self.log.compact_in_background()
@@ -0,0 +1,489 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from core.cache_sync import lock_fd, unlock_fd
+
+
+class DirectoryBackend:
+    """
+    The original layout: one pretty-printed JSON file per key, named
+    `<md5>.json`, in a single flat directory. The file's mtime is its write time.
+    """
+
+    name = "directory"
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, file_hash):
+        return os.path.join(self.directory, f"{file_hash}.json")
+
+    def read(self, file_hash):
+        """Returns (data, stored_at, size) or None."""
+        file_path = self._path(file_hash)
+        try:
+            # One stat() instead of exists() + open()
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data, stat.st_mtime, stat.st_size
+
+    def read_many(self, hashes):
+        found = {}
+        for file_hash in hashes:
+            entry = self.read(file_hash)
+            if entry is not None:
+                found[file_hash] = entry
+        return found
+
+    def write(self, file_hash, key, data):
+        """
+        Stores one entry. Returns the change in bytes on disk.
+        Writes to a temp file and renames it over the target, so readers in
+        other workers see either the old file or the new one, never a torn one.
+        """
+        file_path = self._path(file_hash)
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        try:
+            old_size = os.path.getsize(file_path)
+        except OSError:
+            old_size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{file_hash}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return len(payload) - old_size
+
+    def write_many(self, entries):
+        """entries: iterable of (file_hash, key, data). Returns the change in bytes."""
+        return sum(self.write(file_hash, key, data) for file_hash, key, data in entries)
+
+    def delete(self, file_hash):
+        """Removes one entry. Returns the bytes freed."""
+        file_path = self._path(file_hash)
+        try:
+            size = os.path.getsize(file_path)
+            os.remove(file_path)
+        except OSError:
+            return 0
+        return size
+
+    def _entry_files(self):
+        with os.scandir(self.directory) as it:
+            return [e for e in it if e.is_file() and e.name.endswith(".json")]
+
+    def total_bytes(self):
+        return sum(e.stat().st_size for e in self._entry_files())
+
+    def evict(self, target_bytes):
+        """Deletes the oldest entries until at most `target_bytes` remain. Returns (removed_hashes, remaining)."""
+        entries = sorted((e.stat().st_mtime, e.path, e.stat().st_size) for e in self._entry_files())
+        remaining = sum(size for _, _, size in entries)
+        removed = []
+        for _, path, size in entries:
+            if remaining <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            remaining -= size
+            removed.append(os.path.basename(path)[:-len(".json")])
+        return removed, remaining
+
+    def iter_hashes(self):
+        """Yields (file_hash, stored_at) without reading any file contents."""
+        for entry in self._entry_files():
+            yield entry.name[:-len(".json")], entry.stat().st_mtime
+
+    def iter_entries(self):
+        """Yields (file_hash, key, data, stored_at). Keys aren't stored in this layout, so key is None."""
+        for entry in self._entry_files():
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠ Skipping unreadable cache file {entry.name}: {e}")
+                continue
+            yield entry.name[:-len(".json")], None, data, entry.stat().st_mtime
+
+
+class SQLiteBackend:
+    """
+    All entries in one SQLite database in WAL mode, values stored as compact
+    (no indent, no spaces) UTF-8 JSON. One file instead of millions of inodes,
+    concurrent readers alongside a writer, and batched reads/writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Only the event loop thread uses this connection; CLI jobs open their own
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " hash TEXT PRIMARY KEY,"
+            " key TEXT,"
+            " value BLOB NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries(stored_at)")
+
+    @staticmethod
+    def _encode(data):
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+    @staticmethod
+    def _placeholders(n):
+        return ",".join("?" * n)
+
+    def read(self, file_hash):
+        row = self.conn.execute(
+            "SELECT value, stored_at, size FROM entries WHERE hash = ?", (file_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def read_many(self, hashes):
+        hashes = list(hashes)
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, value, stored_at, size FROM entries WHERE hash IN ({self._placeholders(len(chunk))})",
+                chunk,
+            )
+            for file_hash, value, stored_at, size in rows:
+                found[file_hash] = (json.loads(value), stored_at, size)
+        return found
+
+    def write(self, file_hash, key, data):
+        return self.write_many([(file_hash, key, data)])
+
+    def write_many(self, entries):
+        """entries: iterable of (file_hash, key, data). Written in one transaction."""
+        stored_at = time.time()
+        return self._upsert((file_hash, key, data, stored_at) for file_hash, key, data in entries)
+
+    def import_rows(self, rows):
+        """rows: iterable of (file_hash, key, data, stored_at). Keeps each entry's original timestamp."""
+        return self._upsert(rows)
+
+    def _upsert(self, rows):
+        """Returns the change in stored bytes."""
+        encoded = []
+        for file_hash, key, data, stored_at in rows:
+            payload = self._encode(data)
+            encoded.append((file_hash, key, payload, stored_at, len(payload)))
+
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            old_size = 0
+            for i in range(0, len(encoded), 500):
+                chunk = [row[0] for row in encoded[i:i + 500]]
+                old_size += self.conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE hash IN ({self._placeholders(len(chunk))})",
+                    chunk,
+                ).fetchone()[0]
+            self.conn.executemany(
+                "INSERT INTO entries (hash, key, value, stored_at, size) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(hash) DO UPDATE SET key = COALESCE(excluded.key, key),"
+                " value = excluded.value, stored_at = excluded.stored_at, size = excluded.size",
+                encoded,
+            )
+        return sum(row[4] for row in encoded) - old_size
+
+    def delete(self, file_hash):
+        row = self.conn.execute("SELECT size FROM entries WHERE hash = ?", (file_hash,)).fetchone()
+        if row is None:
+            return 0
+        self.conn.execute("DELETE FROM entries WHERE hash = ?", (file_hash,))
+        return row[0]
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self, target_bytes):
+        remaining = self.total_bytes()
+        removed = []
+        while remaining > target_bytes:
+            rows = self.conn.execute(
+                "SELECT hash, size FROM entries ORDER BY stored_at LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            batch = []
+            for file_hash, size in rows:
+                if remaining <= target_bytes:
+                    break
+                batch.append((file_hash,))
+                remaining -= size
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.executemany("DELETE FROM entries WHERE hash = ?", batch)
+            removed.extend(file_hash for (file_hash,) in batch)
+        return removed, remaining
+
+    def iter_hashes(self):
+        yield from self.conn.execute("SELECT hash, stored_at FROM entries").fetchall()
+
+    def iter_entries(self):
+        for file_hash, key, value, stored_at in self.conn.execute(
+            "SELECT hash, key, value, stored_at FROM entries"
+        ).fetchall():
+            yield file_hash, key, json.loads(value), stored_at
+
+
+class RecordLog:
+    """
+    Append-only storage for single-file (map) mode.
+
+    Every set() appends one compact JSON line `{"k": key, "v": value}`, so a
+    write costs O(entry) instead of rewriting the whole map. Startup replays
+    the lines in order (last write wins). A line torn by a crash is skipped
+    and replay resyncs at the next newline. The log is never truncated,
+    since other workers may have appended valid records after it. Once superseded
+    records outweigh live ones, a background thread compacts the log.
+
+    Several worker processes may share one log: appends and the final swap
+    of a compaction hold an OS file lock, and each process re-opens the file
+    when another one has replaced it. Only one process compacts a log at a
+    time (`<log>.compact.lock`), into its own temp file.
+    """
+
+    def __init__(self, path, compact_min_bytes=1024 * 1024, compact_ratio=2.0):
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        self.compact_ratio = compact_ratio
+        self.log_bytes = 0
+        self.live_bytes = 0
+        self._record_sizes = {}
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._handle = None
+        self._read_inode = None
+        self._read_offset = 0
+
+    @staticmethod
+    def _encode(key, value):
+        line = json.dumps({"k": key, "v": value}, ensure_ascii=False, separators=(",", ":"))
+        return (line + "\n").encode('utf-8')
+
+    @staticmethod
+    def _replay(f, data, skipped=None):
+        """
+        Reads records from `f` into `data`. Returns (bytes consumed, {key: record size}).
+        Unparsable lines are consumed and skipped (counted in `skipped`, a list).
+        """
+        consumed = 0
+        sizes = {}
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Partial line: a record still being appended, or a torn tail
+            consumed += len(line)
+            try:
+                record = json.loads(line)
+                key, value = record["k"], record["v"]
+            except (ValueError, TypeError, KeyError):
+                if skipped is not None:
+                    skipped.append(consumed - len(line))
+                continue
+            data[key] = value
+            sizes[key] = len(line)
+        return consumed, sizes
+
+    def load(self, legacy_json_path=None):
+        """Replays the log into a dict. Imports a legacy JSON map the first time."""
+        data = {}
+        if os.path.exists(self.path):
+            skipped = []
+            with self._lock, open(self.path, 'rb') as f:
+                consumed, sizes = self._replay(f, data, skipped)
+                self._read_inode = os.fstat(f.fileno()).st_ino
+            if skipped:
+                # Torn writes from a crash; the records around them are still good
+                print(f"⚠ Map Cache: skipped {len(skipped)} torn record(s), first at byte {skipped[0]}")
+            for key, size in sizes.items():
+                self._track(key, size)
+            self.log_bytes = self._read_offset = consumed
+        elif legacy_json_path and os.path.exists(legacy_json_path):
+            try:
+                with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"⚠ Map Cache Read Error: {e}")
+                data = {}
+            self.append(data)
+            print(f"📦 Imported {len(data)} entries from {legacy_json_path} into {self.path}")
+        return data
+
+    def refresh(self, data):
+        """
+        Pulls records other processes appended since our last read into `data`.
+        Returns True if anything new was found.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_ino == self._read_inode and stat.st_size == self._read_offset:
+            return False
+        with self._lock, open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_ino == self._read_inode:
+                f.seek(self._read_offset)
+                consumed, sizes = self._replay(f, data)
+                self._read_offset += consumed
+            else:
+                # Another process compacted the log; read it from the start
+                consumed, sizes = self._replay(f, data)
+                self._read_inode = os.fstat(f.fileno()).st_ino
+                self._read_offset = consumed
+        for key, size in sizes.items():
+            self._track(key, size)
+        return bool(sizes)
+
+    def _open(self):
+        if self._handle is None:
+            self._handle = open(self.path, 'a+b')
+
+    def _lock_current_file(self):
+        """
+        Locks the append handle, re-opening first if another process swapped
+        in a compacted log while we waited for the lock.
+        """
+        while True:
+            lock_fd(self._handle.fileno())
+            try:
+                if os.fstat(self._handle.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            unlock_fd(self._handle.fileno())
+            self._handle.close()
+            self._handle = open(self.path, 'a+b')
+
+    def _last_byte(self, size):
+        self._handle.seek(size - 1)
+        return self._handle.read(1)  # Appends still go to the end in 'a' mode
+
+    def _track(self, key, size):
+        self.live_bytes += size - self._record_sizes.get(key, 0)
+        self._record_sizes[key] = size
+
+    def append(self, items):
+        """Appends one record per (key, value) in `items` with a single write."""
+        if not items:
+            return
+        payload = bytearray()
+        for key, value in items.items():
+            record = self._encode(key, value)
+            self._track(key, len(record))
+            payload += record
+        with self._lock:
+            self._open()
+            self._lock_current_file()
+            try:
+                stat = os.fstat(self._handle.fileno())
+                if stat.st_size and self._last_byte(stat.st_size) != b"\n":
+                    # A crash left a torn tail: end it, so it can't swallow our first record
+                    payload[:0] = b"\n"
+                self._handle.write(payload)
+                self._handle.flush()
+                self.log_bytes = stat.st_size + len(payload)
+                if self._read_inode in (None, stat.st_ino) and stat.st_size == self._read_offset:
+                    # Nobody else wrote in between, so our own records count as read
+                    self._read_inode = stat.st_ino
+                    self._read_offset = self.log_bytes
+            finally:
+                unlock_fd(self._handle.fileno())
+
+    def needs_compaction(self):
+        return (
+            not self._compacting
+            and self.log_bytes > self.compact_min_bytes
+            and self.log_bytes > self.live_bytes * self.compact_ratio
+        )
+
+    def compact_in_background(self):
+        """Rewrites the log with only live records on a daemon thread."""
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, daemon=True).start()
+
+    def _compact(self):
+        tmp_path = None
+        # One compaction per log across all workers; the others skip it
+        guard = os.open(f"{self.path}.compact.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if not lock_fd(guard, blocking=False):
+                return
+            # Phase 1 (no log lock): fold everything written so far
+            live = {}
+            with open(self.path, 'rb') as src:
+                inode = os.fstat(src.fileno()).st_ino
+                offset, _ = self._replay(src, live)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path) or ".", prefix=os.path.basename(self.path) + ".", suffix=".compact",
+            )
+            with os.fdopen(fd, 'wb') as out:
+                for key, value in live.items():
+                    out.write(self._encode(key, value))
+
+                # Phase 2 (locked): carry over records appended meanwhile, then swap
+                with self._lock, open(self.path, 'rb') as src:
+                    lock_fd(src.fileno())
+                    try:
+                        if os.fstat(src.fileno()).st_ino != inode:
+                            # Replaced since phase 1, so `offset` means nothing in this file
+                            print("⚠ Map Cache compaction skipped: the log was replaced meanwhile")
+                            return
+                        src.seek(offset)
+                        out.write(src.read())
+                        out.flush()
+                        os.fsync(out.fileno())
+                        if self._handle is not None:
+                            self._handle.close()
+                            self._handle = None
+                        os.replace(tmp_path, self.path)
+                        tmp_path = None
+                    finally:
+                        unlock_fd(src.fileno())
+                    self._handle = open(self.path, 'a+b')
+                    self.log_bytes = os.path.getsize(self.path)
+                    # _read_inode still points at the old file, so the next refresh()
+                    # replays the compacted log and picks up other workers' records
+            print(f"🧹 Map Cache compacted: {len(live)} live entries, {self.log_bytes} bytes")
+        except Exception as e:
+            print(f"⚠ Map Cache Compaction Error: {e}")
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            os.close(guard)  # Also releases the compaction lock
+            self._compacting = False
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
@@ -0,0 +1,227 @@
+import os
+import time
+import struct
+import asyncio
+import hashlib
+from contextlib import contextmanager, asynccontextmanager
+from multiprocessing import shared_memory, resource_tracker
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# --- CROSS-PROCESS FILE LOCKS ---
+
+def lock_fd(fd, blocking=True):
+    """Takes an exclusive OS-level lock on an open file. Returns False if non-blocking and busy."""
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        if blocking:
+            raise
+        return False
+
+
+def unlock_fd(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class KeyLocks:
+    """
+    Per-key locks shared by every worker process on the host.
+
+    Keys are striped over a fixed set of lock files (the first `stripe_chars`
+    hex chars of the key hash -> at most 16**stripe_chars files per
+    namespace), so the lock directory never grows with the cache.
+    Locks from different namespaces never block each other.
+    """
+
+    def __init__(self, directory, namespace, stripe_chars=3):
+        self.directory = os.path.join(directory, ".locks")
+        self.namespace = namespace
+        self.stripe_chars = stripe_chars
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _open(self, file_hash):
+        path = os.path.join(self.directory, f"{self.namespace}-{file_hash[:self.stripe_chars]}.lock")
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def hold(self, file_hash):
+        """Blocking lock, for short critical sections like a file write."""
+        fd = self._open(file_hash)
+        try:
+            lock_fd(fd)
+            try:
+                yield
+            finally:
+                unlock_fd(fd)
+        finally:
+            os.close(fd)
+
+    @asynccontextmanager
+    async def hold_async(self, file_hash, timeout, poll_interval=0.05):
+        """
+        Event-loop friendly lock for long critical sections (e.g. a model call).
+        Polls a non-blocking lock; after `timeout` seconds it gives up waiting
+        and yields False so the caller can proceed unlocked.
+        """
+        fd = self._open(file_hash)
+        acquired = False
+        try:
+            deadline = time.monotonic() + timeout
+            while not (acquired := lock_fd(fd, blocking=False)):
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(poll_interval)
+            yield acquired
+        finally:
+            if acquired:
+                unlock_fd(fd)
+            os.close(fd)
+
+
+# --- SHARED INDEX ---
+
+class SharedIndex:
+    """
+    Host-wide index of which cache entries exist and when they were written,
+    kept in a named shared-memory segment that every worker attaches to.
+
+    Lets a worker:
+      - answer a miss without touching the filesystem, and
+      - notice that another worker rewrote a key it holds in its memory tier.
+
+    Layout: 32-byte header (magic, slot count, ready flag) followed by an
+    open-addressing table of 24-byte slots: 16-byte MD5 digest + float64
+    stored_at (0.0 = deleted). Writers serialize on a lock file; readers are
+    lock-free.
+
+    Every attached process holds a shared lock on an "owners" file. A process
+    that can take it exclusively is the only one alive, so the segment is
+    either new or left over from an earlier run, and gets rebuilt from disk.
+    """
+
+    MAGIC = b"VBIDX001"
+    HEADER = struct.Struct("<8sQQ8x")
+    SLOT = struct.Struct("<16sd")
+    EMPTY = b"\x00" * 16
+
+    def __init__(self, name, slots, lock_path, owners_path):
+        self.slots = slots
+        size = self.HEADER.size + slots * self.SLOT.size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, slots, 0)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+        # The segment outlives any single worker; don't let this process's exit unlink it
+        try:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        magic, existing_slots, _ = self.HEADER.unpack_from(self.shm.buf, 0)
+        if magic != self.MAGIC or existing_slots != slots:
+            raise ValueError(f"Shared cache index '{name}' has an incompatible layout")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        self._owners_fd = os.open(owners_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self.needs_build = lock_fd(self._owners_fd, blocking=False)
+        if not self.needs_build and fcntl:
+            fcntl.flock(self._owners_fd, fcntl.LOCK_SH)
+        if self.needs_build:
+            # Nobody else is attached: start from an empty, untrusted table
+            self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, slots, 0)
+            self.shm.buf[self.HEADER.size:size] = bytes(size - self.HEADER.size)
+
+    def release_build_lock(self):
+        """Downgrades the builder's exclusive owners lock to a shared one."""
+        if fcntl:
+            fcntl.flock(self._owners_fd, fcntl.LOCK_SH)
+        else:
+            # No shared locks on Windows: let go so other workers can attach
+            unlock_fd(self._owners_fd)
+
+    @staticmethod
+    def name_for(directory):
+        digest = hashlib.md5(os.path.abspath(directory).encode('utf-8')).hexdigest()[:12]
+        return f"vb_cache_{digest}"
+
+    @property
+    def ready(self):
+        """True once the creating worker has loaded every existing entry."""
+        return self.HEADER.unpack_from(self.shm.buf, 0)[2] == 1
+
+    def mark_ready(self):
+        self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, self.slots, 1)
+
+    def _probe(self, digest):
+        """Yields (offset, stored_digest, stored_at) along the probe chain for `digest`."""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(self.slots):
+            offset = self.HEADER.size + ((start + i) % self.slots) * self.SLOT.size
+            stored_digest, stored_at = self.SLOT.unpack_from(self.shm.buf, offset)
+            yield offset, stored_digest, stored_at
+            if stored_digest == self.EMPTY:
+                return
+
+    def get(self, file_hash):
+        """Returns the entry's stored_at, or None if it isn't in the index."""
+        digest = bytes.fromhex(file_hash)
+        for _, stored_digest, stored_at in self._probe(digest):
+            if stored_digest == digest:
+                return stored_at or None
+            if stored_digest == self.EMPTY:
+                return None
+        return None
+
+    def put(self, file_hash, stored_at):
+        self._write(bytes.fromhex(file_hash), stored_at)
+
+    def remove(self, file_hash):
+        # Tombstone: keep the digest so probe chains stay intact
+        self._write(bytes.fromhex(file_hash), 0.0, insert=False)
+
+    def put_many(self, rows):
+        """rows: iterable of (file_hash, stored_at), written under one lock."""
+        lock_fd(self._lock_fd)
+        try:
+            for file_hash, stored_at in rows:
+                self._write_unlocked(bytes.fromhex(file_hash), stored_at, insert=True)
+        finally:
+            unlock_fd(self._lock_fd)
+
+    def _write(self, digest, stored_at, insert=True):
+        lock_fd(self._lock_fd)
+        try:
+            self._write_unlocked(digest, stored_at, insert)
+        finally:
+            unlock_fd(self._lock_fd)
+
+    def _write_unlocked(self, digest, stored_at, insert):
+        for offset, stored_digest, _ in self._probe(digest):
+            if stored_digest == digest or (insert and stored_digest == self.EMPTY):
+                # stored_at first, digest second: a reader never sees a digest without its time
+                struct.pack_into("<d", self.shm.buf, offset + 16, stored_at)
+                struct.pack_into("<16s", self.shm.buf, offset, digest)
+                return
+            if stored_digest == self.EMPTY:
+                return
+        if not insert:
+            return
+        # Table full: the index can no longer prove a miss, so stop trusting it
+        self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, self.slots, 0)
+        print("⚠ Shared cache index is full; raise CACHE_SHARED_INDEX_SLOTS")
@@ -1,18 +1,165 @@
 import os
-from google import genai
+import time
+import tempfile
+import asyncio
+import threading
 from dotenv import load_dotenv
+from core import metrics, resilience, scheduler
+from core.startup import LazyModule, timed
 
 # --- 1. CONFIGURATION SETUP ---
+# The one load_dotenv() for the whole app: every module reads env through here
 load_dotenv()
 
 API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
+if not API_KEY and os.getenv("MODEL_BACKEND", "gemini") != "fake":
     # Print warning but don't crash immediately (allows debugging)
     print("⚠ WARNING: API Key not found in .env. Please set GEMINI_API_KEY.")
 
-# Define the Cache Directory here so it's accessible globally
-CACHE_DIR = "cache_data"
+# Define the Cache Directory here so it's accessible globally (response cache, TTS store, save spool).
+# With a fake model or Firestore backend it defaults to a scratch directory, so fake
+# results never land in the committed cache_data/ that the real server serves.
+_FAKE_BACKEND = "fake" in (os.getenv("MODEL_BACKEND"), os.getenv("FIRESTORE_BACKEND"))
+CACHE_DIR = os.getenv("CACHE_DIR") or (
+    os.path.join(tempfile.gettempdir(), "verbabridge-fake-cache") if _FAKE_BACKEND else "cache_data"
+)
 
-# --- 2. INITIALIZE CLIENT ---
-# This 'client' object will be imported by ai.py, style.py, etc.
-client = genai.Client(api_key=API_KEY)
\ No newline at end of file
+# "gemini" (default) or "fake": a local deterministic stand-in (see core/fakes.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+
+# --- 2. LAZY CLIENT ---
+# google.genai takes ~0.5s to import; nothing pays for it until the first model call
+genai = LazyModule("google.genai")
+types = LazyModule("google.genai.types")
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The single shared Gemini client, built on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and MODEL_BACKEND == "fake":
+                from core.fakes import FakeGenaiClient
+                print("🧪 MODEL_BACKEND=fake: using the local Gemini stand-in")
+                _client = FakeGenaiClient()
+            elif _client is None:
+                with timed("init:genai_client"):
+                    _client = genai.Client(api_key=API_KEY)
+    return _client
+
+# --- 3. NON-BLOCKING, GUARDED MODEL CALLS ---
+# Every call first waits for a slot from the traffic-class scheduler
+# (core/scheduler.py), then goes through the model's resilience guard
+# (core/resilience.py): adaptive concurrency limit, jittered retries and a
+# circuit breaker.
+
+async def generate_content(model, contents, config=None, endpoint=None, deadline=None, hedge=False):
+    """
+    Runs a Gemini call on the SDK's async client so the event loop keeps
+    serving other requests while we wait on the model.
+    Retryable errors (429, 5xx, timeouts) are retried with backoff; raises
+    resilience.CircuitOpenError without calling out while the model is failing,
+    and scheduler.Overloaded when the endpoint's traffic class is too backed up.
+
+    Interactive callers name their `endpoint` and may pass a `deadline`
+    (seconds for the whole call, retries included; raises
+    resilience.DeadlineExceeded) and `hedge=True` to race a second copy of
+    a slow call (see resilience.Hedger).
+    """
+    async def _attempt():
+        metrics.MODEL_IN_FLIGHT.inc(model)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await get_client().aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config,
+            )
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            metrics.MODEL_IN_FLIGHT.dec(model)
+            metrics.MODEL_LATENCY.observe(model, "generate", outcome, value=time.perf_counter() - start)
+        metrics.record_usage(model, getattr(response, "usage_metadata", None))
+        return response
+
+    async def _scheduled():
+        async with scheduler.slot(endpoint, model):
+            if hedge:
+                return await resilience.hedger(endpoint).run(guard, _attempt)
+            return await guard.run(_attempt)
+
+    guard = resilience.guard(model)
+    endpoint = endpoint or model
+    if deadline:
+        return await resilience.within_deadline(_scheduled(), deadline, endpoint)
+    return await _scheduled()
+
+async def generate_content_stream(model, contents, config=None, endpoint=None, slot=None):
+    """
+    Streaming variant of generate_content(): yields response chunks as the
+    model produces them. Holds one scheduler slot and one concurrency slot
+    for the whole stream, and only retries if the stream failed before its
+    first chunk. Pass a `slot` from scheduler.acquire() to use one the caller
+    already holds (it is released when the stream ends).
+    """
+    held = slot or await scheduler.acquire(endpoint or model, model)
+    try:
+        guard = resilience.guard(model)
+        guard.first_attempt()
+        attempt = 0
+        while True:
+            attempt += 1
+            yielded = False
+            try:
+                async with guard.slot():
+                    metrics.MODEL_IN_FLIGHT.inc(model)
+                    start = time.perf_counter()
+                    outcome = "error"
+                    usage = None
+                    try:
+                        async for chunk in await get_client().aio.models.generate_content_stream(
+                            model=model,
+                            contents=contents,
+                            config=config,
+                        ):
+                            # Each chunk carries the running totals; the last one has the final counts
+                            usage = getattr(chunk, "usage_metadata", None) or usage
+                            yielded = True
+                            yield chunk
+                        outcome = "ok"
+                    except asyncio.CancelledError:
+                        outcome = "cancelled"
+                        raise
+                    finally:
+                        metrics.MODEL_IN_FLIGHT.dec(model)
+                        metrics.MODEL_LATENCY.observe(model, "stream", outcome, value=time.perf_counter() - start)
+                        metrics.record_usage(model, usage)
+                return
+            except Exception as e:
+                delay = None if yielded else guard.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+    finally:
+        held.release()
+
+def unpack_batch(payload, count):
+    """
+    Maps a batched reply ({"results": [{"id": i, ...}, ...]}) back onto input
+    order. Inputs the model skipped (or answered with a bad id) stay None.
+    """
+    results = [None] * count
+    for entry in payload.get("results", []):
+        try:
+            index = int(entry.pop("id"))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        if 0 <= index < count:
+            results[index] = entry
+    return results
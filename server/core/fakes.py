@@ -0,0 +1,267 @@
+"""
+Local stand-ins for Gemini and Firestore, for benchmarking the server's own
+overhead (MODEL_BACKEND=fake, FIRESTORE_BACKEND=fake).
+
+Both are deterministic: the same prompt always yields the same reply, and
+latencies come from a seeded random generator.
+"""
+import os
+import re
+import json
+import uuid
+import random
+import asyncio
+import hashlib
+from functools import cmp_to_key
+from types import SimpleNamespace
+
+# Model latency is log-normal: median FAKE_MODEL_LATENCY_MS, spread FAKE_MODEL_LATENCY_SIGMA
+FAKE_MODEL_LATENCY_MS = float(os.getenv("FAKE_MODEL_LATENCY_MS", "800"))
+FAKE_MODEL_LATENCY_SIGMA = float(os.getenv("FAKE_MODEL_LATENCY_SIGMA", "0.5"))
+FAKE_MODEL_ERROR_RATE = float(os.getenv("FAKE_MODEL_ERROR_RATE", "0"))
+FAKE_MODEL_SEED = int(os.getenv("FAKE_MODEL_SEED", "0"))
+FAKE_FIRESTORE_LATENCY_MS = float(os.getenv("FAKE_FIRESTORE_LATENCY_MS", "20"))
+
+_SCHEMA_KEY = re.compile(r'^\s*"(\w+)":\s*(.*)$', re.MULTILINE)
+_BATCH_INPUTS = re.compile(r'\n(\[\{.*\}\])\n')
+
+
+class FakeModelError(Exception):
+    code = 429  # Classified like Gemini's RESOURCE_EXHAUSTED (core/resilience.py)
+
+
+# --- FAKE GEMINI ---
+
+class FakeModels:
+    """Implements the slice of `client.aio.models` the app uses."""
+
+    def __init__(self, latency_ms=FAKE_MODEL_LATENCY_MS, sigma=FAKE_MODEL_LATENCY_SIGMA,
+                 error_rate=FAKE_MODEL_ERROR_RATE, seed=FAKE_MODEL_SEED):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _latency(self):
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.rng.lognormvariate(0, self.sigma) * self.latency_ms / 1000
+
+    def _maybe_fail(self):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise FakeModelError("429 RESOURCE_EXHAUSTED (fake model)")
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        await asyncio.sleep(self._latency())
+        self._maybe_fail()
+        prompt = _prompt_text(contents)
+        if "AUDIO" in (getattr(config, "response_modalities", None) or []):
+            return _audio_response(prompt)
+        text = json.dumps(_fake_payload(prompt), ensure_ascii=False)
+        return _text_response(text, _usage(prompt, text))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.calls += 1
+        latency = self._latency()
+        prompt = _prompt_text(contents)
+        text = json.dumps(_fake_payload(prompt), ensure_ascii=False, indent=2)
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+
+        async def _chunks():
+            # First chunk after ~a third of the latency, the rest spread over the remainder
+            await asyncio.sleep(latency / 3)
+            self._maybe_fail()
+            for i, piece in enumerate(pieces):
+                # Like Gemini, the final chunk carries the usage totals
+                usage = _usage(prompt, text) if i == len(pieces) - 1 else None
+                yield _text_response(piece, usage)
+                await asyncio.sleep(latency * 2 / 3 / len(pieces))
+
+        return _chunks()
+
+
+class FakeGenaiClient:
+    """Drop-in for `genai.Client` (async surface only)."""
+
+    def __init__(self):
+        self.aio = SimpleNamespace(models=FakeModels())
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(c for c in contents if isinstance(c, str))
+
+
+def _usage(prompt, reply):
+    # Roughly 4 characters per token
+    prompt_tokens, reply_tokens = len(prompt) // 4, len(reply) // 4
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=reply_tokens,
+                           total_token_count=prompt_tokens + reply_tokens)
+
+
+def _text_response(text, usage=None):
+    return SimpleNamespace(text=text, candidates=[], usage_metadata=usage)
+
+
+def _audio_response(prompt):
+    # ~0.25s of deterministic 24kHz 16-bit PCM per 10 characters, in the real TTS output format
+    seed = hashlib.sha256(prompt.encode('utf-8')).digest()
+    data = (seed * 375) * max(1, len(prompt) // 10)
+    part = SimpleNamespace(inline_data=SimpleNamespace(data=data, mime_type="audio/L16;codec=pcm;rate=24000"))
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]), finish_reason="STOP")
+    return SimpleNamespace(text=None, candidates=[candidate], usage_metadata=None)
+
+
+def _fake_value(key, template, tag):
+    if template.startswith("["):
+        return [f"[fake] {key} {tag} #{i}" for i in (1, 2)]
+    if "null" in template:
+        return None
+    return f"[fake] {key} {tag}"
+
+
+def _fake_payload(prompt):
+    """Fills the JSON schema spelled out at the end of the prompt with placeholder values."""
+    schema = prompt[prompt.rfind("schema"):]
+    fields = [(k, t) for k, t in _SCHEMA_KEY.findall(schema)]
+    tag = hashlib.md5(prompt.encode('utf-8')).hexdigest()[:8]
+
+    if fields and fields[0][0] == "results":
+        inputs = _BATCH_INPUTS.search(prompt)
+        items = json.loads(inputs.group(1)) if inputs else []
+        return {"results": [
+            {"id": item["id"], **{k: _fake_value(k, t, f"{tag}-{item['id']}") for k, t in fields[1:] if k != "id"}}
+            for item in items
+        ]}
+    return {k: _fake_value(k, t, tag) for k, t in fields}
+
+
+# --- FAKE FIRESTORE ---
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _DocumentRef:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    async def set(self, data):
+        await self._collection._db._io()
+        self._collection._docs[self.id] = dict(data)
+
+    async def get(self):
+        await self._collection._db._io()
+        data = self._collection._docs.get(self.id)
+        return _Snapshot(self.id, data) if data is not None else None
+
+
+class _Query:
+    def __init__(self, collection, filters=(), orders=(), fields=None, cursor=None, limit=None):
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._fields = fields
+        self._cursor = cursor
+        self._limit = limit
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, fields=self._fields,
+                     cursor=self._cursor, limit=self._limit)
+        state.update(changes)
+        return _Query(self._collection, **state)
+
+    def where(self, field, op, value):
+        if op != "==":
+            raise NotImplementedError(f"Fake Firestore only supports '==' filters, not {op!r}")
+        return self._copy(filters=self._filters + ((field, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction == "DESCENDING"),))
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def start_after(self, values):
+        return self._copy(cursor=values)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def _key(self, doc_id, data):
+        return [doc_id if field == "__name__" else data.get(field) for field, _ in self._orders]
+
+    def _compare(self, a, b):
+        for (x, y), (_, descending) in zip(zip(a, b), self._orders):
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if descending else result
+        return 0
+
+    async def stream(self):
+        await self._collection._db._io()
+        docs = [
+            (doc_id, data) for doc_id, data in self._collection._docs.items()
+            if all(data.get(field) == value for field, value in self._filters)
+        ]
+        docs.sort(key=cmp_to_key(lambda a, b: self._compare(self._key(*a), self._key(*b))))
+        if self._cursor is not None:
+            cursor_key = [self._cursor.get(field) for field, _ in self._orders]
+            docs = [d for d in docs if self._compare(self._key(*d), cursor_key) > 0]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        for doc_id, data in docs:
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield _Snapshot(doc_id, data)
+
+
+class _Collection(_Query):
+    def __init__(self, db, name):
+        self._db = db
+        self._docs = db._collections.setdefault(name, {})
+        super().__init__(self)
+
+    def document(self, doc_id=None):
+        return _DocumentRef(self, doc_id or uuid.uuid4().hex)
+
+
+class _WriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append((ref, dict(data)))
+
+    async def commit(self):
+        await self._db._io()
+        for ref, data in self._writes:
+            ref._collection._docs[ref.id] = data
+
+
+class FakeAsyncFirestore:
+    """In-memory stand-in for the async Firestore client (the calls core/words.py makes)."""
+
+    def __init__(self, latency_ms=FAKE_FIRESTORE_LATENCY_MS):
+        self.latency_ms = latency_ms
+        self._collections = {}
+
+    async def _io(self):
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    def collection(self, name):
+        return _Collection(self, name)
+
+    def batch(self):
+        return _WriteBatch(self)
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import threading
+from core.startup import LazyModule, timed
+
+# firebase_admin + Firestore take ~0.4s to import; load them on first use
+firebase_admin = LazyModule("firebase_admin")
+firestore = LazyModule("firebase_admin.firestore")
+firestore_async = LazyModule("firebase_admin.firestore_async")
+
+FIREBASE_CREDENTIALS = os.getenv("FIREBASE_CREDENTIALS", "serviceAccountKey.json")
+# "firebase" (default) or "fake": an in-memory stand-in (see core/fakes.py)
+FIRESTORE_BACKEND = os.getenv("FIRESTORE_BACKEND", "firebase")
+
+_app_ready = False
+_init_failed = False
+_init_lock = threading.Lock()
+_async_db = None
+
+def init_firebase():
+    """
+    Initializes the Firebase Admin app on first call (safe to call from a
+    warm-up thread). Returns False if Firebase could not be set up (the error
+    is logged once).
+    """
+    global _app_ready, _init_failed
+    if FIRESTORE_BACKEND == "fake":
+        return True
+    if not _app_ready and not _init_failed:
+        with _init_lock:
+            if not _app_ready and not _init_failed:
+                try:
+                    with timed("init:firebase"):
+                        cred = firebase_admin.credentials.Certificate(FIREBASE_CREDENTIALS)
+                        firebase_admin.initialize_app(cred)
+                        firestore_async.client  # Pull in the Firestore modules too
+                    _app_ready = True
+                    print("🔥 Firebase Admin initialized successfully")
+                except Exception as e:
+                    print(f"❌ Firebase initialization failed: {e}")
+                    _init_failed = True
+    return _app_ready
+
+def get_async_db():
+    """
+    The async Firestore client, or None if Firebase is unavailable.
+    Built lazily from inside the event loop, since its gRPC channel belongs to the loop.
+    """
+    global _async_db
+    if _async_db is None and FIRESTORE_BACKEND == "fake":
+        from core.fakes import FakeAsyncFirestore
+        print("🧪 FIRESTORE_BACKEND=fake: using the in-memory Firestore stand-in")
+        _async_db = FakeAsyncFirestore()
+    elif _async_db is None and init_firebase():
+        _async_db = firestore_async.client()
+    return _async_db
+
+async def async_db():
+    """
+    get_async_db() for code on the event loop: the first call runs the
+    blocking Firebase Admin init (credentials, imports) in a worker thread.
+    """
+    if _async_db is None and FIRESTORE_BACKEND != "fake":
+        await asyncio.to_thread(init_firebase)
+    return get_async_db()
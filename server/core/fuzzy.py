@@ -0,0 +1,166 @@
+import os
+import re
+import logging
+import unicodedata
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Minimum trigram similarity (Dice coefficient, 0-1) for serving a near-duplicate from cache
+CACHE_FUZZY_THRESHOLD = float(os.getenv("CACHE_FUZZY_THRESHOLD", "0.9"))
+# ...and at most this many character edits between the two inputs, which must also have
+# the same number of words: "sigma male" is not "sigma female", "no cap" is not "no cap fr"
+CACHE_FUZZY_MAX_EDITS = int(os.getenv("CACHE_FUZZY_MAX_EDITS", "1"))
+# Inputs shorter than this (after normalization) only ever match exactly
+CACHE_FUZZY_MIN_LENGTH = int(os.getenv("CACHE_FUZZY_MIN_LENGTH", "3"))
+
+# Three or more of the same character: "rizzz" / "sooo" / "哈哈哈"
+# Only letters: "888" and "666" are different numeric slang, not elongations of "88" / "66"
+_ELONGATION = re.compile(r"([^\W\d_])\1{2,}")
+
+
+def normalize_text(text):
+    """
+    Canonical form of free text typed by users, used in cache keys:
+    NFKC (full-width and compatibility forms), casefolding, punctuation
+    dropped, runs of 3+ repeated letters folded to 2, whitespace collapsed.
+    "  RIZZ ?", "Rizz!!" and "rizzz" all become "rizz"; "888" stays "888".
+    Input that is only punctuation becomes "".
+    """
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    text = "".join(" " if unicodedata.category(ch)[0] == "P" else ch for ch in text)
+    text = _ELONGATION.sub(r"\1\1", text)
+    return " ".join(text.split())
+
+
+def normalize_key(key):
+    """NFKC, casefolding and whitespace collapsing for a whole cache key (no punctuation folding)."""
+    return " ".join(unicodedata.normalize("NFKC", str(key)).casefold().split())
+
+
+def fold_marks(text):
+    """Drops diacritics (pinyin tones, Tâi-lô accents), for similarity only: "nǐ hǎo" ~ "ni hao"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return unicodedata.normalize("NFC", "".join(ch for ch in decomposed if not unicodedata.combining(ch)))
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between `a` and `b`, or limit + 1 once it is known to exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def is_variant(term, other, max_edits=CACHE_FUZZY_MAX_EDITS):
+    """
+    True when `other` is a spelling variant of `term`, not a different
+    phrase: same word count, numbers identical, within `max_edits` edits.
+    """
+    words, other_words = term.split(), other.split()
+    if len(words) != len(other_words):
+        return False
+    for word, other_word in zip(words, other_words):
+        if word != other_word and (any(ch.isdigit() for ch in word + other_word)):
+            return False  # "slang term 94" vs "slang term 7"
+    return edit_distance(term, other, max_edits) <= max_edits
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SlangIndex:
+    """
+    Character-trigram index over cached analogies, for near-duplicate lookups.
+
+    Each cache key is indexed under its context (generation|vibe|language)
+    by both the normalized input and the model's `slang_detected`, so
+    "rizzler" never borrows from another persona's "rizz" card. A candidate
+    must clear the trigram threshold AND be a spelling variant (is_variant),
+    since trigram overlap alone matches different slang that shares words.
+    Entries are persisted in a single-file-mode cache, so the index
+    survives restarts.
+    """
+
+    def __init__(self, store, threshold=CACHE_FUZZY_THRESHOLD, min_length=CACHE_FUZZY_MIN_LENGTH,
+                 max_edits=CACHE_FUZZY_MAX_EDITS):
+        self.store = store
+        self.threshold = threshold
+        self.min_length = min_length
+        self.max_edits = max_edits
+        self._postings = {}  # context -> {trigram: {term}}
+        self._terms = {}     # context -> {term: (cache_key, trigram count)}
+        self._keys = set()
+        self.stats = {"indexed": 0, "served": 0, "rejected": 0}
+        for cache_key, entry in list(store.memory_cache.items()):
+            self._add(entry["context"], entry["terms"], cache_key)
+
+    def _add(self, context, terms, cache_key):
+        self._keys.add(cache_key)
+        postings = self._postings.setdefault(context, {})
+        known = self._terms.setdefault(context, {})
+        for term in terms:
+            term = fold_marks(term)
+            if len(term) < self.min_length or term in known:
+                continue
+            grams = trigrams(term)
+            known[term] = (cache_key, len(grams))
+            for gram in grams:
+                postings.setdefault(gram, set()).add(term)
+
+    def add(self, context, text, slang_detected, cache_key):
+        """Indexes `cache_key` by its input and detected slang (once per key)."""
+        if cache_key in self._keys:
+            return
+        terms = sorted({normalize_text(text), normalize_text(slang_detected or "")} - {""})
+        self.store.set(cache_key, {"context": context, "terms": terms})
+        self._add(context, terms, cache_key)
+        self.stats["indexed"] += 1
+
+    def match(self, context, text):
+        """
+        Best indexed key for `text` within `context`.
+
+        Returns:
+            (cache_key, matched_term, score), or None below the threshold.
+        """
+        term = fold_marks(normalize_text(text))
+        known = self._terms.get(context)
+        if not known or len(term) < self.min_length:
+            return None
+        if term in known:
+            return known[term][0], term, 1.0
+        grams = trigrams(term)
+        postings = self._postings[context]
+        shared = Counter(other for gram in grams for other in postings.get(gram, ()))
+        candidates = sorted(
+            ((2 * count / (len(grams) + known[other][1]), other) for other, count in shared.items()),
+            reverse=True,
+        )
+        for score, other in candidates:
+            if score < self.threshold:
+                break
+            if is_variant(term, other, self.max_edits):
+                return known[other][0], other, score
+        return None
+
+    def record_stale(self):
+        """A match pointed at an entry that has since been evicted or expired."""
+        self.stats["rejected"] += 1
+
+    def record_served(self, text, context, matched_term, score):
+        """Audit trail for every near-duplicate answered from cache."""
+        self.stats["served"] += 1
+        logger.info("🔎 FUZZY CACHE HIT: '%s' ~ '%s' (%.2f) | %s", text, matched_term, score, context)
+
+    def snapshot(self):
+        return {**self.stats, "terms": sum(len(terms) for terms in self._terms.values())}
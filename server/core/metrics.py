@@ -0,0 +1,256 @@
+import time
+import bisect
+import threading
+
+# Prometheus-style metrics, rendered in the text exposition format by /metrics.
+# Values are per worker process; Prometheus sums them across scrape targets.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 10_485_760, 20_971_520)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *label_values, value):
+        # Per-bucket (not cumulative) counts; render() accumulates them
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = self._header()
+        for label_values, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, label_values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, label_values)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- METRICS ---
+
+HTTP_LATENCY = Histogram(
+    "verbabridge_http_request_duration_seconds", "Request latency by route.",
+    ("route", "method", "status"),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "verbabridge_http_requests_in_flight", "Requests currently being served, by route.", ("route",),
+)
+MODEL_LATENCY = Histogram(
+    "verbabridge_model_call_duration_seconds", "Gemini call latency (streams: until the last chunk).",
+    ("model", "kind", "outcome"),
+)
+MODEL_IN_FLIGHT = Gauge(
+    "verbabridge_model_calls_in_flight", "Gemini calls currently holding a concurrency slot.", ("model",),
+)
+MODEL_CONCURRENCY_LIMIT = Gauge(
+    "verbabridge_model_concurrency_limit", "Current adaptive concurrency limit per model.", ("model",),
+)
+MODEL_RETRIES = Counter(
+    "verbabridge_model_retries_total", "Gemini calls retried after a retryable error.", ("model",),
+)
+MODEL_REJECTED = Counter(
+    "verbabridge_model_rejected_total", "Gemini calls failed fast by an open circuit breaker.", ("model",),
+)
+MODEL_BREAKER_STATE = Gauge(
+    "verbabridge_model_circuit_state", "Circuit breaker state per model (0 closed, 1 half-open, 2 open).", ("model",),
+)
+MODEL_HEDGES = Counter(
+    "verbabridge_model_hedges_total", "Hedged second calls sent, and how many finished first.", ("endpoint", "result"),
+)
+MODEL_DEADLINE_EXCEEDED = Counter(
+    "verbabridge_model_deadline_exceeded_total", "Model calls abandoned at their endpoint's deadline.", ("endpoint",),
+)
+SCHEDULER_QUEUED = Gauge(
+    "verbabridge_scheduler_queued", "Model calls waiting for a scheduler slot, by traffic class.", ("class",),
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    "verbabridge_scheduler_queue_wait_seconds", "Time queued model calls waited for a scheduler slot.", ("class",),
+)
+SCHEDULER_SHED = Counter(
+    "verbabridge_scheduler_shed_total",
+    "Model calls refused by the scheduler: shed on arrival, or expired in the queue.",
+    ("class", "reason"),
+)
+MODEL_TOKENS = Counter(
+    "verbabridge_model_tokens_total", "Tokens reported in Gemini usage metadata.", ("model", "type"),
+)
+CLIENT_DISCONNECTS = Counter(
+    "verbabridge_client_disconnects_total", "Requests whose client went away before the response was ready.", ("route",),
+)
+ABANDONED_WORK = Counter(
+    "verbabridge_abandoned_work_total",
+    "Shared calls a disconnected client stopped waiting for: cancelled, or kept for other waiters.",
+    ("flight", "outcome"),
+)
+PREFETCHES = Counter(
+    "verbabridge_prefetches_total",
+    "Speculative analogy prefetches by outcome (queued, generated, consumed, over_budget, expired, ...).",
+    ("outcome",),
+)
+CACHE_REQUESTS = Counter(
+    "verbabridge_cache_requests_total", "FileSystemCache lookups by result (fresh, stale, miss).", ("result",),
+)
+CACHE_FUZZY_HITS = Counter(
+    "verbabridge_cache_fuzzy_hits_total", "Analogy misses answered from a near-duplicate input's cache entry.",
+)
+ANALOGY_CORE = Counter(
+    "verbabridge_analogy_core_total",
+    "Analogy generations by core-meaning cache result (hit: persona prompt only, miss: full prompt).",
+    ("result",),
+)
+CACHE_ERRORS = Counter(
+    "verbabridge_cache_errors_total", "FileSystemCache read/write failures.", ("operation",),
+)
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    "verbabridge_write_behind_queue_depth", "Entries spooled but not yet written, by write-behind queue.", ("queue",),
+)
+WRITE_BEHIND_FLUSH_LATENCY = Histogram(
+    "verbabridge_write_behind_flush_duration_seconds", "Time to write one write-behind batch.", ("queue", "outcome"),
+)
+UPLOAD_BYTES = Histogram(
+    "verbabridge_audio_upload_bytes", "Size of uploaded audio clips.", ("kind",), buckets=SIZE_BUCKETS,
+)
+MODEL_AUDIO_BYTES = Histogram(
+    "verbabridge_audio_model_input_bytes", "Size of audio sent to the model after preprocessing.",
+    ("kind",), buckets=SIZE_BUCKETS,
+)
+
+_USAGE_FIELDS = (
+    ("prompt_token_count", "prompt"),
+    ("candidates_token_count", "response"),
+    ("thoughts_token_count", "thoughts"),
+    ("total_token_count", "total"),
+)
+
+
+def record_usage(model, usage):
+    """Adds a response's usage_metadata to the token counters."""
+    if usage is None:
+        return
+    for field, token_type in _USAGE_FIELDS:
+        count = getattr(usage, field, None)
+        if count:
+            MODEL_TOKENS.inc(model, token_type, amount=count)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and tracks in-flight requests per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope):
+        # The route template (e.g. /api/get_words/{user_id}) keeps label cardinality bounded
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match.name == "FULL":
+                return getattr(route, "path", scope["path"])
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = self._route(scope)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(route)
+            HTTP_LATENCY.observe(route, scope["method"], str(status[0]), value=time.perf_counter() - start)
@@ -0,0 +1,157 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from core import metrics
+from core import scheduler
+from core.scheduler import Overloaded
+
+logger = logging.getLogger(__name__)
+
+# Speculative analogy prefetch for /live_translate highlight words (off unless PREFETCH_ANALOGIES=1)
+PREFETCH_ANALOGIES = os.getenv("PREFETCH_ANALOGIES", "0") == "1"
+# Global budget: prefetches started per minute, per worker
+PREFETCH_BUDGET_PER_MINUTE = float(os.getenv("PREFETCH_BUDGET_PER_MINUTE", "30"))
+# Highlight words prefetched per translation
+PREFETCH_MAX_WORDS = int(os.getenv("PREFETCH_MAX_WORDS", "3"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "100"))
+# A prefetch still waiting after this long is dropped: the user has tapped or moved on
+PREFETCH_MAX_AGE = float(os.getenv("PREFETCH_MAX_AGE", "30"))
+# Only prefetch while the model is under this fraction of its concurrency limit
+PREFETCH_IDLE_FRACTION = float(os.getenv("PREFETCH_IDLE_FRACTION", "0.5"))
+# Prefetched keys remembered for consumption stats
+PREFETCH_TRACKED_KEYS = int(os.getenv("PREFETCH_TRACKED_KEYS", "10000"))
+
+_IDLE_POLL_SECONDS = 0.2
+
+
+class Prefetcher:
+    """
+    Low-priority background generation of entries a user is likely to ask
+    for next. offer() never blocks and never fails the caller: jobs beyond
+    the budget or the queue are dropped. Workers only start a job while
+    `idle()` says there is spare model capacity, and run it in the
+    scheduler's background class. A real request that claims a running
+    job promotes it to its own class, so it never waits under background
+    limits.
+    """
+
+    def __init__(self, idle, budget_per_minute=PREFETCH_BUDGET_PER_MINUTE,
+                 concurrency=PREFETCH_CONCURRENCY, queue_size=PREFETCH_QUEUE_SIZE, max_age=PREFETCH_MAX_AGE):
+        self.idle = idle
+        self.rate = budget_per_minute / 60
+        self.burst = max(1.0, budget_per_minute / 6)
+        self.tokens = self.burst
+        self._refilled = time.monotonic()
+        self.concurrency = max(1, concurrency)
+        self.max_age = max_age
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.pending = set()
+        self.running = {}  # key -> scheduler Ticket of the job generating it
+        self.prefetched = OrderedDict()  # key -> time generated, until consumed
+        self._workers = []
+        self.stats = {
+            "offered": 0, "queued": 0, "generated": 0, "consumed": 0, "already_cached": 0,
+            "over_budget": 0, "queue_full": 0, "expired": 0, "shed": 0, "failed": 0,
+        }
+
+    def _count(self, outcome, amount=1):
+        self.stats[outcome] += amount
+        metrics.PREFETCHES.inc(outcome, amount=amount)
+
+    def _take_token(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    # --- PRODUCER SIDE ---
+
+    def offer(self, key, is_cached, fn):
+        """Queues `fn()` to fill `key` unless it is cached, already pending, or over budget."""
+        self._count("offered")
+        if key in self.pending or key in self.prefetched:
+            return
+        if is_cached():
+            self._count("already_cached")
+            return
+        if not self._take_token():
+            self._count("over_budget")
+            return
+        try:
+            self.queue.put_nowait((key, is_cached, fn, time.monotonic()))
+        except asyncio.QueueFull:
+            self.tokens += 1
+            self._count("queue_full")
+            return
+        self.pending.add(key)
+        self._count("queued")
+
+    def record_request(self, key):
+        """
+        Called for every real request. Counts prefetches that were actually
+        used: served from cache, or joined while still generating.
+        """
+        ticket = self.running.pop(key, None)  # Claimed: don't track it as unconsumed
+        if ticket is not None:
+            scheduler.promote(ticket)  # The caller is about to join this job's call
+        if self.prefetched.pop(key, None) is not None or ticket is not None:
+            self._count("consumed")
+
+    # --- WORKERS ---
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self):
+        while True:
+            key, is_cached, fn, queued_at = await self.queue.get()
+            try:
+                while not self.idle():
+                    if time.monotonic() - queued_at > self.max_age:
+                        break
+                    await asyncio.sleep(_IDLE_POLL_SECONDS)
+                if time.monotonic() - queued_at > self.max_age:
+                    self._count("expired")
+                    continue
+                if is_cached():
+                    self._count("already_cached")  # The user (or another worker) got there first
+                    continue
+                with scheduler.traffic_class("background") as ticket:
+                    self.running[key] = ticket
+                    generated = await fn()
+                if generated:
+                    self._count("generated")
+                    if key in self.running:
+                        self.prefetched[key] = time.monotonic()
+                    while len(self.prefetched) > PREFETCH_TRACKED_KEYS:
+                        self.prefetched.popitem(last=False)
+                else:
+                    self._count("failed")
+            except Overloaded:
+                self._count("shed")  # The scheduler had no room for background work
+            except Exception as e:
+                self._count("failed")
+                logger.error("Prefetch Error: %s", e)
+            finally:
+                self.pending.discard(key)
+                self.running.pop(key, None)
+
+    def snapshot(self):
+        generated = self.stats["generated"]
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize(),
+            "consumed_ratio": round(self.stats["consumed"] / generated, 3) if generated else None,
+        }
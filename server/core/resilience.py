@@ -0,0 +1,389 @@
+import os
+import re
+import time
+import random
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from core import metrics
+
+# --- CONFIGURATION ---
+# Ceiling for the adaptive concurrency limit (Gemini calls in flight per model, per worker)
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "32"))
+# Floor the limit never drops below, so a degraded model still gets probed
+MODEL_MIN_CONCURRENCY = int(os.getenv("MODEL_MIN_CONCURRENCY", "2"))
+# Multiplicative decrease applied to the limit on an overload signal (429 / 503 / timeout)
+MODEL_LIMIT_BACKOFF = float(os.getenv("MODEL_LIMIT_BACKOFF", "0.7"))
+
+# Attempts per call (first try included) for retryable errors
+MODEL_RETRY_ATTEMPTS = int(os.getenv("MODEL_RETRY_ATTEMPTS", "3"))
+MODEL_RETRY_BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.25"))
+MODEL_RETRY_MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "4"))
+# Retries allowed as a fraction of first attempts, so retries can't multiply an outage
+MODEL_RETRY_BUDGET = float(os.getenv("MODEL_RETRY_BUDGET", "0.2"))
+
+# Consecutive upstream failures that open the circuit, and how long it stays open
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+MODEL_BREAKER_COOLDOWN = float(os.getenv("MODEL_BREAKER_COOLDOWN", "10"))
+MODEL_BREAKER_MAX_COOLDOWN = float(os.getenv("MODEL_BREAKER_MAX_COOLDOWN", "60"))
+
+# Hedging: a second copy of a call goes out once the first is slower than this
+# percentile of the endpoint's recent latencies...
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+# ...but only for at most this fraction of calls, so hedges can't blow up the bill
+MODEL_HEDGE_MAX_RATE = float(os.getenv("MODEL_HEDGE_MAX_RATE", "0.05"))
+# Successful calls remembered per endpoint, and how many it takes before hedging starts
+MODEL_HEDGE_WINDOW = int(os.getenv("MODEL_HEDGE_WINDOW", "200"))
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+# "Please retry in 32.9s" / "'retryDelay': '32s'" in Gemini's RESOURCE_EXHAUSTED errors
+_RETRY_DELAY_PATTERN = re.compile(r"retry(?:Delay'?:\s*'| in )([\d.]+)s", re.IGNORECASE)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the model while its circuit is open."""
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a call (retries and hedges included) overran its endpoint's deadline."""
+
+
+class Fallback(dict):
+    """A stand-in result returned when generation failed. Never cached."""
+
+
+def is_fallback(value):
+    return isinstance(value, Fallback)
+
+
+def status_of(error):
+    """HTTP-style status of a model error (google.genai APIError has `.code`), or None."""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_timeout(error):
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(error).__name__
+
+
+def is_retryable(error):
+    if isinstance(error, CircuitOpenError):
+        return False
+    if is_timeout(error) or isinstance(error, ConnectionError) or "ConnectError" in type(error).__name__:
+        return True
+    return status_of(error) in RETRYABLE_STATUS
+
+
+def is_overload(error):
+    return is_timeout(error) or status_of(error) in OVERLOAD_STATUS
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, if the error says."""
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: +1/limit per success, x MODEL_LIMIT_BACKOFF on an
+    overload signal. At most one decrease per round trip (a burst of 429s from
+    calls that were already in flight counts once), like TCP congestion control.
+    """
+
+    def __init__(self, maximum=MODEL_CONCURRENCY, minimum=MODEL_MIN_CONCURRENCY, backoff=MODEL_LIMIT_BACKOFF):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.backoff = backoff
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_drop = 0.0
+        self._waiters = deque()
+
+    async def acquire(self):
+        """Waits (FIFO) for a slot. Returns the start time to pass to release()."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter  # _wake() hands the slot over (in_flight already counts us)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return time.monotonic()
+
+    def release(self, started, overloaded=False, succeeded=False):
+        self.in_flight -= 1
+        if overloaded and started >= self._last_drop:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._last_drop = time.monotonic()
+        elif succeeded:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+
+class CircuitBreaker:
+    """
+    Opens after MODEL_BREAKER_FAILURES consecutive upstream failures and fails
+    calls fast for the cooldown (or as long as the server asked, if longer).
+    Then lets one probe through: success closes it, failure re-opens it.
+    """
+
+    def __init__(self, failures=MODEL_BREAKER_FAILURES, cooldown=MODEL_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive = 0
+        self.open_until = 0.0
+        self.opened = 0
+
+    def allow(self):
+        if self.state == OPEN and time.monotonic() >= self.open_until:
+            self.state = HALF_OPEN
+            return True  # This caller is the probe
+        return self.state == CLOSED
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive = 0
+
+    def abandon_probe(self):
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+
+    def record_failure(self, wait=None):
+        self.consecutive += 1
+        if self.state == HALF_OPEN or self.consecutive >= self.failures:
+            cooldown = min(max(self.cooldown, wait or 0), MODEL_BREAKER_MAX_COOLDOWN)
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.open_until = time.monotonic() + cooldown
+
+
+class ModelGuard:
+    """Concurrency limit, retry policy and circuit breaker for one model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker()
+        self.retry_tokens = 10.0
+        self.stats = {"calls": 0, "retries": 0, "rejected": 0, "failures": 0}
+        metrics.MODEL_CONCURRENCY_LIMIT.set(model, value=int(self.limiter.limit))
+
+    @asynccontextmanager
+    async def slot(self):
+        """One attempt: checks the breaker, holds a concurrency slot, records the outcome."""
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            metrics.MODEL_REJECTED.inc(self.model)
+            raise CircuitOpenError(f"Circuit open for {self.model}; failing fast")
+        try:
+            started = await self.limiter.acquire()
+        except BaseException:
+            self.breaker.abandon_probe()  # A probe cancelled while queued must not wedge the breaker half-open
+            raise
+        overloaded = succeeded = recorded = False
+        try:
+            yield
+            succeeded = recorded = True
+            self.breaker.record_success()
+        except Exception as e:
+            overloaded = is_overload(e)
+            recorded = True
+            if is_retryable(e):
+                self.stats["failures"] += 1
+                self.breaker.record_failure(retry_after(e))
+            else:
+                # Bad requests and safety blocks still mean the model answered
+                self.breaker.record_success()
+            raise
+        finally:
+            if not recorded:
+                self.breaker.abandon_probe()  # Cancelled mid-call: let the next caller probe
+            self.limiter.release(started, overloaded=overloaded, succeeded=succeeded)
+            metrics.MODEL_CONCURRENCY_LIMIT.set(self.model, value=int(self.limiter.limit))
+            metrics.MODEL_BREAKER_STATE.set(self.model, value=_STATE_VALUES[self.breaker.state])
+
+    def first_attempt(self):
+        self.stats["calls"] += 1
+        self.retry_tokens = min(10.0, self.retry_tokens + MODEL_RETRY_BUDGET)
+
+    def retry_delay(self, attempt, error):
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up."""
+        if attempt >= MODEL_RETRY_ATTEMPTS or not is_retryable(error) or self.breaker.state == OPEN:
+            return None
+        wait = retry_after(error)
+        if wait is not None and wait > MODEL_RETRY_MAX_DELAY:
+            return None  # Server wants longer than a user will wait; the breaker takes it from here
+        if self.retry_tokens < 1:
+            return None
+        self.retry_tokens -= 1
+        self.stats["retries"] += 1
+        metrics.MODEL_RETRIES.inc(self.model)
+        # Full jitter: spreads retries out so callers don't come back in lockstep
+        ceiling = min(MODEL_RETRY_MAX_DELAY, MODEL_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        return max(wait or 0, random.uniform(0, ceiling))
+
+    async def run(self, fn):
+        """Awaits `fn()` under the guard, retrying retryable errors with backoff."""
+        self.first_attempt()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self.slot():
+                    return await fn()
+            except Exception as e:
+                delay = self.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def has_spare_capacity(self, fraction):
+        """True while the model is healthy and under `fraction` of its concurrency limit, nothing queued."""
+        limiter = self.limiter
+        return self.breaker.state == CLOSED and not limiter.queued and limiter.in_flight < limiter.limit * fraction
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "queued": self.limiter.queued,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+        }
+
+
+class Hedger:
+    """
+    Hedged calls for one endpoint. When the first call hasn't returned after
+    MODEL_HEDGE_PERCENTILE of the endpoint's recent latencies, a second copy
+    goes out; whichever finishes first wins and the other is cancelled.
+    Hedges are budgeted to MODEL_HEDGE_MAX_RATE of calls, and are skipped
+    while the model is queueing or its circuit isn't closed.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.latencies = deque(maxlen=MODEL_HEDGE_WINDOW)
+        self.hedge_tokens = 1.0
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0}
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there's too little history."""
+        if len(self.latencies) < max(1, MODEL_HEDGE_MIN_SAMPLES):
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * MODEL_HEDGE_PERCENTILE / 100))
+        return ordered[index]
+
+    def _take_token(self, guard):
+        if guard.breaker.state != CLOSED or guard.limiter.queued:
+            return False  # Hedging an overloaded model only makes it slower
+        if self.hedge_tokens < 1:
+            return False
+        self.hedge_tokens -= 1
+        return True
+
+    async def run(self, guard, fn):
+        """Awaits `fn()` under `guard`, racing a second copy if the first is slow."""
+        self.stats["calls"] += 1
+        self.hedge_tokens = min(10.0, self.hedge_tokens + MODEL_HEDGE_MAX_RATE)
+        started = time.monotonic()
+        delay = self.delay()
+        primary = asyncio.ensure_future(guard.run(fn))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+                if not primary.done() and self._take_token(guard):
+                    self.stats["hedged"] += 1
+                    metrics.MODEL_HEDGES.inc(self.endpoint, "sent")
+                    tasks.append(asyncio.ensure_future(guard.run(fn)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task in done and task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_won"] += 1
+                            metrics.MODEL_HEDGES.inc(self.endpoint, "won")
+                        self.latencies.append(time.monotonic() - started)
+                        return task.result()
+            return primary.result()  # Every copy failed: raise the first call's error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()  # The loser (or both, if our caller gave up)
+
+    def snapshot(self):
+        delay = self.delay()
+        return {
+            **self.stats,
+            "hedge_delay_ms": None if delay is None else round(delay * 1000, 1),
+            "samples": len(self.latencies),
+        }
+
+
+async def within_deadline(call, deadline, endpoint):
+    """Awaits `call`, raising DeadlineExceeded (and cancelling it) after `deadline` seconds."""
+    try:
+        return await asyncio.wait_for(call, timeout=deadline)
+    except asyncio.TimeoutError:
+        metrics.MODEL_DEADLINE_EXCEEDED.inc(endpoint)
+        raise DeadlineExceeded(f"{endpoint} exceeded its {deadline:g}s deadline") from None
+
+
+_guards = {}
+_hedgers = {}
+
+
+def guard(model):
+    """The shared ModelGuard for `model`."""
+    if model not in _guards:
+        _guards[model] = ModelGuard(model)
+    return _guards[model]
+
+
+def hedger(endpoint):
+    """The shared Hedger for `endpoint`."""
+    if endpoint not in _hedgers:
+        _hedgers[endpoint] = Hedger(endpoint)
+    return _hedgers[endpoint]
+
+
+def snapshot():
+    return {model: g.snapshot() for model, g in _guards.items()}
+
+
+def hedge_snapshot():
+    return {endpoint: h.snapshot() for endpoint, h in _hedgers.items()}
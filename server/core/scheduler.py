@@ -0,0 +1,296 @@
+import os
+import math
+import time
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from core import metrics, resilience
+
+
+def _class_setting(name, setting, default):
+    return float(os.getenv(f"SCHEDULER_{name.upper()}_{setting}", default))
+
+
+# --- CONFIGURATION ---
+# Traffic classes, in priority order: (name, weight, concurrency cap, max queue wait in seconds).
+# Each can be tuned with SCHEDULER_<CLASS>_WEIGHT / _CONCURRENCY / _MAX_WAIT.
+# When the model is saturated, queued calls are started in proportion to their class weight.
+_DEFAULT_CLASSES = (
+    ("interactive", 8, 32, 2),   # /live_translate, /generate_analogy and their streams
+    ("audio", 4, 12, 5),         # /live_translate_audio, /generate_analogy_audio
+    ("bulk", 1, 6, 20),          # /api/tts synthesis, batch endpoints
+    ("background", 1, 2, 10),    # Speculative prefetches
+)
+TRAFFIC_CLASSES = {
+    name: (
+        _class_setting(name, "WEIGHT", weight),
+        int(_class_setting(name, "CONCURRENCY", concurrency)),
+        _class_setting(name, "MAX_WAIT", max_wait),
+    )
+    for name, weight, concurrency, max_wait in _DEFAULT_CLASSES
+}
+
+# Which class a model call's endpoint belongs to; anything unlisted is bulk
+ENDPOINT_CLASSES = {
+    "live_translate": "interactive",
+    "generate_analogy": "interactive",
+    "live_translate_audio": "audio",
+    "generate_analogy_audio": "audio",
+    "tts": "bulk",
+    "live_translate_batch": "bulk",
+    "generate_analogy_batch": "bulk",
+}
+DEFAULT_CLASS = "bulk"
+
+# Weight of the newest call in the per-class service time average
+_SERVICE_TIME_SMOOTHING = 0.2
+
+# Overrides the endpoint's class for calls made inside traffic_class() (a Ticket)
+_current_class = contextvars.ContextVar("traffic_class", default=None)
+
+
+class Overloaded(Exception):
+    """Raised instead of running a call whose class can't start it within its max queue wait (`retry_after`: whole seconds)."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    The class override for calls made under traffic_class(). Tasks started
+    inside the block share it, so promote() reaches a coalesced call too.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+
+class _Promoted(Exception):
+    """Set on a queued call's waiter by promote(): queue again in the new class."""
+
+
+class TrafficClass:
+    def __init__(self, name, weight, concurrency, max_wait):
+        self.name = name
+        self.weight = max(weight, 0.01)
+        self.concurrency = max(1, concurrency)
+        self.max_wait = max_wait
+        self.queue = []  # [model, waiter future, ticket], FIFO
+        self.in_flight = 0
+        self.pass_value = 0.0  # Virtual time: grows by 1/weight per call started
+        self.service_time = None
+        self.stats = {"started": 0, "waited": 0, "shed": 0, "expired": 0}
+
+    def estimated_wait(self, slots):
+        """Rough queueing delay for a new call: the calls ahead of it, `slots` at a time."""
+        if self.service_time is None or (not self.queue and self.in_flight < self.concurrency):
+            return 0.0
+        return (len(self.queue) + 1) * self.service_time / max(1, min(slots, self.concurrency))
+
+    def record_service_time(self, seconds):
+        if self.service_time is None:
+            self.service_time = seconds
+        else:
+            self.service_time += _SERVICE_TIME_SMOOTHING * (seconds - self.service_time)
+
+
+class Scheduler:
+    """
+    Priority-aware admission for model calls, in front of the resilience guard.
+
+    Every call belongs to a traffic class with its own FIFO queue,
+    concurrency cap and max queue wait. A call starts at once while its
+    class is under its cap and the model under `capacity(model)` (the
+    guard's adaptive limit). Otherwise it queues, and freed slots go to
+    the class with the lowest pass value (stride scheduling), so each
+    backlogged class gets slots in proportion to its weight and a TTS
+    burst can't starve /live_translate. Calls that would wait longer than
+    their class allows raise Overloaded instead, up front when the
+    estimated wait is already too long.
+    """
+
+    def __init__(self, classes=TRAFFIC_CLASSES, capacity=None):
+        self.classes = {name: TrafficClass(name, *settings) for name, settings in classes.items()}
+        self.capacity = capacity or (lambda model: int(resilience.guard(model).limiter.limit))
+        self.in_flight = {}  # model -> calls holding a slot
+        self.pass_value = 0.0
+
+    def _has_capacity(self, model):
+        return self.in_flight.get(model, 0) < self.capacity(model)
+
+    def _start(self, cls, model):
+        # A class that was idle rejoins at the current virtual time instead of spending saved-up credit
+        cls.pass_value = max(cls.pass_value, self.pass_value) + 1 / cls.weight
+        cls.in_flight += 1
+        cls.stats["started"] += 1
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+
+    def _finish(self, cls, model):
+        cls.in_flight -= 1
+        self.in_flight[model] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hands free slots to queued calls, lowest pass value first."""
+        while True:
+            best = None
+            for cls in self.classes.values():
+                if cls.in_flight >= cls.concurrency:
+                    continue
+                entry = next((e for e in cls.queue if self._has_capacity(e[0])), None)
+                if entry and (best is None or cls.pass_value < best[0].pass_value):
+                    best = (cls, entry)
+            if best is None:
+                return
+            cls, entry = best
+            cls.queue.remove(entry)
+            model, waiter, _ = entry
+            metrics.SCHEDULER_QUEUED.dec(cls.name)
+            self.pass_value = cls.pass_value
+            self._start(cls, model)  # The waiter owns the slot from here
+            waiter.set_result(None)
+
+    def _shed(self, cls, reason, retry_after):
+        cls.stats[reason] += 1
+        metrics.SCHEDULER_SHED.inc(cls.name, reason)
+        retry_after = max(1, math.ceil(retry_after))
+        raise Overloaded(f"Too busy for {cls.name} traffic; retry in {retry_after}s", retry_after)
+
+    def promote(self, ticket):
+        """
+        Calls under `ticket` use their endpoint's own class from now on, e.g.
+        once a real request joins a prefetch. Calls still queued move over;
+        ones already running keep their slot.
+        """
+        if ticket.name is None:
+            return
+        ticket.name = None
+        for cls in self.classes.values():
+            for entry in [e for e in cls.queue if e[2] is ticket]:
+                cls.queue.remove(entry)
+                metrics.SCHEDULER_QUEUED.dec(cls.name)
+                entry[1].set_exception(_Promoted())
+
+    async def _acquire(self, cls, model, ticket):
+        if not cls.queue and cls.in_flight < cls.concurrency and self._has_capacity(model):
+            self._start(cls, model)
+            return
+        wait = cls.estimated_wait(self.capacity(model))
+        if wait > cls.max_wait:
+            self._shed(cls, "shed", wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = [model, waiter, ticket]
+        cls.queue.append(entry)
+        cls.stats["waited"] += 1
+        metrics.SCHEDULER_QUEUED.inc(cls.name)
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=cls.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and waiter.exception() is not None:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise _Promoted() from None  # Promoted just as the wait ran out
+            elif waiter.done():
+                if isinstance(e, asyncio.TimeoutError):
+                    return  # Handed a slot just as the wait ran out: use it
+                self._finish(cls, model)
+            else:
+                waiter.cancel()
+                cls.queue.remove(entry)
+                metrics.SCHEDULER_QUEUED.dec(cls.name)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._shed(cls, "expired", cls.max_wait)
+            raise
+        finally:
+            metrics.SCHEDULER_QUEUE_WAIT.observe(cls.name, value=time.monotonic() - queued_at)
+
+    async def acquire(self, endpoint, model):
+        """
+        Waits for a slot for `endpoint`'s class, or raises Overloaded.
+        Returns a Slot; release() it when the call is over.
+        """
+        ticket = _current_class.get()
+        while True:
+            cls = self.classes[(ticket and ticket.name) or ENDPOINT_CLASSES.get(endpoint, DEFAULT_CLASS)]
+            try:
+                await self._acquire(cls, model, ticket)
+                return Slot(self, cls, model)
+            except _Promoted:
+                continue
+
+    @asynccontextmanager
+    async def slot(self, endpoint, model):
+        """Holds a slot for one model call (retries and hedges included) for `endpoint`'s class."""
+        held = await self.acquire(endpoint, model)
+        try:
+            yield
+        finally:
+            held.release()
+
+    def snapshot(self):
+        return {
+            name: {
+                **cls.stats,
+                "weight": cls.weight,
+                "concurrency": cls.concurrency,
+                "max_wait_s": cls.max_wait,
+                "in_flight": cls.in_flight,
+                "queued": len(cls.queue),
+                "service_time_ms": None if cls.service_time is None else round(cls.service_time * 1000, 1),
+            }
+            for name, cls in self.classes.items()
+        }
+
+
+class Slot:
+    """A held scheduler slot. release() is idempotent."""
+
+    def __init__(self, scheduler, cls, model):
+        self.scheduler = scheduler
+        self.cls = cls
+        self.model = model
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.cls.record_service_time(time.monotonic() - self.started)
+        self.scheduler._finish(self.cls, self.model)
+
+
+@contextmanager
+def traffic_class(name):
+    """Runs model calls made inside the block (and tasks it starts) as class `name`. Yields the Ticket."""
+    ticket = Ticket(name)
+    token = _current_class.set(ticket)
+    try:
+        yield ticket
+    finally:
+        _current_class.reset(token)
+
+
+_scheduler = Scheduler()
+
+
+def slot(endpoint, model):
+    """A slot from the shared Scheduler."""
+    return _scheduler.slot(endpoint, model)
+
+
+async def acquire(endpoint, model):
+    """A Slot from the shared Scheduler, held until released (e.g. across a streamed response)."""
+    return await _scheduler.acquire(endpoint, model)
+
+
+def promote(ticket):
+    """See Scheduler.promote()."""
+    _scheduler.promote(ticket)
+
+
+def snapshot():
+    return _scheduler.snapshot()
@@ -0,0 +1,71 @@
+import asyncio
+from core import metrics
+
+
+class SingleFlight:
+    """
+    In-process request coalescing.
+    Concurrent callers that share a key await ONE in-flight task instead of
+    each paying for their own Gemini call.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.inflight = {}
+        self.waiters = {}
+        self.stats = {"hit": 0, "coalesced": 0, "miss": 0, "cancelled": 0, "kept": 0}
+
+    def record_hit(self):
+        """Called by the route when the key was served straight from cache."""
+        self.stats["hit"] += 1
+
+    async def do(self, key, fn):
+        """
+        Runs `fn()` once per key at a time.
+
+        Returns:
+            (result, coalesced): `coalesced` is True when this caller joined
+            a call that another request had already started.
+        """
+        task = self.inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["miss"] += 1
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            self.waiters[task] = 0
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        self.waiters[task] += 1
+        try:
+            # Shield so one impatient caller can't cancel the work others still wait for
+            return await asyncio.shield(task), coalesced
+        except asyncio.CancelledError:
+            self._leave(task)
+            raise
+        finally:
+            if task in self.waiters:
+                self.waiters[task] -= 1
+
+    def _leave(self, task):
+        """A waiter was cancelled: the call is only cancelled once nobody else wants it."""
+        if task.done():
+            return
+        outcome = "kept" if self.waiters[task] > 1 else "cancelled"
+        self.stats[outcome] += 1
+        metrics.ABANDONED_WORK.inc(self.name, outcome)
+        if outcome == "cancelled":
+            task.cancel()
+
+    def _finish(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        self.waiters.pop(task, None)
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self):
+        return {**self.stats, "in_flight": len(self.inflight)}
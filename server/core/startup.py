@@ -0,0 +1,66 @@
+import time
+import importlib
+import threading
+from contextlib import contextmanager
+
+# Cold-start clock: main.py imports this module before anything heavy
+PROCESS_START = time.perf_counter()
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def record(component, seconds):
+    with _timings_lock:
+        _timings[component] = seconds
+
+
+@contextmanager
+def timed(component):
+    """Records how long the block takes under `component` (e.g. "init:cache")."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(component, time.perf_counter() - start)
+
+
+def since_start():
+    return time.perf_counter() - PROCESS_START
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module that is imported on first attribute access
+    (e.g. `types.GenerateContentConfig`), so importing our code stays cheap.
+    The import time is recorded as "import:<name>".
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                with timed(f"import:{self._name}"):
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+
+def report():
+    """Startup timings in milliseconds, in the order they were recorded."""
+    with _timings_lock:
+        return {component: round(seconds * 1000, 1) for component, seconds in _timings.items()}
+
+
+def format_report():
+    return " | ".join(f"{component}: {ms:.0f}ms" for component, ms in report().items())
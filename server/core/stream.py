@@ -0,0 +1,126 @@
+import json
+
+
+def sse(event, data):
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class JsonFieldStream:
+    """
+    Incremental reader for a streamed top-level JSON object.
+
+    Feed it text chunks as they arrive from the model; it returns events for
+    every value that has become complete since the last chunk:
+      ("field", name, value)        - a finished top-level field
+      ("item", name, index, value)  - a finished element of a top-level array
+    Each character is scanned once, so total work is linear in the response.
+    """
+
+    def __init__(self):
+        self._state = "start"
+        self._key = None
+        self._array = None
+        self._raw = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        events = []
+        for ch in chunk:
+            self._step(ch, events)
+        return events
+
+    def _reset_scanner(self):
+        self._raw = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _scan(self, ch, terminators):
+        """Adds `ch` to the current value. Returns True if `ch` ended the value instead."""
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+        elif ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif self._depth == 0 and ch in terminators:
+            return True
+        elif ch in "}]":
+            self._depth -= 1
+        self._raw.append(ch)
+        return False
+
+    def _take_value(self):
+        value = json.loads("".join(self._raw))
+        self._reset_scanner()
+        return value
+
+    def _step(self, ch, events):
+        state = self._state
+
+        if state == "start":
+            if ch == "{":
+                self._state = "key"
+        elif state == "key":
+            if ch == '"':
+                self._raw = ['"']
+                self._in_string = True
+                self._state = "key_string"
+            elif ch == "}":
+                self._state = "end"
+        elif state == "key_string":
+            self._scan(ch, "")
+            if not self._in_string:
+                self._key = self._take_value()
+                self._state = "colon"
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value_start"
+        elif state == "value_start":
+            if ch.isspace():
+                return
+            if ch == "[":
+                self._array = []
+                self._state = "element_start"
+            else:
+                self._state = "value"
+                self._scan(ch, ",}")
+        elif state == "value":
+            if self._scan(ch, ",}"):
+                events.append(("field", self._key, self._take_value()))
+                self._state = "key" if ch == "," else "end"
+        elif state == "element_start":
+            if ch.isspace():
+                return
+            if ch == "]":
+                self._finish_array(events)
+            else:
+                self._state = "element"
+                self._scan(ch, ",]")
+        elif state == "element":
+            if self._scan(ch, ",]"):
+                value = self._take_value()
+                events.append(("item", self._key, len(self._array), value))
+                self._array.append(value)
+                if ch == "]":
+                    self._finish_array(events)
+                else:
+                    self._state = "element_start"
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "key"
+            elif ch == "}":
+                self._state = "end"
+
+    def _finish_array(self, events):
+        events.append(("field", self._key, self._array))
+        self._array = None
+        self._state = "after_value"
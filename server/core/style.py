@@ -1,7 +1,20 @@
+import os
 import json
-from google.genai import types
-from core.client import client
+import logging
+from core.client import generate_content, generate_content_stream, unpack_batch, types
+from core.resilience import Fallback
+from core.scheduler import Overloaded
 
+logger = logging.getLogger(__name__)
+
+# Model behind every live translation prompt
+LIVE_TRANSLATE_MODEL = "gemini-3-flash-preview"
+
+# Per-call deadlines in seconds (0 = none). Past it, live_translate() serves its fallback
+LIVE_TRANSLATE_DEADLINE = float(os.getenv("LIVE_TRANSLATE_DEADLINE", "8"))
+LIVE_AUDIO_DEADLINE = float(os.getenv("LIVE_AUDIO_DEADLINE", "20"))
+# Race a second call when the first is slower than usual (see resilience.Hedger)
+LIVE_TRANSLATE_HEDGE = os.getenv("LIVE_TRANSLATE_HEDGE", "1") == "1"
 
 LANG_MAP = {
     "en": "English",
@@ -39,7 +52,7 @@ async def live_translate(live_text: str, user_vibe: str, preferred_language: str
     """
     actual_language = LANG_MAP.get(preferred_language, "English")
 
-    print(f"🔴 Live Translate: '{live_text}' | Vibe: {user_vibe} | Lang: {actual_language}")
+    logger.info("🔴 Live Translate: '%s' | Vibe: %s | Lang: %s", live_text, user_vibe, actual_language)
     try:
         prompt = LIVE_TRANSLATE_PROMPT.format(
             live_text=live_text,
@@ -47,21 +60,110 @@ async def live_translate(live_text: str, user_vibe: str, preferred_language: str
             preferred_language=actual_language,
         )
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
+        response = await generate_content(
+            model=LIVE_TRANSLATE_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
                 temperature=0.5,
             ),
+            endpoint="live_translate",
+            deadline=LIVE_TRANSLATE_DEADLINE,
+            hedge=LIVE_TRANSLATE_HEDGE,
         )
         return json.loads(response.text)
+    except Overloaded:
+        raise  # Shed by the scheduler: the route answers 503 instead of a fallback
     except Exception as e:
-        print(f"❌ Live Translate Error: {e}")
-        return {
+        logger.error("❌ Live Translate Error: %s", e)
+        # Served to the user, but never cached (see FileSystemCache.set)
+        return Fallback({
             "translated_text": live_text,
             "highlight_words": [],
-        }
+        })
+
+async def stream_live_translate(live_text: str, user_vibe: str, preferred_language: str, slot=None):
+    """
+    Streaming variant of live_translate(): yields the raw JSON text in
+    chunks as Gemini produces it. Errors propagate to the caller. `slot`:
+    a scheduler slot the caller already holds (see generate_content_stream).
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+
+    logger.info("🔴 Live Translate (stream): '%s' | Vibe: %s | Lang: %s", live_text, user_vibe, actual_language)
+    prompt = LIVE_TRANSLATE_PROMPT.format(
+        live_text=live_text,
+        user_vibe=user_vibe,
+        preferred_language=actual_language,
+    )
+    async for chunk in generate_content_stream(
+        model=LIVE_TRANSLATE_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.5,
+        ),
+        endpoint="live_translate",
+        slot=slot,
+    ):
+        if chunk.text:
+            yield chunk.text
+
+# --- LIVE TRANSLATION PROMPT (TEXT, BATCHED) ---
+BATCH_LIVE_TRANSLATE_PROMPT = """
+You are the GenBridge Linguistic Anthropologist and Empathy Translator.
+Your goal is to bridge the generational gap by translating modern internet slang into clear, respectful language suitable for a senior citizen.
+
+Target Audience Vibe: "{user_vibe}"
+Preferred Output Language: "{preferred_language}" (e.g., 'en' for English, 'ch' for Chinese, 'ms' for Malay)
+Input texts (JSON array; translate EACH one independently):
+{inputs}
+
+### 🧠 TRANSLATION LOGIC (apply to every input):
+1. Identify the modern lore/slang.
+2. **ZERO DROP RULE (CRITICAL):** You MUST translate the ENTIRE sentence. Do NOT delete English words, names, or titles (Uncle, Auntie, Bro, Boss).
+3. **IDENTITY RULE (CRITICAL):** If the input is ALREADY polite and naturally matches the {user_vibe} AND the {preferred_language}, do NOT truncate or delete anything. Output the full, exact sentence as-is.
+4. Apply the linguistic rules of the {user_vibe}.
+5. **OUTPUT LANGUAGE (CRITICAL):** Every `translated_text` MUST be written in the {preferred_language} language.
+
+Return ONLY a strict JSON object with exactly one entry in "results" per input, using this exact schema:
+{{
+  "results": [
+    {{
+      "id": "The id of the input this entry answers",
+      "translated_text": "The fully translated, complete sentence written in {preferred_language}.",
+      "highlight_words": ["slang_word_1", "slang_word_2"]
+    }}
+  ]
+}}
+"""
+
+async def live_translate_batch(live_texts: list, user_vibe: str, preferred_language: str):
+    """
+    Translates several texts in ONE Gemini call (same vibe / language).
+
+    Returns:
+        list: one result dict per input, in input order (None where the model
+        skipped an input). Errors propagate so the caller can fail the chunk.
+    """
+    actual_language = LANG_MAP.get(preferred_language, "English")
+
+    logger.info("🔴 Live Translate Batch: %s texts | Vibe: %s | Lang: %s", len(live_texts), user_vibe, actual_language)
+    prompt = BATCH_LIVE_TRANSLATE_PROMPT.format(
+        inputs=json.dumps([{"id": i, "text": text} for i, text in enumerate(live_texts)], ensure_ascii=False),
+        user_vibe=user_vibe,
+        preferred_language=actual_language,
+    )
+    response = await generate_content(
+        model=LIVE_TRANSLATE_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            temperature=0.5,
+        ),
+        endpoint="live_translate_batch",
+    )
+    return unpack_batch(json.loads(response.text), len(live_texts))
 
 # --- LIVE TRANSLATION PROMPT (AUDIO) ---
 AUDIO_TRANSLATE_PROMPT = """
@@ -92,15 +194,15 @@ async def live_translate_audio(audio_bytes: bytes, mime_type: str, user_vibe: st
     """
     actual_language = LANG_MAP.get(preferred_language, "English")
 
-    print(f"🎙️ Live Audio Translate | Vibe: {user_vibe} | Lang: {preferred_language} | Size: {len(audio_bytes)} bytes")
+    logger.info("🎙️ Live Audio Translate | Vibe: %s | Lang: %s | Size: %s bytes", user_vibe, preferred_language, len(audio_bytes))
     try:
         prompt = AUDIO_TRANSLATE_PROMPT.format(
             user_vibe=user_vibe,
             preferred_language=actual_language
         )
 
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview", # Flash models are incredibly fast at audio
+        response = await generate_content(
+            model=LIVE_TRANSLATE_MODEL, # Flash models are incredibly fast at audio
             contents=[
                 types.Part.from_bytes(data=audio_bytes, mime_type=mime_type),
                 prompt
@@ -109,8 +211,10 @@ async def live_translate_audio(audio_bytes: bytes, mime_type: str, user_vibe: st
                 response_mime_type="application/json",
                 temperature=0.4, # Lower temperature for better transcription accuracy
             ),
+            endpoint="live_translate_audio",
+            deadline=LIVE_AUDIO_DEADLINE,
         )
         return json.loads(response.text)
     except Exception as e:
-        print(f"❌ Audio Translate Error: {e}")
+        logger.error("❌ Audio Translate Error: %s", e)
         raise e
\ No newline at end of file
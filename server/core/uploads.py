@@ -0,0 +1,94 @@
+import os
+import hashlib
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# Largest request body accepted on audio upload routes (Gemini's inline limit is 20MB)
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Uploaded files above this size are spooled to a temp file instead of held in memory
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(256 * 1024)))
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class _UploadParser(MultiPartParser):
+    spool_max_size = UPLOAD_SPOOL_BYTES
+
+
+class UploadRequest(Request):
+    """A Request whose multipart files spool to disk above UPLOAD_SPOOL_BYTES instead of Starlette's 1MB."""
+
+    async def _get_form(self, *, max_files=1000, max_fields=1000, max_part_size=1024 * 1024):
+        if self._form is None and self.headers.get("content-type", "").startswith("multipart/form-data"):
+            parser = _UploadParser(
+                self.headers, self.stream(), max_files=max_files, max_fields=max_fields, max_part_size=max_part_size
+            )
+            try:
+                self._form = await parser.parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields, max_part_size=max_part_size)
+
+
+class UploadRoute(APIRoute):
+    """Route class for upload endpoints: hands them an UploadRequest. Other routes keep Starlette's defaults."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def upload_handler(request):
+            return await handler(UploadRequest(request.scope, request.receive))
+
+        return upload_handler
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects oversized request bodies on `paths` with 413 while they stream in,
+    so a huge upload is cut off early instead of being parsed and spooled in full.
+    """
+
+    def __init__(self, app, paths, max_bytes=UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        detail = f"Upload exceeds {self.max_bytes} bytes"
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Surfaces from body parsing as a regular 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def digest_upload(file):
+    """
+    SHA-256 of an UploadFile, read in chunks (the file may be spooled on disk).
+    Leaves the file rewound. Returns (hexdigest, size).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    while chunk := await file.read(_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    await file.seek(0)
+    return digest.hexdigest(), size
@@ -1,15 +1,32 @@
+import os
 import re
 import unicodedata
-from taibun import Converter
+import threading
+from functools import lru_cache
+from core.startup import timed
 
 # --- CONFIGURATION ---
 # We use 'Tailo' as the base because it preserves tone marks accurately,
-# which allows us to convert them to Penang style numbers later. 
-try:
-    t_converter = Converter(system='Tailo', dialect='south')
-except ImportError:
-    print("⚠ Warning: 'taibun' library not found. Install with: pip install taibun")
-    t_converter = None
+# which allows us to convert them to Penang style numbers later.
+# The converter loads its dictionaries on first use (see get_converter).
+_converter = None
+_converter_lock = threading.Lock()
+_converter_missing = False
+
+def get_converter():
+    """The shared taibun Converter, built on first use. None if taibun isn't installed."""
+    global _converter, _converter_missing
+    if _converter is None and not _converter_missing:
+        with _converter_lock:
+            if _converter is None and not _converter_missing:
+                try:
+                    with timed("init:taibun"):
+                        from taibun import Converter
+                        _converter = Converter(system='Tailo', dialect='south')
+                except ImportError:
+                    print("⚠ Warning: 'taibun' library not found. Install with: pip install taibun")
+                    _converter_missing = True
+    return _converter
 
 def _get_tone_number(word_with_diacritics):
     """
@@ -42,69 +59,97 @@ def _get_tone_number(word_with_diacritics):
     # 3. Default (Tone 1)
     return 1
 
+# --- PRECOMPILED PATTERNS ---
+# Irregularities in Penang dialect compared to Taiwan (Pronouns & Particles)
+_PARTICLE_REPLACEMENTS = {
+    'tāi-tsì': 'dai3-ci3',  # "Matter/Problem"
+    'lí': 'lu1',            # You
+    'góa': 'wa1',           # Me
+    'guá': 'wa1',           # Me (variant)
+    'ko̍k': 'lor1',          # Particle
+    'koh': 'lor1',          # Particle
+    'ni': 'ni1',            # Particle
+}
+# One alternation pass instead of one re.sub per entry (longest first)
+_PARTICLE_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(re.escape(k) for k in sorted(_PARTICLE_REPLACEMENTS, key=len, reverse=True)) + r')\b'
+)
+# Words that contain letters or diacritics
+_WORD_PATTERN = re.compile(r'(?<!\d)\b[a-z\u00C0-\u024F\u1E00-\u1EFF\u0300-\u036F]+\b')
+_DIGIT_PATTERN = re.compile(r'\d')
+
+# Penang spelling rules, applied in order
+_SPELLING_RULES = (
+    ("ts", "c"),    # ts -> c
+    ("tsh", "ch"),  # tsh -> ch
+    ("ue", "ua"),   # ue -> ua
+    ("ing", "eng"), # ing -> eng
+    ("oo", "or"),   # oo -> or
+    ("ou", "au"),   # ou -> au
+    ("ph", "p"),    # (Optional preference, keep ph if standard)
+)
+
+_TONE_MARKS = {
+    '\u0301': 4,   # Acute (á)
+    '\u0300': 3,   # Grave (à)
+    '\u0302': 2,   # Circumflex (â)
+    '\u0304': 33,  # Macron (ā)
+    '\u030d': 1,   # Vertical line (a̍)
+}
+
+# Bounded memo tables: syllables repeat constantly, phrases repeat across cards
+ROMANIZATION_SYLLABLE_CACHE = int(os.getenv("ROMANIZATION_SYLLABLE_CACHE", "8192"))
+ROMANIZATION_PHRASE_CACHE = int(os.getenv("ROMANIZATION_PHRASE_CACHE", "4096"))
+
+@lru_cache(maxsize=ROMANIZATION_SYLLABLE_CACHE)
+def _penang_syllable(word):
+    """One Tâi-lô syllable -> Penang spelling + tone number (single NFD pass)."""
+    # Skip if it already has a number (handled by the particle pass)
+    if _DIGIT_PATTERN.search(word): return word
+
+    norm_word = unicodedata.normalize('NFD', word)
+    tone = next((_TONE_MARKS[c] for c in norm_word if c in _TONE_MARKS), None)
+
+    # Strip Diacritics for the final spelling
+    base_word = "".join(c for c in norm_word if unicodedata.category(c) != 'Mn')
+    if tone is None:
+        # Checked tones (p/t/k/h with no mark) -> 3, otherwise 1
+        tone = 3 if base_word and base_word[-1] in "ptkh" else 1
+
+    for old, new in _SPELLING_RULES:
+        base_word = base_word.replace(old, new)
+    return f"{base_word}{tone}"
+
+def _replace_particle(match):
+    return _PARTICLE_REPLACEMENTS[match.group(0)]
+
+def _replace_word(match):
+    return _penang_syllable(match.group(0))
+
 def penang_patch(tailo_text):
     """
     Converts Standard Taiwanese Tailo -> Penang Hokkien (Taiji Romanisation).
     Example: "Lí hó" -> "Lu1 ho4"
     """
     if not tailo_text: return ""
-    
+
     # 1. Normalize
     text = tailo_text.lower().strip()
-
     # 2. Hardcoded Common Substitutions (Pronouns & Particles)
-    # These are irregularities in Penang dialect compared to Taiwan
-    replacements = {
-        r'\blí\b': 'lu1',      # You
-        r'\bgóa\b': 'wa1',     # Me
-        r'\bguá\b': 'wa1',     # Me (variant)
-        r'\bko̍k\b': 'lor1',    # Particle
-        r'\bkoh\b': 'lor1',    # Particle
-        r'\bni\b': 'ni1',      # Particle
-        r'\btāi-tsì\b': 'dai3-ci3' # "Matter/Problem"
-    }
-    
-    for pattern, repl in replacements.items():
-        text = re.sub(pattern, repl, text)
-
-    # 3. Word Processing Function
-    def process_word(match):
-        word = match.group(0)
-        # Skip if it already has a number (handled by step 2)
-        if re.search(r'\d', word): return word
-        
-        # Determine Tone
-        tone = _get_tone_number(word)
-        
-        # Strip Diacritics for the final spelling
-        # Normalize to NFD, filter out non-spacing marks (Mn)
-        base_word = "".join(c for c in unicodedata.normalize('NFD', word) 
-                            if unicodedata.category(c) != 'Mn')
-        
-        # Apply Penang Spelling Rules
-        base_word = base_word.replace("ts", "c")   # ts -> c
-        base_word = base_word.replace("tsh", "ch") # tsh -> ch
-        base_word = base_word.replace("ue", "ua")  # ue -> ua
-        base_word = base_word.replace("ing", "eng")# ing -> eng
-        base_word = base_word.replace("oo", "or")  # oo -> or
-        base_word = base_word.replace("ou", "au")  # ou -> au
-        base_word = base_word.replace("ph", "p")   # (Optional preference, keep ph if standard)
-        
-        return f"{base_word}{tone}"
-
-    # 4. Apply Logic to every word
-    # Regex finds words that contain letters or diacritics
-    cleaned_text = re.sub(r'(?<!\d)\b[a-z\u00C0-\u024F\u1E00-\u1EFF\u0300-\u036F]+\b', process_word, text)
-
-    return cleaned_text
+    text = _PARTICLE_PATTERN.sub(_replace_particle, text)
+    # 3. Apply the syllable rules to every word
+    return _WORD_PATTERN.sub(_replace_word, text)
 
+@lru_cache(maxsize=ROMANIZATION_PHRASE_CACHE)
 def get_hokkien_romanization(hanzi):
     """
     Main entry point: Hanzi -> Penang Romanization
+    Memoized per phrase, so repeated hanzi never re-run the taibun converter.
     """
+    t_converter = get_converter()
     if not t_converter:
         return "[Error: Library Missing]"
-        
+
     try:
         # Get raw Tâi-lô from library (e.g., "Lí hó")
         raw_tailo = t_converter.get(hanzi)
@@ -112,4 +157,52 @@ def get_hokkien_romanization(hanzi):
         return penang_patch(raw_tailo)
     except Exception as e:
         print(f"Hokkien conversion error for '{hanzi}': {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+def romanize_many(hanzi_list):
+    """
+    Bulk Hanzi -> Penang Romanization, in input order.
+    Each distinct phrase is converted once per call (and memoized across calls).
+    """
+    unique = {hanzi: get_hokkien_romanization(hanzi) for hanzi in dict.fromkeys(hanzi_list)}
+    return [unique[hanzi] for hanzi in hanzi_list]
+
+# Fields the current prompts write in native script, so Hokkien input arrives as hanzi
+_HANZI_SOURCE_FIELDS = ("slang_detected", "original_transcription")
+_HANZI_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+def fill_hokkien_romanization(card):
+    """
+    Server-side romanization stage for analogy and live results. Returns a
+    copy of `card` (cached dicts are shared, so it is never changed) with:
+    - `hokkien_romanization`: the Penang romanization of `slang_detected`
+      (or `original_transcription`) when it is written in hanzi
+    - every legacy `results[*].translations.hokkien.romanization`
+      recomputed from its `hanzi`, whatever the model wrote
+    All phrases go through one romanize_many call.
+    """
+    if not isinstance(card, dict):
+        return card
+    card = dict(card)
+
+    phrases = []  # (hanzi, apply(romanization))
+    source = next((card[f] for f in _HANZI_SOURCE_FIELDS if isinstance(card.get(f), str)), None)
+    if source and _HANZI_PATTERN.search(source):
+        phrases.append((source, lambda r: card.__setitem__("hokkien_romanization", r)))
+
+    results = card.get("results")
+    if isinstance(results, list):
+        card["results"] = results = [dict(entry) if isinstance(entry, dict) else entry for entry in results]
+        for entry in results:
+            translations = entry.get("translations") if isinstance(entry, dict) else None
+            hokkien = translations.get("hokkien") if isinstance(translations, dict) else None
+            if isinstance(hokkien, dict) and isinstance(hokkien.get("hanzi"), str) and hokkien["hanzi"].strip():
+                entry["translations"] = translations = dict(translations)
+                translations["hokkien"] = hokkien = dict(hokkien)
+                phrases.append((hokkien["hanzi"], lambda r, h=hokkien: h.__setitem__("romanization", r)))
+
+    if phrases and get_converter():
+        for (_, apply), romanization in zip(phrases, romanize_many([hanzi for hanzi, _ in phrases])):
+            if romanization:
+                apply(romanization)
+    return card
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import uuid
+import base64
+import hashlib
+import binascii
+from datetime import datetime, timezone
+from collections import OrderedDict
+from core.client import CACHE_DIR
+from core.firebase import async_db
+from core.cache_backends import RecordLog
+
+WORDS_COLLECTION = "saved_words"
+
+# Page sizes for /api/get_words (clients may ask for up to WORDS_MAX_PAGE_SIZE)
+WORDS_PAGE_SIZE = int(os.getenv("WORDS_PAGE_SIZE", "50"))
+WORDS_MAX_PAGE_SIZE = int(os.getenv("WORDS_MAX_PAGE_SIZE", "200"))
+
+# Read-through cache: pages for the most recently active users, per worker
+WORDS_CACHE_USERS = int(os.getenv("WORDS_CACHE_USERS", "1024"))
+WORDS_CACHE_TTL_SECONDS = float(os.getenv("WORDS_CACHE_TTL_SECONDS", "300"))
+# Per-user page cache versions, shared by every worker
+WORDS_VERSIONS_FILE = os.path.join(CACHE_DIR, "words_versions.log")
+
+# Projection: only what the My Words tab renders (user_id is implied by the query)
+WORD_FIELDS = ["slang_word", "literal_translation", "successful_analogy", "saved_at"]
+
+# firestore.Query.DESCENDING, spelled out so the fake backend never imports firebase_admin
+DESCENDING = "DESCENDING"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(saved_at, doc_id):
+    """Opaque page token: the (saved_at, document id) of the last word on a page."""
+    raw = json.dumps({"t": saved_at, "id": doc_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+class WordVersions:
+    """
+    Per-user version numbers for the saved-words page cache, in a RecordLog
+    every worker appends to and reads back. Keyed on the exact user id
+    (Firebase UIDs are case-sensitive) and never evicted or expired, unlike
+    entries in the response cache.
+    """
+
+    def __init__(self, path=WORDS_VERSIONS_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.log = RecordLog(path)
+        self.versions = self.log.load()
+
+    def get(self, user_id):
+        """The user's current version (0 if never bumped), including bumps by other workers."""
+        self.log.refresh(self.versions)
+        return self.versions.get(user_id, 0)
+
+    def bump(self, user_id):
+        self.versions[user_id] = time.time()
+        self.log.append({user_id: self.versions[user_id]})
+        if self.log.needs_compaction():
+            self.log.compact_in_background()
+
+
+class WordStore:
+    """
+    Async access to a user's saved words, with a per-user read-through cache.
+
+    Pages are cached per (cursor, limit) under the user's current *version*.
+    Every flushed batch of saves bumps that version in `versions` (a
+    WordVersions), so other workers drop their pages on the next read.
+    """
+
+    def __init__(self, versions, max_users=WORDS_CACHE_USERS, ttl=WORDS_CACHE_TTL_SECONDS):
+        self.versions = versions
+        self.max_users = max_users
+        self.ttl = ttl
+        self.users = OrderedDict()  # user_id -> {"version", "expires", "pages": {(cursor, limit): page}}
+        self.stats = {"hit": 0, "miss": 0, "invalidated": 0}
+
+    def invalidate(self, user_id):
+        """Drops this user's cached pages here and bumps their version for other workers."""
+        self.users.pop(user_id, None)
+        self.versions.bump(user_id)
+        self.stats["invalidated"] += 1
+
+    @staticmethod
+    def new_entry(user_id, slang_word, literal_translation, successful_analogy, idempotency_key=None):
+        """
+        Builds a saved-word record. Its document id comes from the client's
+        idempotency key when given, so a retried save overwrites instead of duplicating.
+        saved_at is fixed here (not a server timestamp) so replaying the write is harmless.
+        """
+        if idempotency_key:
+            doc_id = hashlib.sha256(f"{user_id}|{idempotency_key}".encode('utf-8')).hexdigest()[:32]
+        else:
+            doc_id = uuid.uuid4().hex
+        return {
+            "id": doc_id,
+            "user_id": user_id,
+            "slang_word": slang_word,
+            "literal_translation": literal_translation,
+            "successful_analogy": successful_analogy,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def write_batch(self, entries):
+        """Writes records from new_entry() in one Firestore batched write."""
+        db = await async_db()
+        collection = db.collection(WORDS_COLLECTION)
+        batch = db.batch()
+        for entry in entries:
+            data = {k: v for k, v in entry.items() if k != "id"}
+            data["saved_at"] = datetime.fromisoformat(entry["saved_at"])
+            batch.set(collection.document(entry["id"]), data)
+        await batch.commit()
+        for user_id in {entry["user_id"] for entry in entries}:
+            self.invalidate(user_id)
+
+    async def page(self, user_id, limit=WORDS_PAGE_SIZE, cursor=None):
+        """
+        One page of the user's words, newest first.
+
+        Returns:
+            (page, cached): page is {"words": [...], "next_cursor": token or None}.
+        """
+        limit = max(1, min(limit, WORDS_MAX_PAGE_SIZE))
+        start_after = decode_cursor(cursor) if cursor else None
+
+        version = self.versions.get(user_id)
+        now = time.monotonic()
+        entry = self.users.get(user_id)
+        if entry is None or entry["version"] != version or entry["expires"] <= now:
+            entry = {"version": version, "expires": now + self.ttl, "pages": {}}
+            self.users[user_id] = entry
+        self.users.move_to_end(user_id)
+
+        page = entry["pages"].get((cursor, limit))
+        if page is not None:
+            self.stats["hit"] += 1
+            return page, True
+
+        self.stats["miss"] += 1
+        page = await self._query(user_id, limit, start_after)
+        entry["pages"][(cursor, limit)] = page
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+        return page, False
+
+    async def _query(self, user_id, limit, start_after):
+        db = await async_db()
+        query = (
+            db.collection(WORDS_COLLECTION)
+            .where("user_id", "==", user_id)
+            .order_by("saved_at", direction=DESCENDING)
+            .order_by("__name__", direction=DESCENDING)
+            .select(WORD_FIELDS)
+        )
+        if start_after:
+            saved_at, doc_id = start_after
+            query = query.start_after({"saved_at": saved_at, "__name__": doc_id})
+
+        # One extra document tells us whether there is a next page
+        words = []
+        async for doc in query.limit(limit + 1).stream():
+            entry = doc.to_dict()
+            entry["id"] = doc.id
+            # Convert Firestore timestamp to ISO string for JSON
+            if entry.get("saved_at"):
+                entry["saved_at"] = entry["saved_at"].isoformat()
+            words.append(entry)
+
+        next_cursor = None
+        if len(words) > limit:
+            words = words[:limit]
+            last = words[-1]
+            if last.get("saved_at"):
+                next_cursor = encode_cursor(last["saved_at"], last["id"])
+        return {"words": words, "next_cursor": next_cursor}
+
+    def snapshot(self):
+        return {**self.stats, "cached_users": len(self.users)}
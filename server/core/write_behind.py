@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import glob
+import asyncio
+from core import metrics
+from core.client import CACHE_DIR
+from core.cache_sync import lock_fd
+
+SAVE_SPOOL_DIR = os.path.join(CACHE_DIR, "spool")
+# Flush when this many saves are queued, or when the oldest has waited SAVE_FLUSH_INTERVAL seconds
+SAVE_BATCH_SIZE = int(os.getenv("SAVE_BATCH_SIZE", "100"))  # Firestore caps a batch at 500 writes
+SAVE_FLUSH_INTERVAL = float(os.getenv("SAVE_FLUSH_INTERVAL", "0.5"))
+SAVE_SPOOL_FSYNC = os.getenv("SAVE_SPOOL_FSYNC", "1") == "1"
+
+_MAX_RETRY_DELAY = 30.0
+
+
+class WriteBehindQueue:
+    """
+    Coalesces small writes into batched flushes.
+
+    Every entry (a dict with a unique "id") is appended to a local JSONL spool
+    before it is acknowledged, then written by `flush_fn(entries)` in batches
+    of up to `batch_size`, at least every `interval` seconds. Entries with
+    the same id collapse into one write, so `flush_fn` must be idempotent
+    (e.g. Firestore `set` on a fixed document id).
+
+    Each worker spools to its own file and holds a lock on it. On start, any
+    spool whose owner is gone (crash, or a failed final flush) is replayed.
+    """
+
+    def __init__(self, name, flush_fn, directory=SAVE_SPOOL_DIR,
+                 batch_size=SAVE_BATCH_SIZE, interval=SAVE_FLUSH_INTERVAL, fsync=SAVE_SPOOL_FSYNC):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.fsync = fsync
+        self.pending = {}  # id -> entry, in arrival order
+        self.spool = None
+        self.spool_path = None
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        self._retry_delay = 0.0
+        self._orphans = []
+        self.stats = {
+            "enqueued": 0, "flushed": 0, "batches": 0, "failures": 0, "recovered": 0,
+            "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+
+    # --- LIFECYCLE ---
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        recovered = self._claim_orphans()
+
+        # Lock the spool before other workers can see it, or one could claim it as an orphan
+        path = os.path.join(self.directory, f"{self.name}-{os.getpid()}-{time.time_ns()}.jsonl")
+        self.spool = open(path + ".new", 'a+', encoding='utf-8')
+        lock_fd(self.spool.fileno())
+        os.replace(path + ".new", path)
+        self.spool_path = path
+        if recovered:
+            self._spool_write(recovered.values())
+            self.pending.update(recovered)
+            self.stats["recovered"] += len(recovered)
+            self._report_depth()
+            print(f"♻️ Recovered {len(recovered)} unflushed {self.name} entries from spool")
+        self._unlink_orphans()
+
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stops the flusher and writes out everything still queued."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Final {self.name} flush failed, {len(self.pending)} entries kept in spool: {e}")
+        if self.spool:
+            keep = bool(self.pending)
+            self.spool.close()  # Releases the lock: the next start replays the file
+            self.spool = None
+            if not keep:
+                try:
+                    os.remove(self.spool_path)
+                except OSError:
+                    pass
+
+    # --- QUEUE ---
+
+    def enqueue(self, entry):
+        """Durably queues one entry (an existing id is overwritten)."""
+        self._spool_write([entry])
+        self.pending.pop(entry["id"], None)
+        self.pending[entry["id"]] = entry
+        self.stats["enqueued"] += 1
+        self._report_depth()
+        if len(self.pending) >= self.batch_size and self._wakeup:
+            self._wakeup.set()
+
+    def pending_for(self, predicate):
+        """Queued (not yet flushed) entries matching `predicate`, newest first."""
+        return [entry for entry in reversed(self.pending.values()) if predicate(entry)]
+
+    async def flush(self):
+        """Writes queued entries in batches until the queue is empty. Raises on failure."""
+        async with self._flush_lock:
+            while self.pending:
+                batch = list(self.pending.values())[:self.batch_size]
+                start = time.perf_counter()
+                try:
+                    await self.flush_fn(batch)
+                except Exception:
+                    self.stats["failures"] += 1
+                    metrics.WRITE_BEHIND_FLUSH_LATENCY.observe(self.name, "error", value=time.perf_counter() - start)
+                    raise
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                metrics.WRITE_BEHIND_FLUSH_LATENCY.observe(self.name, "ok", value=elapsed_ms / 1000)
+                for entry in batch:
+                    # Keep entries that were re-queued (same id) while we were writing
+                    if self.pending.get(entry["id"]) is entry:
+                        del self.pending[entry["id"]]
+                self._report_depth()
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["last_flush_ms"] = round(elapsed_ms, 1)
+                self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 1)
+                self.stats["total_flush_ms"] += elapsed_ms
+            # Everything is written: the spool can start over
+            self.spool.seek(0)
+            self.spool.truncate()
+
+    def _report_depth(self):
+        metrics.WRITE_BEHIND_QUEUE_DEPTH.set(self.name, value=len(self.pending))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval + self._retry_delay)
+            except asyncio.TimeoutError:
+                pass
+            if not self.pending:
+                continue
+            try:
+                await self.flush()
+                self._retry_delay = 0.0
+            except Exception as e:
+                self._retry_delay = min(_MAX_RETRY_DELAY, max(1.0, self._retry_delay * 2))
+                print(f"❌ {self.name} flush failed ({len(self.pending)} queued), retrying in {self._retry_delay:.0f}s: {e}")
+
+    # --- SPOOL ---
+
+    def _spool_write(self, entries):
+        self.spool.seek(0, os.SEEK_END)
+        self.spool.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+        self.spool.flush()
+        if self.fsync:
+            os.fsync(self.spool.fileno())
+
+    def _orphan_paths(self):
+        return glob.glob(os.path.join(self.directory, f"{self.name}-*.jsonl"))
+
+    def _claim_orphans(self):
+        """Reads every spool no live worker holds. Returns {id: entry}."""
+        recovered = {}
+        for path in self._orphan_paths():
+            try:
+                f = open(path, 'r+', encoding='utf-8')
+            except OSError:
+                continue
+            if not lock_fd(f.fileno(), blocking=False):
+                f.close()  # Owned by a running worker
+                continue
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    recovered[entry["id"]] = entry
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn final line from a crash
+            self._orphans.append(f)
+        return recovered
+
+    def _unlink_orphans(self):
+        """Deletes replayed spools (their entries now live in ours)."""
+        for f in self._orphans:
+            try:
+                os.remove(f.name)
+            except OSError:
+                pass
+            f.close()
+        self._orphans = []
+
+    def snapshot(self):
+        batches = self.stats["batches"]
+        return {
+            "queue_depth": len(self.pending),
+            **{k: v for k, v in self.stats.items() if k != "total_flush_ms"},
+            "avg_flush_ms": round(self.stats["total_flush_ms"] / batches, 1) if batches else 0.0,
+        }
@@ -0,0 +1,279 @@
+"""
+End-to-end load test for the VerbaBridge backend.
+
+Drives every route at a target request rate (open loop: requests go out on
+schedule whether or not earlier ones have finished) and reports p50/p95/p99
+latency, throughput, error counts and cache hit ratio per route.
+
+Latency is measured from each request's *scheduled* send time, so a server
+that falls behind shows up as latency instead of silently lowering the rate.
+
+To measure the server's own overhead, run it against the local stand-ins:
+    MODEL_BACKEND=fake FIRESTORE_BACKEND=fake uvicorn main:app --port 8000
+    python loadtest.py --rps 100 --duration 30
+
+Or without a separate server (in-process, via ASGI):
+    MODEL_BACKEND=fake FIRESTORE_BACKEND=fake python loadtest.py --in-process
+
+Usage:
+    python loadtest.py [--url URL] [--rps 50] [--duration 30] [--routes analogy,live,...]
+                       [--vocab 200] [--skew 1.1] [--json report.json]
+"""
+import io
+import os
+import json
+import math
+import time
+import wave
+import random
+import shutil
+import asyncio
+import tempfile
+import argparse
+from array import array
+
+import httpx
+
+GENERATIONS = ["Boomer", "Gen X", "Millennial", "Gen Z", "Gen Alpha"]
+VIBES = ["Ah Beng (Penang Hokkien)", "Mak Cik Bawang (Dramatic Gossip)", "Corporate Millennial"]
+LANGUAGES = ["en", "ch", "ms"]
+
+
+class Workload:
+    """Builds requests. Inputs are drawn from a Zipf-skewed vocabulary so caches behave realistically."""
+
+    def __init__(self, vocab, skew, seed):
+        self.rng = random.Random(seed)
+        self.terms = [f"slang term {i}" for i in range(vocab)]
+        self.weights = [1 / (rank + 1) ** skew for rank in range(vocab)]
+        self.users = [f"loadtest-user-{i}" for i in range(20)]
+        self._clips = {}
+
+    def term(self):
+        return self.rng.choices(self.terms, weights=self.weights)[0]
+
+    def persona(self):
+        return self.rng.choice(GENERATIONS), self.rng.choice(VIBES), self.rng.choice(LANGUAGES)
+
+    def clip(self, term):
+        """A small deterministic WAV per term, so audio requests repeat like text ones."""
+        if term not in self._clips:
+            rate, freq = 16000, 200 + self.terms.index(term) % 400
+            samples = array('h', (int(6000 * math.sin(2 * math.pi * freq * i / rate)) for i in range(rate // 2)))
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(rate)
+                w.writeframes(samples.tobytes())
+            self._clips[term] = buffer.getvalue()
+        return self._clips[term]
+
+    def analogy_body(self):
+        gen, vibe, lang = self.persona()
+        return {"slang_text": self.term(), "user_generation": gen, "user_vibe": vibe, "preferred_language": lang}
+
+    def live_body(self):
+        _, vibe, lang = self.persona()
+        return {"text": f"bro that is {self.term()} fr", "user_vibe": vibe, "preferred_language": lang}
+
+
+# route name -> (default weight, request builder). Builders return httpx.request kwargs.
+def _routes(w):
+    return {
+        "analogy": (25, lambda: dict(method="POST", url="/generate_analogy", json=w.analogy_body())),
+        "live": (25, lambda: dict(method="POST", url="/live_translate", json=w.live_body())),
+        "analogy_stream": (4, lambda: dict(method="POST", url="/generate_analogy_stream", json=w.analogy_body())),
+        "live_stream": (4, lambda: dict(method="POST", url="/live_translate_stream", json=w.live_body())),
+        "analogy_batch": (3, lambda: dict(method="POST", url="/generate_analogy_batch",
+                                          json={"items": [w.analogy_body() for _ in range(5)]})),
+        "live_batch": (3, lambda: dict(method="POST", url="/live_translate_batch",
+                                       json={"items": [w.live_body() for _ in range(5)]})),
+        "save_word": (8, lambda: dict(method="POST", url="/api/save_word", json={
+            "user_id": w.rng.choice(w.users), "slang_word": w.term(),
+            "literal_translation": "loadtest", "successful_analogy": "loadtest",
+        })),
+        "get_words": (8, lambda: dict(method="GET", url=f"/api/get_words/{w.rng.choice(w.users)}")),
+        "audio_translate": (3, lambda: _audio_request(w, "/live_translate_audio", {})),
+        "audio_analogy": (3, lambda: _audio_request(w, "/generate_analogy_audio", {"user_generation": w.persona()[0]})),
+        "tts": (10, lambda: dict(method="GET", url="/api/tts", params={"text": w.term(), "language": "en"})),
+        "stats": (1, lambda: dict(method="GET", url="/api/stats")),
+    }
+
+
+def _audio_request(w, url, extra):
+    term = w.term()
+    _, vibe, lang = w.persona()
+    return dict(method="POST", url=url, files={"file": ("clip.wav", w.clip(term), "audio/wav")},
+                data={"user_vibe": vibe, "preferred_language": lang, **extra})
+
+
+def _source(response):
+    """The `source` a route reported (JSON body, or the final SSE `done` event)."""
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        for block in response.text.split("\n\n"):
+            if block.startswith("event: done"):
+                return json.loads(block.split("data: ", 1)[1]).get("source")
+        return None
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return None
+    body = response.json()
+    if "results" in body and isinstance(body["results"], list):
+        sources = [r.get("source") for r in body["results"]]
+        return sources  # Batch: one source per item
+    return body.get("source")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.hits = {}
+        self.lookups = {}
+
+    def add(self, route, latency, ok, source):
+        self.latencies.setdefault(route, []).append(latency)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        for s in (source if isinstance(source, list) else [source]):
+            if s is None:
+                continue
+            self.lookups[route] = self.lookups.get(route, 0) + 1
+            if s == "cache":
+                self.hits[route] = self.hits.get(route, 0) + 1
+
+    def summary(self, route, values):
+        values = sorted(values)
+        lookups = self.lookups.get(route, 0)
+        return {
+            "requests": len(values),
+            "errors": self.errors.get(route, 0) if route != "ALL" else sum(self.errors.values()),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+            "hit_ratio": round(self.hits.get(route, 0) / lookups, 3) if lookups else None,
+        }
+
+
+async def _fire(client, route, request, scheduled, recorder, gate):
+    async with gate:
+        try:
+            response = await client.request(**request)
+            ok = response.status_code < 400
+            source = _source(response) if ok else None
+        except Exception:
+            ok, source = False, None
+    recorder.add(route, time.perf_counter() - scheduled, ok, source)
+
+
+async def run(args, client):
+    workload = Workload(args.vocab, args.skew, args.seed)
+    routes = _routes(workload)
+    selected = args.routes.split(",") if args.routes else list(routes)
+    unknown = [r for r in selected if r not in routes]
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(unknown)} (choose from {', '.join(routes)})")
+    names = selected
+    weights = [routes[r][0] for r in names]
+
+    stats_before = (await client.get("/api/stats")).json()
+    recorder = Recorder()
+    gate = asyncio.Semaphore(args.max_in_flight)
+    total = int(args.rps * args.duration)
+    print(f"🚀 Load test: {args.rps} rps for {args.duration}s ({total} requests) over {len(names)} routes")
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(total):
+        scheduled = start + i / args.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = workload.rng.choices(names, weights=weights)[0]
+        tasks.append(asyncio.create_task(
+            _fire(client, route, routes[route][1](), scheduled, recorder, gate)
+        ))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stats_after = (await client.get("/api/stats")).json()
+
+    report = {"target_rps": args.rps, "duration_s": round(elapsed, 2),
+              "throughput_rps": round(total / elapsed, 1), "routes": {}}
+    all_latencies = []
+    for route in names:
+        values = recorder.latencies.get(route, [])
+        all_latencies.extend(values)
+        report["routes"][route] = recorder.summary(route, values)
+    recorder.hits["ALL"] = sum(recorder.hits.values())
+    recorder.lookups["ALL"] = sum(recorder.lookups.values())
+    report["overall"] = recorder.summary("ALL", all_latencies)
+
+    # TTS answers with audio, so its hit ratio comes from the server's own counters
+    if "tts" in report["routes"]:
+        before = stats_before["single_flight"]["tts"]
+        after = stats_after["single_flight"]["tts"]
+        hits = after["hit"] - before["hit"]
+        lookups = hits + after["miss"] - before["miss"] + after["coalesced"] - before["coalesced"]
+        report["routes"]["tts"]["hit_ratio"] = round(hits / lookups, 3) if lookups else None
+    return report
+
+
+def print_report(report):
+    print(f"\n{'route':<16}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'hit %':>8}")
+    rows = list(report["routes"].items()) + [("ALL", report["overall"])]
+    for route, r in rows:
+        hit = f"{r['hit_ratio'] * 100:.0f}" if r["hit_ratio"] is not None else "-"
+        print(f"{route:<16}{r['requests']:>7}{r['errors']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{hit:>8}")
+    print(f"\n📊 Throughput: {report['throughput_rps']} rps (target {report['target_rps']}) over {report['duration_s']}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load-test every VerbaBridge route at a target request rate.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server to test (default: %(default)s)")
+    parser.add_argument("--in-process", action="store_true", help="run main.app in this process instead of using --url")
+    parser.add_argument("--rps", type=float, default=50, help="target requests per second (default: 50)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run (default: 30)")
+    parser.add_argument("--routes", default="", help="comma-separated subset of routes (default: all)")
+    parser.add_argument("--vocab", type=int, default=200, help="distinct slang terms (default: 200)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for term popularity (default: 1.1)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="client-side cap on open requests")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    if args.in_process:
+        # A fresh cache per run: results don't depend on earlier runs, and never touch cache_data/
+        scratch = None if os.getenv("CACHE_DIR") else tempfile.mkdtemp(prefix="verbabridge-loadtest-")
+        if scratch:
+            os.environ["CACHE_DIR"] = scratch
+        try:
+            import main as server
+            transport = httpx.ASGITransport(app=server.app)
+            async with server.lifespan(server.app):
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                    report = await run(args, client)
+        finally:
+            if scratch:
+                shutil.rmtree(scratch, ignore_errors=True)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            report = await run(args, client)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
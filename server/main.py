@@ -1,26 +1,76 @@
+from core import startup  # First import: starts the cold-start clock
 import os
+import json
+import asyncio
 import logging
-import firebase_admin
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from firebase_admin import credentials, firestore
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from dotenv import load_dotenv
-from fastapi import UploadFile, File, Form, Response
+from fastapi import UploadFile, File, Form, Response, Request
 
 # --- MODULAR IMPORTS ---
-from core.cache import FileSystemCache
-from core.style import live_translate, live_translate_audio
-from core.ai import generate_analogy, generate_analogy_audio, generate_gemini_tts
+from core.client import get_client
+from core.firebase import init_firebase, async_db
+from core.cache import FileSystemCache, STALE
+from core.singleflight import SingleFlight
+from core.fuzzy import SlangIndex, normalize_text
+from core.stream import JsonFieldStream, sse
+from core.style import LIVE_TRANSLATE_MODEL, live_translate, live_translate_audio, stream_live_translate, live_translate_batch
+from core.ai import ANALOGY_MODEL, generate_analogy, generate_persona_analogy, core_meaning, stream_analogy, stream_persona_analogy, generate_analogy_batch, generate_analogy_audio, generate_gemini_tts, TTS_MODEL, TTS_VOICE
+from core.audio_store import AudioBlobStore
+from core.utils import fill_hokkien_romanization, get_converter
+from core.words import WordStore, WordVersions, InvalidCursor, WORDS_PAGE_SIZE
+from core.write_behind import WriteBehindQueue
+from core.uploads import UploadLimitMiddleware, UploadRoute, digest_upload
+from core.audio_prep import prepare_audio
+from core.prefetch import Prefetcher, PREFETCH_ANALOGIES, PREFETCH_MAX_WORDS, PREFETCH_IDLE_FRACTION
+from core import metrics, resilience, scheduler
+from core.resilience import is_fallback
+from core.scheduler import Overloaded
 from core.style import live_translate
 
+startup.record("import:main", startup.since_start())
+
 # --- SETUP & LOGGING ---
-load_dotenv()
 logging.basicConfig(level=logging.INFO, format="%(levelname)s:\t  %(message)s")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="VerbaBridge Backend", version="3.0.0")
+# Build the lazily-initialized heavy components (Gemini client, Firebase,
+# taibun dictionaries) in the background right after startup, so the first
+# request doesn't pay for them. STARTUP_WARMUP=0 leaves them fully on-demand.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+def _warm_up():
+    with startup.timed("warmup"):
+        for component in (get_client, init_firebase, get_converter):
+            try:
+                component()
+            except Exception as e:
+                logger.error("Warm-up failed for %s: %s", component.__name__, e)
+
+async def _warm_up_in_background():
+    await asyncio.to_thread(_warm_up)
+    logger.info("🔥 Warm-up done | %s", startup.format_report())
+
+@asynccontextmanager
+async def lifespan(app):
+    startup.record("ready", startup.since_start())
+    logger.info("⏱ Startup | %s", startup.format_report())
+    if STARTUP_WARMUP:
+        _spawn(_warm_up_in_background())
+    await save_queue.start()
+    if prefetcher:
+        prefetcher.start()
+    yield
+    if prefetcher:
+        await prefetcher.close()
+    # Write out queued saves; whatever can't be written stays in the spool for next start
+    await save_queue.close()
+
+app = FastAPI(title="VerbaBridge Backend", version="3.0.0", lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -30,16 +80,397 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Cap audio uploads while they stream in (UPLOAD_MAX_BYTES)
+app.add_middleware(UploadLimitMiddleware, paths=["/live_translate_audio", "/generate_analogy_audio"])
+# Audio upload routes, parsed with the UPLOAD_SPOOL_BYTES spool threshold
+audio_uploads = APIRouter(route_class=UploadRoute)
+# Outermost: per-route latency and in-flight counts for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+with startup.timed("init:cache"):
+    cache = FileSystemCache()
+with startup.timed("init:tts_store"):
+    tts_store = AudioBlobStore()
+# Saved words, with a per-user page cache invalidated through a shared version log
+words = WordStore(WordVersions())
+# Saves are spooled locally and written to Firestore in batches
+save_queue = WriteBehindQueue("saved_words", words.write_batch)
+
+# Near-duplicate analogy inputs (spelling variants) answered from cache; off unless CACHE_FUZZY=1
+CACHE_FUZZY = os.getenv("CACHE_FUZZY", "0") == "1"
+slang_index = SlangIndex(FileSystemCache(cache_file="slang_index.json")) if CACHE_FUZZY else None
+
+# Analogies for /live_translate highlight words, generated while the model has spare capacity
+prefetcher = Prefetcher(
+    idle=lambda: resilience.guard(ANALOGY_MODEL).has_spare_capacity(PREFETCH_IDLE_FRACTION),
+) if PREFETCH_ANALOGIES else None
+
+# Collapse bursts of identical requests into one Gemini call
+analogy_flight = SingleFlight("generate_analogy")
+live_flight = SingleFlight("live_translate")
+audio_translate_flight = SingleFlight("live_translate_audio")
+audio_analogy_flight = SingleFlight("generate_analogy_audio")
+tts_flight = SingleFlight("tts")
+
+# Batch endpoints: max items per request, and max items packed into one Gemini call
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "20"))
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks = set()
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+class ClientDisconnected(Exception):
+    """The client went away before its response was ready."""
+
+async def _wait_for_disconnect(request):
+    # The body is already read, so the next message is the disconnect (or never comes)
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def _unless_disconnected(request, work):
+    """
+    Awaits `work`, but cancels it and raises ClientDisconnected if the client
+    disconnects first. A coalesced model call keeps running while other
+    callers still wait for it (see SingleFlight), so its result still gets cached.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task not in done and watcher.exception() is None:
+            metrics.CLIENT_DISCONNECTS.inc(request.url.path)
+            logger.info("🔌 Client disconnected: %s", request.url.path)
+            raise ClientDisconnected()
+        return await task
+    finally:
+        for pending in (task, watcher):
+            if not pending.done():
+                pending.cancel()
+
+# nginx's "client closed request": only ever seen in logs and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+def _service_unavailable(e):
+    """503 for a call the scheduler shed, so clients back off instead of waiting on a full queue."""
+    logger.warning("🚦 Load shed: %s", e)
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def _normalize_text(text):
+    """Collapses runs of whitespace so trivially different inputs share a cache key."""
+    return " ".join(str(text).split())
+
+def _analogy_context(d):
+    return f"{d.user_generation}|{d.user_vibe}|{d.preferred_language}"
+
+def _slang_term(text):
+    # All-punctuation input ("???", "!!!") normalizes to nothing: key it on the raw text instead
+    return normalize_text(text) or _normalize_text(text)
+
+def _analogy_key(d):
+    # Slang input is fully normalized: "Rizz!!", "rizzz" and "  RIZZ ?" share one entry
+    return f"{_slang_term(d.slang_text)}|{_analogy_context(d)}"
+
+def _core_key(d):
+    # The core meaning only depends on the slang and the output language
+    return f"core|{_slang_term(d.slang_text)}|{d.preferred_language}"
+
+async def _produce_analogy(d):
+    """
+    Generates an analogy card. When the slang's core meaning is already cached
+    for this language, only the persona-specific analogies are generated;
+    otherwise the full prompt runs and its core meaning is cached for every
+    other generation / vibe.
+    """
+    core_key = _core_key(d)
+    core = cache.get(core_key)
+    if core:
+        metrics.ANALOGY_CORE.inc("hit")
+        return await generate_persona_analogy(core, d.user_generation, d.user_vibe, d.preferred_language)
+    metrics.ANALOGY_CORE.inc("miss")
+    result = await generate_analogy(d.slang_text, d.user_generation, d.user_vibe, d.preferred_language)
+    if not is_fallback(result):
+        cache.set(core_key, core_meaning(result))
+    return result
+
+def _stream_analogy_plan(d):
+    """
+    Streaming counterpart of _produce_analogy(): (known fields, chunk stream).
+    With a cached core, its fields are sent at once and only the persona
+    prompt streams; otherwise the full prompt streams and the core is
+    cached from the result (see _store_streamed_analogy).
+    """
+    core = cache.get(_core_key(d))
+    if core:
+        metrics.ANALOGY_CORE.inc("hit")
+        return core, lambda slot: stream_persona_analogy(core, d.user_generation, d.user_vibe, d.preferred_language, slot=slot)
+    metrics.ANALOGY_CORE.inc("miss")
+    return None, lambda slot: stream_analogy(d.slang_text, d.user_generation, d.user_vibe, d.preferred_language, slot=slot)
+
+def _store_streamed_analogy(d, result, core):
+    """A streamed full-prompt result seeds the core cache, as in _produce_analogy()."""
+    if core is None:
+        cache.set(_core_key(d), core_meaning(result))
+
+def _finish_analogy(d, result, source):
+    """Post-processing shared by every analogy response: fuzzy index registration, Hokkien romanization."""
+    if source != "fallback":
+        _index_analogy(d, result)
+    return fill_hokkien_romanization(result)
+
+def _finish_live(d, result, source):
+    """Post-processing for a streamed live translation: analogy prefetch for its highlight words."""
+    if source != "fallback":
+        _prefetch_analogies(result.get("highlight_words") or [], d.user_generation, d.user_vibe, d.preferred_language)
+    return result
+
+def _similar_analogy(d):
+    """
+    The cached analogy for a near-duplicate of `d.slang_text` in the same
+    persona context (see SlangIndex), marked with `fuzzy_match`; or None.
+    """
+    if slang_index is None:
+        return None
+    context = _analogy_context(d)
+    match = slang_index.match(context, d.slang_text)
+    if match is None:
+        return None
+    key, term, score = match
+    cached = cache.get(key)
+    if not cached:
+        slang_index.record_stale()
+        return None
+    slang_index.record_served(d.slang_text, context, term, score)
+    metrics.CACHE_FUZZY_HITS.inc()
+    return {**cached, "fuzzy_match": {"matched": term, "score": round(score, 3)}}
+
+def _index_analogy(d, result):
+    """Adds an exactly cached analogy to the fuzzy index."""
+    if slang_index is not None and "fuzzy_match" not in result:
+        slang_index.add(_analogy_context(d), d.slang_text, result.get("slang_detected"), _analogy_key(d))
+
+def _prefetch_analogies(words, user_generation, user_vibe, preferred_language):
+    """
+    Speculatively caches analogies for the words a live translation
+    highlighted, since users often tap one next. Never waits on anything.
+    """
+    if prefetcher is None or not user_generation:
+        return
+    terms = {_slang_term(w): w for w in words if isinstance(w, str) and w.strip()}
+    for term in list(terms.values())[:PREFETCH_MAX_WORDS]:
+        d = AnalogyInput(slang_text=term, user_generation=user_generation, user_vibe=user_vibe, preferred_language=preferred_language)
+        key = _analogy_key(d)
+
+        async def _fill(d=d, key=key):
+            result, source = await _cached_call(analogy_flight, key, lambda: _produce_analogy(d))
+            if source == "fallback":
+                return False
+            _index_analogy(d, result)
+            return True
+
+        prefetcher.offer(key, lambda key=key: cache.contains(key), _fill)
+
+async def _cached_call(flight, cache_key, produce, similar=None):
+    """
+    Serves `cache_key` from the cache, or runs `produce()` once across all
+    concurrent callers (and worker processes) and caches its result.
+    On a miss, `similar()` may still answer from a near-duplicate entry.
+
+    Returns:
+        (result, source): source is "cache", "coalesced", "gemini" or
+        "fallback" (generation failed; the stand-in result is not cached).
+    """
+    async def _generate():
+        # Only one worker process generates a given key at a time
+        async with cache.generation_lock(cache_key) as locked:
+            if locked:
+                fresh, freshness = cache.peek(cache_key)  # Already counted as a miss above
+                if fresh and freshness != STALE:
+                    return fresh  # Another worker filled it while we waited
+            result = await produce()
+            # Cache the result
+            cache.set(cache_key, result)
+            return result
+
+    async def _revalidate():
+        try:
+            await flight.do(cache_key, _generate)
+        except Exception as e:
+            logger.error("Cache Revalidation Error (%s): %s", flight.name, e)
+
+    cached_data, freshness = cache.lookup(cache_key)
+    if cached_data:
+        logger.info("⚡ CACHE HIT")
+        flight.record_hit()
+        if freshness == STALE:
+            # Serve the expired copy now and refresh it for the next caller
+            _spawn(_revalidate())
+        return cached_data, "cache"
+
+    near = similar() if similar else None
+    if near:
+        flight.record_hit()
+        return near, "cache"
+
+    result, coalesced = await flight.do(cache_key, _generate)
+    if is_fallback(result):
+        return result, "fallback"
+    return result, ("coalesced" if coalesced else "gemini")
+
+async def _cached_batch(items, key_of, group_of, produce):
+    """
+    Batch counterpart of _cached_call().
+
+    Looks every item up in the cache at once, then packs the misses into as
+    few Gemini calls as possible: misses are grouped by `group_of(item)`
+    (the prompt parameters they share) and split into chunks of
+    BATCH_CHUNK_SIZE. `produce(group, chunk_items)` makes one call and returns
+    one result (or None) per item. A failed call only fails its own chunk.
+
+    Returns:
+        list: per-item {"index", "status", ...} dicts in input order.
+    """
+    keys = [key_of(item) for item in items]
+    cached = cache.get_many(set(keys))
+    responses = [None] * len(items)
+
+    # Identical items inside one batch are generated once
+    pending = {}
+    for index, key in enumerate(keys):
+        if key in cached:
+            responses[index] = {"index": index, "status": "success", "source": "cache", **cached[key]}
+        else:
+            pending.setdefault(key, []).append(index)
+
+    groups = {}
+    for key, indices in pending.items():
+        groups.setdefault(group_of(items[indices[0]]), []).append(key)
+    chunks = [
+        (group, group_keys[i:i + BATCH_CHUNK_SIZE])
+        for group, group_keys in groups.items()
+        for i in range(0, len(group_keys), BATCH_CHUNK_SIZE)
+    ]
+    logger.info("📦 Batch: %s items | %s cached | %s to generate in %s calls", len(items), len(cached), len(pending), len(chunks))
+
+    async def _run(group, chunk_keys):
+        try:
+            return await produce(group, [items[pending[k][0]] for k in chunk_keys])
+        except Exception as e:
+            logger.error("Batch Chunk Error: %s", e)
+            return e
+
+    outcomes = await asyncio.gather(*(_run(group, chunk_keys) for group, chunk_keys in chunks))
+
+    generated = {}
+    for (_, chunk_keys), outcome in zip(chunks, outcomes):
+        for position, key in enumerate(chunk_keys):
+            if isinstance(outcome, Overloaded):
+                item_response = {"status": "error", "detail": "Server busy, retry later"}
+            elif isinstance(outcome, Exception):
+                item_response = {"status": "error", "detail": "Generation failed"}
+            elif outcome[position] is None:
+                item_response = {"status": "error", "detail": "No result returned for this item"}
+            else:
+                generated[key] = outcome[position]
+                item_response = {"status": "success", "source": "gemini", **outcome[position]}
+            for index in pending[key]:
+                responses[index] = {"index": index, **item_response}
 
-try:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    logger.info("🔥 Firebase Admin initialized successfully")
-except Exception as e:
-    logger.error(f"Firebase initialization failed: {e}")
+    if generated:
+        cache.set_many(generated)
+    return responses
 
-cache = FileSystemCache()
+def _sse_events(events):
+    for event in events:
+        if event[0] == "item":
+            _, field, index, value = event
+            yield sse("item", {"field": field, "index": index, "value": value})
+        else:
+            _, field, value = event
+            yield sse("field", {"field": field, "value": value})
+
+def _replay_events(data):
+    events = []
+    for field, value in data.items():
+        if isinstance(value, list):
+            events.extend(("item", field, i, item) for i, item in enumerate(value))
+        events.append(("field", field, value))
+    return events
+
+async def _stream_cached(cache_key, plan, endpoint, model, finish=None, store=None):
+    """
+    Server-Sent Events response for a cacheable JSON result.
+    Emits `field` / `item` events as values complete, then one `done` event
+    carrying the full result (or an `error` event). Cache hits replay the
+    same events instantly; misses stream from Gemini and are cached at the end.
+
+    `plan()` returns (known, stream_chunks): fields already known (sent first
+    and merged into the result, or None) and `stream_chunks(slot)`, the model
+    stream for the rest. Results go through the same `finish(result, source)`
+    post-processing as the JSON route (it returns the result to send), and generated ones through
+    `store(result, known)` after the same cache write as _cached_call().
+
+    On a miss the scheduler slot for `endpoint` / `model` is taken before the
+    response starts, so a shed stream raises Overloaded (a real 503) instead
+    of failing as an `error` event after a 200.
+    """
+    cached_data = cache.get(cache_key)
+    if cached_data:
+        logger.info("⚡ CACHE HIT (stream)")
+        if finish:
+            cached_data = finish(cached_data, "cache")
+        return _sse_response(_replay_cached(cached_data))
+
+    known, stream_chunks = plan()
+    slot = await scheduler.acquire(endpoint, model)
+    frames = _stream_generated(cache_key, known, stream_chunks(slot), slot, finish, store)
+    # The generator releases the slot; the background task covers a response that never started it
+    return _sse_response(frames, background=BackgroundTask(slot.release))
+
+async def _replay_cached(cached_data):
+    for frame in _sse_events(_replay_events(cached_data)):
+        yield frame
+    yield sse("done", {"status": "success", "source": "cache", **cached_data})
+
+async def _stream_generated(cache_key, known, chunks, slot, finish, store):
+    try:
+        for frame in _sse_events(_replay_events(known or {})):
+            yield frame
+        parser = JsonFieldStream()
+        text = []
+        try:
+            async for chunk in chunks:
+                text.append(chunk)
+                for frame in _sse_events(parser.feed(chunk)):
+                    yield frame
+            result = {**(known or {}), **json.loads("".join(text))}
+        except Exception as e:
+            logger.error("Stream Error: %s", e)
+            yield sse("error", {"status": "error", "detail": "Generation failed"})
+            return
+    finally:
+        slot.release()
+
+    cache.set(cache_key, result)
+    if store:
+        store(result, known)
+    if finish:
+        result = finish(result, "gemini")
+    yield sse("done", {"status": "success", "source": "gemini", **result})
+
+def _sse_response(frames, background=None):
+    # Disable proxy buffering so each event reaches the client immediately
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
 
 # --- DATA MODELS ---
 class AnalogyInput(BaseModel):
@@ -56,6 +487,7 @@ class SaveWordInput(BaseModel):
     slang_word: str
     literal_translation: str
     successful_analogy: str
+    idempotency_key: str = None  # Reuse on retries so a word is only stored once
 class AnalogyInput(BaseModel):
     slang_text: str
     user_generation: str
@@ -66,6 +498,13 @@ class LiveTranslateInput(BaseModel):
     text: str
     user_vibe: str
     preferred_language: str = "en"
+    user_generation: str = None  # Enables analogy prefetch for the highlighted words
+
+class AnalogyBatchInput(BaseModel):
+    items: list[AnalogyInput]
+
+class LiveTranslateBatchInput(BaseModel):
+    items: list[LiveTranslateInput]
 
 # --- ROUTES ---
 
@@ -79,146 +518,348 @@ async def home():
 
 # 1. ANALOGY ENGINE (Slang -> Cultural Analogies)
 @app.post("/generate_analogy")
-async def api_generate_analogy(data: AnalogyInput):
+async def api_generate_analogy(data: AnalogyInput, request: Request):
     """Takes a slang word and generates personalized cultural analogies."""
-    logger.info(f"🧠 Analogy Request: '{data.slang_text}' | Gen: {data.user_generation} | Vibe: {data.user_vibe} | Lang: {data.preferred_language}")
-
-    # Check cache first
-    cache_key = f"{data.slang_text}|{data.user_generation}|{data.user_vibe}|{data.preferred_language}"
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        logger.info("⚡ CACHE HIT")
-        return {"status": "success", "source": "cache", **cached_data}
+    logger.info("🧠 Analogy Request: '%s' | Gen: %s | Vibe: %s | Lang: %s", data.slang_text, data.user_generation, data.user_vibe, data.preferred_language)
 
+    # Check cache first (exact, then near-duplicate)
+    cache_key = _analogy_key(data)
+    if prefetcher:
+        prefetcher.record_request(cache_key)
     try:
-        result = await generate_analogy(data.slang_text, data.user_generation, data.user_vibe, data.preferred_language)
-        # Cache the result
-        cache.set(cache_key, result)
-        return {"status": "success", "source": "gemini", **result}
+        result, source = await _unless_disconnected(request, _cached_call(
+            analogy_flight, cache_key,
+            lambda: _produce_analogy(data),
+            similar=lambda: _similar_analogy(data),
+        ))
+        result = _finish_analogy(data, result, source)
+        return {"status": "success", "source": source, **result}
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Overloaded as e:
+        raise _service_unavailable(e)
     except Exception as e:
-        logger.error(f"Analogy Generation Error: {e}")
+        logger.error("Analogy Generation Error: %s", e)
         raise HTTPException(status_code=500, detail="Analogy generation failed")
 
 
 # 2. LIVE TRANSLATE (Slang -> Polite Senior-Friendly Language)
 @app.post("/live_translate")
-async def api_live_translate(data: LiveTranslateInput):
+async def api_live_translate(data: LiveTranslateInput, request: Request):
     """Translates slang text into polite, senior-friendly language."""
-    logger.info(f"🔴 Live Translate: '{data.text}' | Vibe: {data.user_vibe} | Lang: {data.preferred_language}")
+    logger.info("🔴 Live Translate: '%s' | Vibe: %s | Lang: %s", data.text, data.user_vibe, data.preferred_language)
 
+    cache_key = f"live|{_normalize_text(data.text)}|{data.user_vibe}|{data.preferred_language}"
     try:
-        result = await live_translate(data.text, data.user_vibe, data.preferred_language)
-        return {"status": "success", **result}
+        result, source = await _unless_disconnected(request, _cached_call(
+            live_flight, cache_key,
+            lambda: live_translate(data.text, data.user_vibe, data.preferred_language),
+        ))
+        if source != "fallback":
+            _prefetch_analogies(result.get("highlight_words") or [], data.user_generation, data.user_vibe, data.preferred_language)
+        return {"status": "success", "source": source, **result}
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Overloaded as e:
+        raise _service_unavailable(e)
     except Exception as e:
-        logger.error(f"Live Translation Error: {e}")
+        logger.error("Live Translation Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# 1b / 2b. STREAMING VARIANTS (Server-Sent Events)
+@app.post("/generate_analogy_stream")
+async def api_generate_analogy_stream(data: AnalogyInput):
+    """Streams analogy fields (slang_detected, literal_translation, then each analogy) as SSE."""
+    logger.info("🧠 Analogy Stream: '%s' | Gen: %s | Vibe: %s | Lang: %s", data.slang_text, data.user_generation, data.user_vibe, data.preferred_language)
+    cache_key = _analogy_key(data)
+    try:
+        return await _stream_cached(
+            cache_key,
+            lambda: _stream_analogy_plan(data),
+            "generate_analogy", ANALOGY_MODEL,
+            finish=lambda result, source: _finish_analogy(data, result, source),
+            store=lambda result, core: _store_streamed_analogy(data, result, core),
+        )
+    except Overloaded as e:
+        raise _service_unavailable(e)
+
+@app.post("/live_translate_stream")
+async def api_live_translate_stream(data: LiveTranslateInput):
+    """Streams the live translation (translated_text, then highlight_words) as SSE."""
+    logger.info("🔴 Live Translate Stream: '%s' | Vibe: %s | Lang: %s", data.text, data.user_vibe, data.preferred_language)
+    cache_key = f"live|{_normalize_text(data.text)}|{data.user_vibe}|{data.preferred_language}"
+    try:
+        return await _stream_cached(
+            cache_key,
+            lambda: (None, lambda slot: stream_live_translate(data.text, data.user_vibe, data.preferred_language, slot=slot)),
+            "live_translate", LIVE_TRANSLATE_MODEL,
+            finish=lambda result, source: _finish_live(data, result, source),
+        )
+    except Overloaded as e:
+        raise _service_unavailable(e)
+
+# 1c / 2c. BATCH VARIANTS (many inputs, few Gemini calls)
+@app.post("/generate_analogy_batch")
+async def api_generate_analogy_batch(data: AnalogyBatchInput):
+    """Generates analogies for many slang terms; results come back per item, in order."""
+    if len(data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    logger.info("🧠 Analogy Batch Request: %s items", len(data.items))
+
+    results = await _cached_batch(
+        data.items,
+        key_of=_analogy_key,
+        group_of=lambda d: (d.user_generation, d.user_vibe, d.preferred_language),
+        produce=lambda group, chunk: generate_analogy_batch([d.slang_text for d in chunk], *group),
+    )
+    cores = {}
+    for d, item in zip(data.items, results):
+        if item["status"] == "success":
+            _index_analogy(d, item)
+            if item["source"] == "gemini":
+                cores[_core_key(d)] = core_meaning(item)
+    results = [fill_hokkien_romanization(item) for item in results]
+    if cores:
+        # Later single requests for these terms only need the persona stage
+        cache.set_many(cores)
+    return {"status": "success", "results": results}
+
+@app.post("/live_translate_batch")
+async def api_live_translate_batch(data: LiveTranslateBatchInput):
+    """Translates many texts; results come back per item, in order."""
+    if len(data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    logger.info("🔴 Live Translate Batch Request: %s items", len(data.items))
+
+    results = await _cached_batch(
+        data.items,
+        key_of=lambda d: f"live|{_normalize_text(d.text)}|{d.user_vibe}|{d.preferred_language}",
+        group_of=lambda d: (d.user_vibe, d.preferred_language),
+        produce=lambda group, chunk: live_translate_batch([d.text for d in chunk], *group),
+    )
+    return {"status": "success", "results": results}
+
 # 3. SAVE WORD (My Words → Firestore)
 @app.post("/api/save_word")
-async def api_save_word(data: SaveWordInput):
-    """Saves a slang word and its analogy to the user's vocabulary book."""
-    logger.info(f"💾 Saving word '{data.slang_word}' for user: {data.user_id}")
+async def api_save_word(data: SaveWordInput, request: Request):
+    """
+    Saves a slang word and its analogy to the user's vocabulary book.
+    The save is spooled to disk and acknowledged at once; Firestore gets it
+    in the next batched flush. Send an `idempotency_key` (or `Idempotency-Key`
+    header) so client retries don't create duplicates.
+    """
+    logger.info("💾 Saving word '%s' for user: %s", data.slang_word, data.user_id)
+    if await async_db() is None:
+        raise HTTPException(status_code=503, detail="Word storage is unavailable")
     try:
-        doc_ref = db.collection("saved_words").document()
-        doc_ref.set({
-            "user_id": data.user_id,
-            "slang_word": data.slang_word,
-            "literal_translation": data.literal_translation,
-            "successful_analogy": data.successful_analogy,
-            "saved_at": firestore.SERVER_TIMESTAMP,
-        })
-        return {"status": "success", "message": f"'{data.slang_word}' saved to My Words!"}
+        entry = words.new_entry(
+            data.user_id, data.slang_word, data.literal_translation, data.successful_analogy,
+            idempotency_key=data.idempotency_key or request.headers.get("idempotency-key"),
+        )
+        save_queue.enqueue(entry)
+        return {"status": "success", "id": entry["id"], "message": f"'{data.slang_word}' saved to My Words!"}
     except Exception as e:
-        logger.error(f"Firestore Save Error: {e}")
+        logger.error("Save Queue Error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to save word")
 
 # 4. GET WORDS (My Words ← Firestore)
 @app.get("/api/get_words/{user_id}")
-async def api_get_words(user_id: str):
-    """Retrieves all saved words for a user, sorted by newest first."""
-    logger.info(f"📖 Fetching saved words for user: {user_id}")
+async def api_get_words(user_id: str, limit: int = WORDS_PAGE_SIZE, cursor: str = None):
+    """
+    Retrieves a user's saved words, newest first, one page at a time.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    logger.info("📖 Fetching saved words for user: %s", user_id)
+    if await async_db() is None:
+        raise HTTPException(status_code=503, detail="Word storage is unavailable")
     try:
-        docs = (
-            db.collection("saved_words")
-            .where("user_id", "==", user_id)
-            .order_by("saved_at", direction=firestore.Query.DESCENDING)
-            .stream()
-        )
-        words = []
-        for doc in docs:
-            entry = doc.to_dict()
-            entry["id"] = doc.id
-            # Convert Firestore timestamp to ISO string for JSON
-            if entry.get("saved_at"):
-                entry["saved_at"] = entry["saved_at"].isoformat()
-            words.append(entry)
-
-        return {"status": "success", "count": len(words), "words": words}
+        page, cached = await words.page(user_id, limit=limit, cursor=cursor)
+        if cursor is None:
+            # Read-your-writes: saves still waiting in the queue go on top of the first page
+            queued = save_queue.pending_for(lambda e: e["user_id"] == user_id)
+            if queued:
+                queued_ids = {e["id"] for e in queued}
+                page = {**page, "words": [
+                    *({k: v for k, v in e.items() if k != "user_id"} for e in queued),
+                    *(w for w in page["words"] if w["id"] not in queued_ids),
+                ]}
+        return {
+            "status": "success",
+            "source": "cache" if cached else "firestore",
+            "count": len(page["words"]),
+            **page,
+        }
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
-        logger.error(f"Firestore Read Error: {e}")
+        logger.error("Firestore Read Error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch saved words")
-    
+
 # 5. LIVE AUDIO TRANSLATE (Audio -> Gemini -> JSON)
-@app.post("/live_translate_audio")
+def _upload_mime_type(file):
+    mime_type = file.content_type
+    # If Flutter sends a generic binary stream, force it to m4a
+    if not mime_type or mime_type in ["application/octet-stream", ""]:
+        mime_type = "audio/mp4" # Gemini accepts audio/mp4 or audio/m4a for .m4a files
+    return mime_type
+
+async def _read_clip(kind, file, mime_type):
+    """Loads an upload and shrinks it for the model (WAV: trim, downmix, resample)."""
+    audio_bytes = await file.read()
+    prepared, prepared_mime = await asyncio.to_thread(prepare_audio, audio_bytes, mime_type)
+    metrics.MODEL_AUDIO_BYTES.observe(kind, value=len(prepared))
+    if len(prepared) != len(audio_bytes):
+        logger.info("🎚 Audio prepared: %s -> %s bytes (%s)", len(audio_bytes), len(prepared), prepared_mime)
+    return prepared, prepared_mime
+
+async def _cached_audio_call(flight, file, mime_type, cache_key, produce):
+    """
+    _cached_call() for uploads: the clip is only read into memory (and
+    preprocessed) when the cache can't answer on its own.
+    `produce(audio_bytes, mime_type)` makes the model call.
+    """
+    clip = None
+    if not cache.contains(cache_key):
+        clip = await _read_clip(flight.name, file, mime_type)
+
+    async def _produce():
+        # The upload is closed once the response is sent, so read it now if we haven't
+        audio_bytes, prepared_mime = clip or await _read_clip(flight.name, file, mime_type)
+        return await produce(audio_bytes, prepared_mime)
+
+    return await _cached_call(flight, cache_key, _produce)
+
+@audio_uploads.post("/live_translate_audio")
 async def api_live_translate_audio(
+    request: Request,
     file: UploadFile = File(...),
     user_vibe: str = Form(...),
-    preferred_language: str = Form("en")
+    preferred_language: str = Form("en"),
+    user_generation: str = Form(None),
 ):
     """Receives an audio file, sends it to Gemini, and returns the transcription + translation."""
-    logger.info(f"🎤 Receiving Audio: {file.filename} | Vibe: {user_vibe}")
+    logger.info("🎤 Receiving Audio: %s | Vibe: %s", file.filename, user_vibe)
     
     try:
-        audio_bytes = await file.read()
-        
-        # --- THE FIX IS HERE ---
-        mime_type = file.content_type
-        # If Flutter sends a generic binary stream, force it to m4a
-        if not mime_type or mime_type in ["application/octet-stream", ""]:
-            mime_type = "audio/mp4" # Gemini accepts audio/mp4 or audio/m4a for .m4a files
-            
-        logger.info(f"Audio Size: {len(audio_bytes)} bytes | Forced MIME: {mime_type}")
-        
-        result = await live_translate_audio(audio_bytes, mime_type, user_vibe, preferred_language)
-        return {"status": "success", **result}
-        
+        mime_type = _upload_mime_type(file)
+        audio_digest, audio_size = await digest_upload(file)
+        logger.info("Audio Size: %s bytes | Forced MIME: %s", audio_size, mime_type)
+        metrics.UPLOAD_BYTES.observe(audio_translate_flight.name, value=audio_size)
+
+        cache_key = f"audio_translate|{audio_digest}|{mime_type}|{user_vibe}|{preferred_language}"
+        result, source = await _unless_disconnected(request, _cached_audio_call(
+            audio_translate_flight, file, mime_type, cache_key,
+            lambda audio_bytes, prepared_mime: live_translate_audio(audio_bytes, prepared_mime, user_vibe, preferred_language),
+        ))
+        result = fill_hokkien_romanization(result)
+        _prefetch_analogies(result.get("highlight_words") or [], user_generation, user_vibe, preferred_language)
+        return {"status": "success", "source": source, **result}
+
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Overloaded as e:
+        raise _service_unavailable(e)
     except Exception as e:
-        logger.error(f"Audio Processing Error: {e}")
+        logger.error("Audio Processing Error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process audio")
     
 # 6. AUDIO TO ANALOGY (One-Shot Lookup)
-@app.post("/generate_analogy_audio")
+@audio_uploads.post("/generate_analogy_audio")
 async def api_generate_analogy_audio(
+    request: Request,
     file: UploadFile = File(...),
     user_generation: str = Form(...),
     user_vibe: str = Form(...),
     preferred_language: str = Form("en")
 ):
     """Receives an audio file and directly returns the Analogy swipe card data."""
-    logger.info(f"🎤 Receiving Analogy Audio: {file.filename}")
+    logger.info("🎤 Receiving Analogy Audio: %s", file.filename)
     
     try:
-        audio_bytes = await file.read()
-        mime_type = file.content_type
-        if not mime_type or mime_type in ["application/octet-stream", ""]:
-            mime_type = "audio/mp4" 
-            
-        result = await generate_analogy_audio(audio_bytes, mime_type, user_generation, user_vibe, preferred_language)
-        return {"status": "success", **result}
-        
+        mime_type = _upload_mime_type(file)
+        audio_digest, audio_size = await digest_upload(file)
+        metrics.UPLOAD_BYTES.observe(audio_analogy_flight.name, value=audio_size)
+
+        cache_key = f"audio_analogy|{audio_digest}|{mime_type}|{user_generation}|{user_vibe}|{preferred_language}"
+        result, source = await _unless_disconnected(request, _cached_audio_call(
+            audio_analogy_flight, file, mime_type, cache_key,
+            lambda audio_bytes, prepared_mime: generate_analogy_audio(audio_bytes, prepared_mime, user_generation, user_vibe, preferred_language),
+        ))
+        result = fill_hokkien_romanization(result)
+        return {"status": "success", "source": source, **result}
+
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Overloaded as e:
+        raise _service_unavailable(e)
     except Exception as e:
-        logger.error(f"Audio Analogy Error: {e}")
+        logger.error("Audio Analogy Error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate audio analogy")
+
+app.include_router(audio_uploads)
     
 @app.get("/api/tts")
-async def api_generate_tts(text: str, language: str):
-    """Generates Audio from text using Gemini and returns the raw bytes."""
+async def api_generate_tts(request: Request, text: str, language: str):
+    """
+    Generates Audio from text using Gemini and serves it from the on-disk
+    TTS store, with ETag / Range support so clients can replay it for free.
+    """
+    digest = AudioBlobStore.key_for(text, TTS_VOICE, TTS_MODEL)
+    etag = f'"{digest}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+
+    # Same text + voice + model always yields the same blob, so the ETag alone proves freshness
+    if etag in request.headers.get("if-none-match", ""):
+        tts_flight.record_hit()
+        return Response(status_code=304, headers=cache_headers)
+
     try:
-        # Catch both variables returned from ai.py
-        audio_bytes, actual_mime_type = await generate_gemini_tts(text, language)
-        
+        blob = tts_store.get(digest)
+        if blob:
+            tts_flight.record_hit()
+        else:
+            async def _synthesize():
+                # Catch both variables returned from ai.py
+                audio_bytes, actual_mime_type = await generate_gemini_tts(text, language)
+                tts_store.put(digest, audio_bytes, actual_mime_type)
+
+            # Identical concurrent requests share one synthesis call
+            await tts_flight.do(digest, _synthesize)
+            blob = tts_store.get(digest)
+            if blob is None:
+                raise RuntimeError("Synthesized audio missing from TTS store")
+
+        blob_path, actual_mime_type, _ = blob
         # Use the actual mime type (e.g., 'audio/wav') instead of hardcoding mp3!
-        return Response(content=audio_bytes, media_type=actual_mime_type)
+        # FileResponse streams from disk and answers Range requests itself
+        return FileResponse(blob_path, media_type=actual_mime_type, headers=cache_headers)
+    except Overloaded as e:
+        raise _service_unavailable(e)
     except Exception as e:
-        logger.error(f"TTS Error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate audio")
\ No newline at end of file
+        logger.error("TTS Error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to generate audio")
+
+# 7. STATS (Coalescing / Cache Counters)
+@app.get("/api/stats")
+async def api_stats():
+    """Reports hit / coalesced / miss counts for the single-flight layers, plus startup timings."""
+    return {
+        "status": "success",
+        "single_flight": {
+            flight.name: flight.snapshot()
+            for flight in (analogy_flight, live_flight, audio_translate_flight, audio_analogy_flight, tts_flight)
+        },
+        "saved_words_cache": words.snapshot(),
+        "save_queue": save_queue.snapshot(),
+        "fuzzy_cache": slang_index.snapshot() if slang_index else None,
+        "prefetch": prefetcher.snapshot() if prefetcher else None,
+        "model_resilience": resilience.snapshot(),
+        "hedging": resilience.hedge_snapshot(),
+        "scheduler": scheduler.snapshot(),
+        "startup_ms": startup.report(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    """Prometheus scrape endpoint: route and model latencies, token usage, cache and upload counters (this worker)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,56 @@
+"""
+Imports the legacy `cache_data/*.json` files into the SQLite cache backend.
+
+Usage (from the server/ directory):
+    python migrate_cache.py                 # import, keep the JSON files
+    python migrate_cache.py --delete        # import, then remove imported files
+    python migrate_cache.py --db other.db   # import into a different database file
+
+Afterwards set CACHE_BACKEND=sqlite in .env.
+Re-running is safe: entries are upserted by hash.
+"""
+import os
+import time
+import argparse
+from core.client import CACHE_DIR
+from core.cache import CACHE_DB_FILE
+from core.cache_backends import DirectoryBackend, SQLiteBackend
+
+
+def migrate(db_file, batch_size, delete):
+    source = DirectoryBackend(CACHE_DIR)
+    target = SQLiteBackend(os.path.join(CACHE_DIR, db_file))
+
+    started = time.time()
+    imported = 0
+    batch = []
+
+    def flush():
+        nonlocal imported
+        target.import_rows(batch)
+        if delete:
+            for file_hash, _, _, _ in batch:
+                source.delete(file_hash)
+        imported += len(batch)
+        print(f"   ... {imported} entries imported")
+        batch.clear()
+
+    for row in source.iter_entries():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.time() - started
+    print(f"✅ Migrated {imported} entries into {target.db_path} in {elapsed:.1f}s "
+          f"({target.total_bytes()} bytes of compact JSON)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import cache_data/*.json into the SQLite cache backend.")
+    parser.add_argument("--db", default=CACHE_DB_FILE, help="Database file name inside cache_data/")
+    parser.add_argument("--batch", type=int, default=500, help="Entries per transaction")
+    parser.add_argument("--delete", action="store_true", help="Delete each JSON file once it is imported")
+    args = parser.parse_args()
+    migrate(args.db, args.batch, args.delete)
@@ -0,0 +1,198 @@
+"""
+Pre-generates /generate_analogy cache entries for a slang corpus, so the
+first real request for a trending term is a cache hit instead of a cold
+model call.
+
+Every term is generated for every generation x vibe (core/ai.py GENERATIONS,
+VIBES) x language (LANG_MAP). Entries go through the same keys, two-stage
+generation and cross-worker locks as the server, so it is safe to run next
+to live workers. Keys that are already fresh in the cache are skipped.
+
+Work is resumable: each finished term x language is appended to a
+checkpoint file, and a re-run picks up where the last one stopped. After
+adding generations, vibes or languages, re-run with --restart: finished
+keys are still skipped, only the new personas are generated.
+
+Usage (from the server/ directory):
+    python prewarm_cache.py trending.txt                  # one term per line, '#' comments
+    python prewarm_cache.py trending.txt --workers 8 --rps 4
+    python prewarm_cache.py trending.txt --languages en,ms --vibes "Manglish,Penang Hokkien"
+    python prewarm_cache.py trending.txt --restart        # ignore the checkpoint
+"""
+import os
+import time
+import asyncio
+import argparse
+
+import main as server
+from core.ai import GENERATIONS, VIBES, LANG_MAP
+from core.cache import FRESH
+from core.resilience import is_fallback
+
+
+class RateLimiter:
+    """Spaces model calls at most `rate` per second across all workers."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Checkpoint:
+    """Append-only list of finished term x language units."""
+
+    def __init__(self, path, restart):
+        self.path = path
+        self.done = set()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def mark(self, unit):
+        self.done.add(unit)
+        self._file.write(unit + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_corpus(path):
+    """Distinct terms in file order, skipping blank lines and '#' comments."""
+    terms = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            term = line.strip()
+            if term and not term.startswith("#"):
+                terms.setdefault(server._slang_term(term), term)
+    return list(terms.values())
+
+
+class Progress:
+    def __init__(self, units, keys_per_unit):
+        self.units = units
+        self.keys_per_unit = keys_per_unit
+        self.started = time.monotonic()
+        self.counts = {"units": 0, "generated": 0, "cached": 0, "failed": 0}
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        c = self.counts
+        rate = c["generated"] / elapsed if elapsed else 0
+        remaining = (self.units - c["units"]) * self.keys_per_unit
+        eta = f"{remaining / rate:,.0f}s" if rate else "-"
+        return (f"   ... {c['units']}/{self.units} terms x languages | {c['generated']} generated, "
+                f"{c['cached']} already cached, {c['failed']} failed | {rate:.2f} entries/s | ETA {eta}")
+
+
+async def warm_unit(term, language, personas, limiter, progress):
+    """
+    Fills every persona of one term x language. Personas run in order, so the
+    first generation caches the core meaning and the rest only need the
+    short persona prompt. Returns True if every key ended up cached.
+    """
+    complete = True
+    for generation, vibe in personas:
+        d = server.AnalogyInput(slang_text=term, user_generation=generation, user_vibe=vibe, preferred_language=language)
+        key = server._analogy_key(d)
+        if server.cache.lookup(key)[1] == FRESH:
+            progress.counts["cached"] += 1
+            continue
+        async with server.cache.generation_lock(key) as locked:
+            if locked and server.cache.lookup(key)[1] == FRESH:
+                progress.counts["cached"] += 1  # A live worker just generated it
+                continue
+            await limiter.wait()
+            card = await server._produce_analogy(d)
+            if is_fallback(card):
+                progress.counts["failed"] += 1
+                complete = False
+                continue
+            server.cache.set(key, card)
+        server._index_analogy(d, card)
+        progress.counts["generated"] += 1
+    return complete
+
+
+async def run(args):
+    terms = read_corpus(args.corpus)
+    generations = args.generations.split(",") if args.generations else GENERATIONS
+    vibes = args.vibes.split(",") if args.vibes else VIBES
+    languages = args.languages.split(",") if args.languages else list(LANG_MAP)
+    personas = [(g.strip(), v.strip()) for g in generations for v in vibes]
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.corpus}.checkpoint", args.restart)
+    units = [(t, lang) for t in terms for lang in languages if f"{server._slang_term(t)}|{lang}" not in checkpoint.done]
+    skipped = len(terms) * len(languages) - len(units)
+    print(f"🔥 Pre-warming {len(terms)} terms x {len(personas)} personas x {len(languages)} languages "
+          f"({len(units)} term x language units to go, {skipped} done in an earlier run)")
+
+    limiter = RateLimiter(args.rps)
+    progress = Progress(len(units), len(personas))
+    queue = asyncio.Queue()
+    for unit in units:
+        queue.put_nowait(unit)
+
+    async def worker():
+        while True:
+            try:
+                term, language = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                if await warm_unit(term, language, personas, limiter, progress):
+                    checkpoint.mark(f"{server._slang_term(term)}|{language}")
+            except Exception as e:
+                progress.counts["failed"] += 1
+                print(f"⚠ {term!r} ({language}) failed: {e}")
+            progress.counts["units"] += 1
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_every)
+            print(progress.line())
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, args.workers))))
+    finally:
+        reporter.cancel()
+        checkpoint.close()
+
+    elapsed = time.monotonic() - progress.started
+    print(progress.line())
+    print(f"✅ Done in {elapsed:,.1f}s")
+    return progress.counts["failed"] == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate /generate_analogy cache entries for a slang corpus.")
+    parser.add_argument("corpus", help="file of slang terms, one per line")
+    parser.add_argument("--generations", default="", help="comma-separated generations (default: core/ai.py GENERATIONS)")
+    parser.add_argument("--vibes", default="", help="comma-separated vibes (default: core/ai.py VIBES)")
+    parser.add_argument("--languages", default="", help="comma-separated language codes (default: every LANG_MAP key)")
+    parser.add_argument("--workers", type=int, default=4, help="term x language units worked on at once (default: 4)")
+    parser.add_argument("--rps", type=float, default=2, help="max generations started per second, 0 = unlimited (default: 2)")
+    parser.add_argument("--checkpoint", help="progress file (default: <corpus>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start over")
+    parser.add_argument("--report-every", type=float, default=10, help="seconds between progress lines (default: 10)")
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
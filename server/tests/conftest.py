@@ -0,0 +1,34 @@
+import os
+import sys
+import atexit
+import shutil
+import asyncio
+import tempfile
+import httpx
+import pytest
+
+# Tests import `core` the way main.py does, and never reach Gemini or Firestore
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("FIRESTORE_BACKEND", "fake")
+os.environ.setdefault("FAKE_MODEL_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_FIRESTORE_LATENCY_MS", "0")
+os.environ.setdefault("STARTUP_WARMUP", "0")
+# A throwaway cache, TTS store and save spool for the whole run
+if not os.getenv("CACHE_DIR"):
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="verbabridge-tests-")
+    atexit.register(shutil.rmtree, os.environ["CACHE_DIR"], ignore_errors=True)
+
+
+@pytest.fixture
+def call_app():
+    """Runs `fn(client)` against main.app, lifespan included, and returns what it returns."""
+    import main
+
+    def run(fn):
+        async def go():
+            async with main.lifespan(main.app):
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+                    return await fn(client)
+        return asyncio.run(go())
+    return run
@@ -0,0 +1,77 @@
+import uuid
+import pytest
+import main
+from core.ai import CORE_FIELDS, core_meaning
+from core.resilience import Fallback
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Records which prompt (full or persona) each analogy generation used."""
+    used = []
+    for name, kind in (("generate_analogy", "full"), ("generate_persona_analogy", "persona"),
+                       ("stream_analogy", "full"), ("stream_persona_analogy", "persona")):
+        def record(*args, _real=getattr(main, name), _kind=kind, **kwargs):
+            used.append(_kind)
+            return _real(*args, **kwargs)
+        monkeypatch.setattr(main, name, record)
+    return used
+
+
+def _request(slang, generation="Gen Z", vibe="chill", language="en"):
+    return {"slang_text": slang, "user_generation": generation, "user_vibe": vibe, "preferred_language": language}
+
+
+def test_core_meaning_keeps_only_persona_independent_fields():
+    card = {"slang_detected": "rizz", "literal_translation": "charm", "analogies": ["..."]}
+    assert core_meaning(card) == {"slang_detected": "rizz", "literal_translation": "charm", "ambiguity_warning": None}
+    assert set(core_meaning(card)) == set(CORE_FIELDS)
+
+
+def test_other_personas_reuse_the_core_meaning(call_app, prompts):
+    slang = f"rizz {uuid.uuid4().hex}"
+
+    async def fn(client):
+        cards = []
+        for body in (_request(slang), _request(slang, "Boomer", "formal"), _request(slang.upper(), "Gen X"),
+                     _request(slang, language="zh")):
+            cards.append((await client.post("/generate_analogy", json=body)).json())
+        return cards
+
+    first, boomer, gen_x, chinese = call_app(fn)
+    assert prompts == ["full", "persona", "persona", "full"]  # A new language needs its own core
+    assert core_meaning(boomer) == core_meaning(gen_x) == core_meaning(first)
+    assert all(card["source"] == "gemini" for card in (first, boomer, gen_x, chinese))
+
+
+def test_streamed_analogy_seeds_and_reuses_the_core(call_app, prompts):
+    slang = f"mid {uuid.uuid4().hex}"
+
+    async def fn(client):
+        for body in (_request(slang), _request(slang, "Boomer")):
+            async with client.stream("POST", "/generate_analogy_stream", json=body) as response:
+                async for _ in response.aiter_lines():
+                    pass
+        return (await client.post("/generate_analogy", json=_request(slang, "Gen X"))).json()
+
+    card = call_app(fn)
+    assert prompts == ["full", "persona", "persona"]
+    assert card["slang_detected"]
+
+
+def test_a_fallback_does_not_seed_the_core(call_app, prompts, monkeypatch):
+    slang = f"bussin {uuid.uuid4().hex}"
+    real = main.generate_analogy
+
+    async def failing(*args):
+        return Fallback(slang_detected="?")
+
+    monkeypatch.setattr(main, "generate_analogy", failing)
+
+    async def fn(client):
+        await client.post("/generate_analogy", json=_request(slang))
+        monkeypatch.setattr(main, "generate_analogy", real)
+        return (await client.post("/generate_analogy", json=_request(slang, "Boomer"))).json()
+
+    assert call_app(fn)["source"] == "gemini"
+    assert prompts == ["full"]  # The second request ran the full prompt again, not the persona one
@@ -0,0 +1,57 @@
+import os
+import uuid
+from core.audio_store import AudioBlobStore
+
+
+def test_put_get_round_trip(tmp_path):
+    store = AudioBlobStore(str(tmp_path))
+    digest = AudioBlobStore.key_for("hello", "Aoede", "tts-model")
+    assert digest != AudioBlobStore.key_for("hello", "Puck", "tts-model")
+    assert store.get(digest) is None
+
+    store.put(digest, b"\x01\x02\x03", "audio/wav")
+    path, mime_type, size = store.get(digest)
+    assert (mime_type, size) == ("audio/wav", 3)
+    with open(path, 'rb') as f:
+        assert f.read() == b"\x01\x02\x03"
+    assert AudioBlobStore(str(tmp_path)).total_bytes == 3
+
+
+def test_evicts_least_recently_served_outside_the_grace_window(tmp_path):
+    store = AudioBlobStore(str(tmp_path), max_bytes=250)
+    for i, name in enumerate(["old", "served", "recent"]):
+        store.put(name, bytes(100 - i), "audio/wav")
+    an_hour_ago = os.path.getmtime(tmp_path / "old.bin") - 3600
+    for name in ("old", "served"):
+        os.utime(tmp_path / f"{name}.bin", (an_hour_ago, an_hour_ago))
+    store.get("served")  # A hit makes it recently used again
+
+    store.put("new", bytes(80), "audio/wav")
+    assert store.get("old") is None and not os.path.exists(tmp_path / "old.json")
+    assert all(store.get(name) for name in ("served", "recent", "new"))
+    assert store.total_bytes == 99 + 98 + 80
+
+
+def test_tts_etag_range_and_replay(call_app):
+    text = f"hello {uuid.uuid4().hex}"
+
+    async def fn(client):
+        params = {"text": text, "language": "en"}
+        first = await client.get("/api/tts", params=params)
+        etag = first.headers["etag"]
+        stats = (await client.get("/api/stats")).json()
+        hits_before = stats["single_flight"]["tts"]["hit"]
+
+        again = await client.get("/api/tts", params=params)
+        not_modified = await client.get("/api/tts", params=params, headers={"If-None-Match": etag})
+        ranged = await client.get("/api/tts", params=params, headers={"Range": "bytes=10-19"})
+        stats = (await client.get("/api/stats")).json()
+        return first, again, not_modified, ranged, stats["single_flight"]["tts"]["hit"] - hits_before
+
+    first, again, not_modified, ranged, hits = call_app(fn)
+    assert first.status_code == 200 and first.content
+    assert first.headers["content-type"].startswith("audio/")
+    assert again.content == first.content and again.headers["etag"] == first.headers["etag"]
+    assert not_modified.status_code == 304 and not not_modified.content
+    assert ranged.status_code == 206 and ranged.content == first.content[10:20]
+    assert hits == 3  # Replays came from the store, not the model
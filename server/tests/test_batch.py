@@ -0,0 +1,93 @@
+import uuid
+import pytest
+import main
+from core.client import unpack_batch
+
+
+def test_unpack_batch_maps_ids_back_to_input_order():
+    payload = {"results": [{"id": 2, "v": "c"}, {"id": "0", "v": "a"}, {"id": 9, "v": "?"}, {"v": "no id"}]}
+    assert unpack_batch(payload, 3) == [{"v": "a"}, None, {"v": "c"}]
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """Records the texts of each live_translate_batch call; texts containing "boom" fail their call."""
+    calls = []
+    real = main.live_translate_batch
+
+    async def live_translate_batch(texts, *group):
+        calls.append((group, list(texts)))
+        if any("boom" in text for text in texts):
+            raise RuntimeError("model down")
+        return await real(texts, *group)
+
+    monkeypatch.setattr(main, "live_translate_batch", live_translate_batch)
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 2)
+    return calls
+
+
+def test_live_batch_packs_misses_into_few_calls(call_app, model_calls):
+    tag = uuid.uuid4().hex
+    cached, new = f"cached {tag}", [f"new {i} {tag}" for i in range(3)]
+    items = [
+        {"text": new[0], "user_vibe": "chill"},
+        {"text": cached, "user_vibe": "chill"},
+        {"text": new[1], "user_vibe": "chill"},
+        {"text": f"  {new[0]}  ".replace(" ", "  "), "user_vibe": "chill"},  # Same key as item 0 once normalized
+        {"text": new[2], "user_vibe": "chill"},
+        {"text": new[0], "user_vibe": "formal"},  # Different prompt parameters: own call
+    ]
+
+    async def fn(client):
+        await client.post("/live_translate_batch", json={"items": [items[1]]})
+        model_calls.clear()
+        return (await client.post("/live_translate_batch", json={"items": items})).json()
+
+    body = call_app(fn)
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert all(r["status"] == "success" for r in results)
+    assert [r["source"] for r in results] == ["gemini", "cache", "gemini", "gemini", "gemini", "gemini"]
+    assert results[3] == {**results[0], "index": 3}
+    assert sorted(model_calls) == [
+        (("chill", "en"), [new[0], new[1]]),
+        (("chill", "en"), [new[2]]),
+        (("formal", "en"), [new[0]]),
+    ]
+
+
+def test_a_failed_chunk_only_fails_its_items(call_app, model_calls):
+    tag = uuid.uuid4().hex
+    items = [{"text": f"{word} {tag}", "user_vibe": "chill"} for word in ("ok one", "ok two", "boom", "ok three")]
+
+    async def fn(client):
+        return (await client.post("/live_translate_batch", json={"items": items})).json()
+
+    statuses = [r["status"] for r in call_app(fn)["results"]]
+    assert statuses == ["success", "success", "error", "error"]  # Chunks of 2: [0, 1] and [2, 3]
+
+
+def test_analogy_batch_rejects_oversized_batches(call_app, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    item = {"slang_text": "rizz", "user_generation": "Gen Z", "user_vibe": "chill"}
+
+    async def fn(client):
+        return await client.post("/generate_analogy_batch", json={"items": [item] * 3})
+
+    assert call_app(fn).status_code == 400
+
+
+def test_analogy_batch_results_are_cached_for_single_requests(call_app):
+    items = [
+        {"slang_text": f"{word} {uuid.uuid4().hex}", "user_generation": "Gen Z", "user_vibe": "chill"}
+        for word in ("rizz", "mid")
+    ]
+
+    async def fn(client):
+        batch = (await client.post("/generate_analogy_batch", json={"items": items})).json()
+        single = (await client.post("/generate_analogy", json=items[1])).json()
+        return batch, single
+
+    batch, single = call_app(fn)
+    assert [r["source"] for r in batch["results"]] == ["gemini", "gemini"]
+    assert single["source"] == "cache"
@@ -0,0 +1,62 @@
+import time
+import asyncio
+from core.resilience import CircuitBreaker, ModelGuard, CLOSED, OPEN, HALF_OPEN
+
+
+def test_opens_after_consecutive_failures_then_probes():
+    breaker = CircuitBreaker(failures=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # The probe
+    assert breaker.state == HALF_OPEN and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.consecutive == 0 and breaker.allow()
+
+
+def test_server_retry_after_extends_cooldown():
+    breaker = CircuitBreaker(failures=1, cooldown=0.01)
+    breaker.record_failure(wait=5)
+    time.sleep(0.02)
+    assert not breaker.allow()
+
+
+def test_probe_cancelled_while_queued_reopens_instead_of_wedging():
+    async def main():
+        guard = ModelGuard("test-model")
+        guard.limiter.limit = 1
+        holding, done = asyncio.Event(), asyncio.Event()
+
+        async def hold():
+            async with guard.slot():
+                holding.set()
+                await done.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await holding.wait()
+
+        guard.breaker.state, guard.breaker.open_until = OPEN, 0.0
+        probe = asyncio.ensure_future(guard.slot().__aenter__())
+        await asyncio.sleep(0)
+        assert guard.breaker.state == HALF_OPEN and guard.limiter.queued == 1
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        state_after_cancel = guard.breaker.state
+        next_caller_allowed = guard.breaker.allow()
+        done.set()
+        await holder
+        return state_after_cancel, next_caller_allowed, guard.limiter
+
+    state, allowed, limiter = asyncio.run(main())
+    assert state == OPEN
+    assert allowed
+    assert limiter.in_flight == 0 and limiter.queued == 0
@@ -0,0 +1,104 @@
+import time
+import types
+import uuid
+import pytest
+from core import cache as cache_module, metrics
+from core.cache import FileSystemCache, MemoryLRU, FRESH, STALE
+
+
+def _key(name):
+    return f"{name}|{uuid.uuid4().hex}"
+
+
+def _requests():
+    return dict(metrics.CACHE_REQUESTS._values)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """A private CACHE_DIR, so size caps and eviction only see this test's entries."""
+    monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Shifts the cache's view of time; advance with clock.skip(seconds)."""
+    offset = [0.0]
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(time=lambda: time.time() + offset[0]))
+    return types.SimpleNamespace(skip=lambda seconds: offset.__setitem__(0, offset[0] + seconds))
+
+
+def test_memory_tier_evicts_least_recently_used():
+    lru = MemoryLRU(max_entries=2, max_bytes=100)
+    forever = (0, float("inf"), float("inf"))
+    lru.set("a", 1, 10, *forever)
+    lru.set("b", 2, 10, *forever)
+    assert lru.get("a") == (1, FRESH)  # "b" is now the oldest
+    lru.set("c", 3, 10, *forever)
+    assert lru.get("b") == (None, None)
+    assert len(lru) == 2
+
+    lru.set("big", 4, 95, *forever)  # Over the byte budget together with anything else
+    assert lru.get("a") == lru.get("c") == (None, None)
+    assert lru.get("big") == (4, FRESH)
+    lru.set("huge", 5, 101, *forever)  # Larger than the whole tier: never stored
+    assert lru.get("huge") == (None, None)
+    assert lru.total_bytes == 95
+
+
+@pytest.mark.parametrize("memory_entries", [16, 0], ids=["memory", "disk"])
+def test_entries_go_stale_then_expire(cache_dir, clock, memory_entries):
+    cache = FileSystemCache(ttl=60, stale_ttl=30, memory_entries=memory_entries)
+    cache.set("ttl", {"v": 1})
+    assert cache.peek("ttl") == ({"v": 1}, FRESH)
+
+    clock.skip(70)
+    assert cache.peek("ttl") == ({"v": 1}, STALE)  # Served while the caller revalidates
+    assert not cache.contains("ttl")
+
+    clock.skip(30)
+    assert cache.peek("ttl") == (None, None)
+    assert not list(cache.backend.iter_hashes())  # Expired entries are removed from disk too
+
+
+def test_without_a_ttl_entries_never_expire(cache_dir, clock):
+    cache = FileSystemCache(ttl=0, memory_entries=0)
+    cache.set("forever", {"v": 1})
+    clock.skip(10 * 365 * 86400)
+    assert cache.peek("forever") == ({"v": 1}, FRESH)
+
+
+def test_disk_cap_evicts_oldest_entries(cache_dir):
+    cache = FileSystemCache(max_disk_bytes=1000, memory_entries=0)
+    payload = {"text": "x" * 180}
+    for i in range(8):
+        cache.set(f"entry {i}", payload)
+        time.sleep(0.01)  # Distinct mtimes, which order the eviction
+    assert cache.disk_bytes <= 1000
+    assert cache.peek("entry 0") == (None, None)
+    assert cache.peek("entry 7") == (payload, FRESH)
+
+
+def test_contains_is_not_counted_as_a_cache_request():
+    cache = FileSystemCache(memory_entries=0)
+    key = _key("probe")
+    before = _requests()
+    assert not cache.contains(key)
+    cache.set(key, {"v": 1})
+    assert cache.contains(key)
+    assert _requests() == before
+
+    assert cache.lookup(key) == ({"v": 1}, FRESH)
+    assert _requests()[("fresh",)] == before.get(("fresh",), 0) + 1
+
+
+def test_a_generated_miss_counts_once(call_app):
+    async def fn(client):
+        before = _requests()
+        response = await client.post("/live_translate", json={"text": _key("hi bro"), "user_vibe": "chill"})
+        return response.json()["source"], before, _requests()
+
+    source, before, after = call_app(fn)
+    assert source == "gemini"
+    assert after[("miss",)] == before.get(("miss",), 0) + 1
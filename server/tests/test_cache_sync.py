@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import uuid
+import pytest
+from multiprocessing import resource_tracker
+from core import cache as cache_module
+from core.cache import FileSystemCache, FRESH
+from core.cache_sync import KeyLocks, SharedIndex
+
+
+def _hash(text):
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def _unlink(index):
+    # SharedIndex leaves the segment to outlive its process; hand it back to the tracker to remove it
+    resource_tracker.register(index.shm._name, "shared_memory")
+    index.shm.unlink()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def make_index(tmp_path):
+    name = f"vb_test_{uuid.uuid4().hex[:12]}"
+    indexes = []
+
+    def make(slots=64):
+        index = SharedIndex(name, slots, str(tmp_path / "index.lock"), str(tmp_path / "index.owners"))
+        indexes.append(index)
+        return index
+
+    yield make
+    _unlink(indexes[0])
+
+
+def test_held_key_lock_times_out_and_other_keys_pass(tmp_path):
+    # flock() locks belong to an open file, so two opens conflict even inside one process
+    locks = KeyLocks(str(tmp_path), "generate", stripe_chars=4)
+
+    async def run():
+        async with locks.hold_async("abcd0000", timeout=5) as first:
+            async with locks.hold_async("abcd1111", timeout=0.1) as same_stripe:
+                pass
+            async with locks.hold_async("beef0000", timeout=0.1) as other_stripe:
+                pass
+            async with KeyLocks(str(tmp_path), "write").hold_async("abcd0000", timeout=0.1) as other_namespace:
+                pass
+        async with locks.hold_async("abcd0000", timeout=0.1) as after_release:
+            pass
+        return first, same_stripe, other_stripe, other_namespace, after_release
+
+    assert asyncio.run(run()) == (True, False, True, True, True)
+
+
+def test_shared_index_put_get_remove(make_index):
+    index = make_index(slots=8)
+    assert index.needs_build
+    hashes = [_hash(str(i)) for i in range(6)]  # Dense enough to collide in 8 slots
+    index.put_many((h, 1000.0 + i) for i, h in enumerate(hashes))
+    index.mark_ready()
+    assert [index.get(h) for h in hashes] == [1000.0 + i for i in range(6)]
+
+    index.remove(hashes[0])
+    assert index.get(hashes[0]) is None
+    assert [index.get(h) for h in hashes[1:]] == [1000.0 + i for i in range(1, 6)]  # Probe chains intact
+    index.put(hashes[0], 2000.0)
+    assert index.get(hashes[0]) == 2000.0
+    assert index.get(_hash("never written")) is None
+
+
+def test_second_worker_attaches_without_rebuilding(make_index):
+    first = make_index()
+    first.put(_hash("a"), 1000.0)
+    first.mark_ready()
+    first.release_build_lock()
+
+    second = make_index()
+    assert not second.needs_build and second.ready
+    assert second.get(_hash("a")) == 1000.0
+
+
+def test_full_index_stops_proving_misses(make_index):
+    index = make_index(slots=4)
+    index.mark_ready()
+    index.put_many((_hash(str(i)), 1000.0) for i in range(5))
+    assert not index.ready
+
+
+def test_workers_see_each_others_writes(cache_dir):
+    here = FileSystemCache(shared_index=True)
+    there = FileSystemCache(shared_index=True)
+    try:
+        here.set("word", {"v": 1})
+        assert there.peek("word") == ({"v": 1}, FRESH)  # Now in there's memory tier
+        here.set("word", {"v": 2})
+        assert there.peek("word") == ({"v": 2}, FRESH)  # Outdated memory copy dropped
+
+        here._delete_from_disk(here._get_hash("word"))
+        assert there.peek("word") == (None, None)
+    finally:
+        _unlink(here.index)
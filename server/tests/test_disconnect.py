@@ -0,0 +1,78 @@
+import json
+import uuid
+import asyncio
+import pytest
+import main
+
+
+async def _post(path, payload, disconnect_after=None):
+    """Calls the app directly over ASGI; the client hangs up `disconnect_after` seconds in. Returns the status."""
+    body = json.dumps(payload).encode()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    await main.app(scope, receive, send)
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """live_translate takes 0.2s; records how each call ended."""
+    outcomes = []
+    real = main.live_translate
+
+    async def live_translate(*args):
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            outcomes.append("cancelled")
+            raise
+        outcomes.append("finished")
+        return await real(*args)
+
+    monkeypatch.setattr(main, "live_translate", live_translate)
+    return outcomes
+
+
+def _run(coro_fn):
+    async def go():
+        async with main.lifespan(main.app):
+            return await coro_fn()
+    return asyncio.run(go())
+
+
+def test_client_that_hangs_up_gets_499_and_the_call_is_cancelled(slow_model):
+    payload = {"text": f"no cap {uuid.uuid4().hex}", "user_vibe": "chill"}
+    assert _run(lambda: _post("/live_translate", payload, disconnect_after=0.05)) == main.CLIENT_CLOSED_REQUEST
+    assert slow_model == ["cancelled"]
+
+
+def test_a_coalesced_call_survives_one_caller_hanging_up(slow_model):
+    payload = {"text": f"no cap {uuid.uuid4().hex}", "user_vibe": "chill"}
+
+    async def both():
+        return await asyncio.gather(
+            _post("/live_translate", payload, disconnect_after=0.05),
+            _post("/live_translate", payload),
+        )
+
+    assert _run(both) == [main.CLIENT_CLOSED_REQUEST, 200]
+    assert slow_model == ["finished"]
@@ -0,0 +1,32 @@
+import main
+from core.fuzzy import normalize_text, is_variant
+
+
+def _key(slang):
+    return main._analogy_key(main.AnalogyInput(slang_text=slang, user_generation="Gen Z", user_vibe="chill"))
+
+
+def test_normalize_folds_letter_elongation_and_punctuation():
+    assert normalize_text("  RIZZ ?") == normalize_text("Rizz!!") == normalize_text("rizzz") == "rizz"
+    assert normalize_text("ｒｉｚｚ") == "rizz"
+
+
+def test_digit_runs_are_not_folded():
+    assert normalize_text("888") == "888"
+    assert normalize_text("6666") == "6666"
+    assert _key("888") != _key("88")
+    assert _key("666") != _key("66")
+
+
+def test_punctuation_only_input_keeps_its_own_key():
+    assert normalize_text("???") == ""
+    assert _key("???") != _key("!!!")
+    assert _key("???") == _key(" ??? ")
+    assert main._core_key(main.AnalogyInput(slang_text="!!!", user_generation="Gen Z", user_vibe="chill")) == "core|!!!|en"
+
+
+def test_variants_need_same_words_and_numbers():
+    assert is_variant("sigma male", "sigma males", 1)
+    assert not is_variant("sigma male", "sigma female", 1)
+    assert not is_variant("no cap", "no cap fr", 1)
+    assert not is_variant("520", "521", 1)
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from core import resilience
+from core.resilience import DeadlineExceeded, Hedger, ModelGuard, within_deadline
+
+
+def _warmed_up(latency=0.01):
+    hedger = Hedger("test")
+    hedger.latencies.extend([latency] * resilience.MODEL_HEDGE_MIN_SAMPLES)
+    return hedger
+
+
+def _calls(*latencies, error=None):
+    """fn for Hedger.run: the n-th call sleeps latencies[n], then returns n (or raises `error`)."""
+    started, cancelled = [], []
+
+    async def fn():
+        n = len(started)
+        started.append(n)
+        try:
+            await asyncio.sleep(latencies[n])
+        except asyncio.CancelledError:
+            cancelled.append(n)
+            raise
+        if error:
+            raise error
+        return n
+
+    return fn, started, cancelled
+
+
+def test_no_hedging_until_there_is_enough_history():
+    hedger = Hedger("test")
+    assert hedger.delay() is None
+    hedger.latencies.extend([0.1] * (resilience.MODEL_HEDGE_MIN_SAMPLES - 1))
+    assert hedger.delay() is None
+    hedger.latencies.extend([0.1] * 18 + [5.0, 9.0])
+    assert hedger.delay() == 5.0  # The 95th percentile, not the worst outlier
+
+
+def test_slow_call_is_hedged_and_the_loser_cancelled():
+    hedger = _warmed_up()
+    fn, started, cancelled = _calls(5, 0)
+    assert asyncio.run(hedger.run(ModelGuard("test-model"), fn)) == 1
+    assert started == [0, 1] and cancelled == [0]
+    assert hedger.stats == {"calls": 1, "hedged": 1, "hedge_won": 1}
+
+
+def test_fast_call_is_not_hedged():
+    hedger = _warmed_up(latency=1)
+    fn, started, _ = _calls(0)
+    assert asyncio.run(hedger.run(ModelGuard("test-model"), fn)) == 0
+    assert started == [0] and hedger.stats["hedged"] == 0
+
+
+def test_hedges_stay_within_budget():
+    hedger = _warmed_up()
+    guard = ModelGuard("test-model")
+
+    async def main():
+        for _ in range(3):
+            fn, _, _ = _calls(0.05, 0)
+            await hedger.run(guard, fn)
+
+    asyncio.run(main())
+    assert hedger.stats["hedged"] == 1  # The starting token; refills at MODEL_HEDGE_MAX_RATE per call
+
+
+def test_when_every_copy_fails_the_first_error_is_raised():
+    hedger = _warmed_up()
+    fn, started, _ = _calls(0.05, 0, error=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        asyncio.run(hedger.run(ModelGuard("test-model"), fn))
+    assert started == [0, 1]
+
+
+def test_deadline_cancels_the_call():
+    fn, _, cancelled = _calls(5)
+
+    async def main():
+        await within_deadline(fn(), 0.05, "test")
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert cancelled == [0]
+    assert issubclass(DeadlineExceeded, asyncio.TimeoutError)
@@ -0,0 +1,126 @@
+import asyncio
+import uuid
+from core import scheduler
+from core.prefetch import Prefetcher
+from core.scheduler import Overloaded
+
+
+def _never_cached():
+    return False
+
+
+async def _settle(prefetcher):
+    """Lets the workers drain the queue."""
+    for _ in range(100):
+        if not prefetcher.pending:
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_offer_skips_cached_pending_and_over_budget_keys():
+    async def main():
+        prefetcher = Prefetcher(idle=lambda: True, budget_per_minute=12, queue_size=1)  # Burst of 2
+        prefetcher.offer("cached", lambda: True, None)
+        prefetcher.offer("a", _never_cached, None)
+        prefetcher.offer("a", _never_cached, None)  # Already pending
+        prefetcher.offer("b", _never_cached, None)  # Queue full: token refunded
+        prefetcher.queue.get_nowait()
+        prefetcher.offer("c", _never_cached, None)
+        prefetcher.queue.get_nowait()
+        prefetcher.offer("d", _never_cached, None)  # Budget spent
+        return prefetcher.stats
+
+    stats = asyncio.run(main())
+    assert {k: v for k, v in stats.items() if v} == {
+        "offered": 6, "already_cached": 1, "queue_full": 1, "queued": 2, "over_budget": 1,
+    }
+
+
+def test_a_request_joining_a_running_prefetch_promotes_it():
+    async def main():
+        prefetcher = Prefetcher(idle=lambda: True)
+        started, release, tickets = asyncio.Event(), asyncio.Event(), []
+
+        async def fill():
+            tickets.append(scheduler._current_class.get())
+            started.set()
+            await release.wait()
+            return True
+
+        prefetcher.start()
+        prefetcher.offer("rizz", _never_cached, fill)
+        await started.wait()
+        assert tickets[0].name == "background"
+        prefetcher.record_request("rizz")
+        release.set()
+        await _settle(prefetcher)
+        await prefetcher.close()
+        return prefetcher, tickets[0]
+
+    prefetcher, ticket = asyncio.run(main())
+    assert ticket.name is None  # Runs in its endpoint's own class from now on
+    assert prefetcher.stats["consumed"] == prefetcher.stats["generated"] == 1
+    assert "rizz" not in prefetcher.prefetched  # Already counted; a later hit isn't a second consumption
+
+
+def test_finished_prefetch_is_consumed_by_a_later_request():
+    async def main():
+        prefetcher = Prefetcher(idle=lambda: True)
+        prefetcher.start()
+
+        async def fill():
+            return True
+
+        prefetcher.offer("mid", _never_cached, fill)
+        await _settle(prefetcher)
+        await prefetcher.close()
+        generated = list(prefetcher.prefetched)
+        prefetcher.record_request("mid")
+        prefetcher.record_request("mid")
+        return prefetcher, generated
+
+    prefetcher, generated = asyncio.run(main())
+    assert generated == ["mid"]
+    assert prefetcher.stats["consumed"] == 1
+
+
+def test_jobs_expire_while_busy_and_shed_when_overloaded():
+    async def main():
+        busy = Prefetcher(idle=lambda: False, max_age=0.05)
+        busy.start()
+        busy.offer("late", _never_cached, None)
+        await _settle(busy)
+        await busy.close()
+
+        async def shed():
+            raise Overloaded("busy", 1)
+
+        overloaded = Prefetcher(idle=lambda: True)
+        overloaded.start()
+        overloaded.offer("shed", _never_cached, shed)
+        await _settle(overloaded)
+        await overloaded.close()
+        return busy.stats, overloaded.stats
+
+    busy, overloaded = asyncio.run(main())
+    assert busy["expired"] == 1 and busy["generated"] == 0
+    assert overloaded["shed"] == 1 and overloaded["failed"] == 0
+
+
+def test_live_translate_prefetches_its_highlight_words(call_app, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "prefetcher", Prefetcher(idle=lambda: True))
+    text = f"that fit is bussin {uuid.uuid4().hex}"
+
+    async def fn(client):
+        live = (await client.post("/live_translate", json={"text": text, "user_vibe": "chill", "user_generation": "Boomer"})).json()
+        await _settle(main.prefetcher)
+        word = live["highlight_words"][0]
+        card = (await client.post("/generate_analogy", json={
+            "slang_text": word, "user_generation": "Boomer", "user_vibe": "chill",
+        })).json()
+        return card, main.prefetcher.stats
+
+    card, stats = call_app(fn)
+    assert card["source"] == "cache"
+    assert stats["generated"] >= 1 and stats["consumed"] == 1
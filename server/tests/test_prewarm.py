@@ -0,0 +1,76 @@
+import uuid
+import asyncio
+import argparse
+import pytest
+import main
+import prewarm_cache
+from core.resilience import Fallback
+
+
+def _args(corpus, **overrides):
+    args = dict(corpus=str(corpus), generations="Gen Z,Boomer", vibes="chill", languages="en,ms",
+                workers=2, rps=0, checkpoint=None, restart=False, report_every=60)
+    return argparse.Namespace(**{**args, **overrides})
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    tag = uuid.uuid4().hex
+    path = tmp_path / "trending.txt"
+    path.write_text(f"# trending\nrizz {tag}\n\nRIZZ  {tag}\nmid {tag}\nboom {tag}\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Records (term, generation, language) per generated card; "boom" fails while model["down"]."""
+    state = {"calls": [], "down": True}
+    real = main._produce_analogy
+
+    async def produce(d):
+        term = d.slang_text.split()[0]
+        state["calls"].append((term, d.user_generation, d.preferred_language))
+        if term == "boom" and state["down"]:
+            return Fallback()
+        return await real(d)
+
+    monkeypatch.setattr(main, "_produce_analogy", produce)
+    return state
+
+
+def _checkpointed(corpus):
+    with open(f"{corpus}.checkpoint", encoding="utf-8") as f:
+        # Units are "<term> <tag>|<language>"
+        return sorted(f"{line.split()[0]}|{line.strip().rsplit('|', 1)[1]}" for line in f)
+
+
+def test_read_corpus_skips_comments_and_duplicates(corpus):
+    assert [term.split()[0] for term in prewarm_cache.read_corpus(str(corpus))] == ["rizz", "mid", "boom"]
+
+
+def test_rerun_resumes_after_the_finished_units(corpus, model):
+    assert not asyncio.run(prewarm_cache.run(_args(corpus)))  # "boom" failed
+    assert len(model["calls"]) == 3 * 2 * 2
+    assert _checkpointed(corpus) == ["mid|en", "mid|ms", "rizz|en", "rizz|ms"]
+
+    model["calls"].clear()
+    model["down"] = False
+    assert asyncio.run(prewarm_cache.run(_args(corpus)))
+    assert sorted(model["calls"]) == sorted((("boom", g, lang) for g in ("Gen Z", "Boomer") for lang in ("en", "ms")))
+    assert len(_checkpointed(corpus)) == 6
+
+    model["calls"].clear()
+    assert asyncio.run(prewarm_cache.run(_args(corpus)))
+    assert model["calls"] == []  # Nothing left to do
+
+
+def test_restart_only_generates_new_personas(corpus, model):
+    model["down"] = False
+    asyncio.run(prewarm_cache.run(_args(corpus, languages="en")))
+    model["calls"].clear()
+
+    assert asyncio.run(prewarm_cache.run(_args(corpus, languages="en", vibes="chill,formal", restart=True)))
+    assert sorted(model["calls"]) == sorted((term, g, "en") for term in ("rizz", "mid", "boom") for g in ("Gen Z", "Boomer"))
+    assert all(main.cache.contains(main._analogy_key(main.AnalogyInput(
+        slang_text=term, user_generation="Boomer", user_vibe="formal")))
+        for term in prewarm_cache.read_corpus(str(corpus)))
@@ -0,0 +1,80 @@
+import os
+import multiprocessing
+from core.cache_backends import RecordLog
+
+
+def test_replay_last_write_wins(tmp_path):
+    path = str(tmp_path / "map.log")
+    log = RecordLog(path)
+    log.load()
+    log.append({"a": 1, "b": {"nested": ["x"]}})
+    log.append({"a": 2})
+    log.close()
+    assert RecordLog(path).load() == {"a": 2, "b": {"nested": ["x"]}}
+
+
+def test_torn_line_is_skipped_and_log_kept(tmp_path):
+    path = str(tmp_path / "map.log")
+    log = RecordLog(path)
+    log.load()
+    log.append({"a": 1})
+    log.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"k":"torn","v')  # A crash mid-append
+
+    log = RecordLog(path)
+    assert log.load() == {"a": 1}
+    log.append({"b": 2})  # Must not be swallowed by the torn tail
+    log.close()
+    size = os.path.getsize(path)
+
+    assert RecordLog(path).load() == {"a": 1, "b": 2}
+    assert os.path.getsize(path) == size  # Replay never truncates a shared log
+
+
+def test_refresh_picks_up_other_writers(tmp_path):
+    path = str(tmp_path / "map.log")
+    reader, writer = RecordLog(path), RecordLog(path)
+    data = reader.load()
+    writer.load()
+    writer.append({"a": 1})
+    assert reader.refresh(data) and data == {"a": 1}
+    assert not reader.refresh(data)
+
+
+def _compactor(path, rounds):
+    log = RecordLog(path, compact_min_bytes=0, compact_ratio=0)
+    log.load()
+    for _ in range(rounds):
+        log._compacting = True
+        log._compact()
+
+
+def _writer(path, worker, count):
+    log = RecordLog(path)
+    log.load()
+    for i in range(count):
+        log.append({f"w{worker}-{i}": i})
+
+
+def test_concurrent_compaction_loses_no_records(tmp_path):
+    path = str(tmp_path / "map.log")
+    seed = RecordLog(path)
+    seed.load()
+    for i in range(500):
+        seed.append({f"k{i % 20}": "x" * 100 + str(i)})
+    seed.close()
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_compactor, args=(path, 10)) for _ in range(2)]
+    procs += [ctx.Process(target=_writer, args=(path, w, 300)) for w in range(2)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    assert all(p.exitcode == 0 for p in procs)
+
+    data = RecordLog(path).load()
+    assert [k for w in range(2) for i in range(300) if data.get(f"w{w}-{i}") != i] == []
+    assert all(data[f"k{j}"].endswith(str(480 + j)) for j in range(20))
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".compact")] == []
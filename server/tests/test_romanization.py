@@ -0,0 +1,48 @@
+import main
+from core.utils import fill_hokkien_romanization, romanize_many, get_hokkien_romanization
+
+
+def test_hanzi_slang_gets_a_romanization_on_a_copy():
+    card = {"slang_detected": "食飽未", "analogies": []}
+    filled = fill_hokkien_romanization(card)
+    assert filled["hokkien_romanization"] == get_hokkien_romanization("食飽未")
+    assert filled["hokkien_romanization"]
+    assert "hokkien_romanization" not in card
+
+
+def test_live_transcription_is_romanized():
+    filled = fill_hokkien_romanization({"original_transcription": "Uncle 食飽未", "translated_text": "..."})
+    assert filled["hokkien_romanization"]
+
+
+def test_latin_slang_is_left_alone():
+    assert fill_hokkien_romanization({"slang_detected": "rizz"}) == {"slang_detected": "rizz"}
+
+
+def test_legacy_translations_are_recomputed_without_mutating_the_input():
+    hokkien = {"hanzi": "目", "romanization": "wrong"}
+    card = {"results": [{"title": "Eye", "translations": {"hokkien": hokkien, "malay": {"script": "Mata"}}}]}
+    filled = fill_hokkien_romanization(card)
+    assert filled["results"][0]["translations"]["hokkien"]["romanization"] == "bak1"
+    assert filled["results"][0]["translations"]["malay"] == {"script": "Mata"}
+    assert hokkien["romanization"] == "wrong"
+
+
+def test_romanize_many_keeps_order_and_duplicates():
+    assert romanize_many(["目", "食飽未", "目"]) == [
+        get_hokkien_romanization("目"), get_hokkien_romanization("食飽未"), get_hokkien_romanization("目"),
+    ]
+
+
+def test_route_romanizes_without_touching_the_cached_card(call_app):
+    d = main.AnalogyInput(slang_text="食飽未", user_generation="Gen Z", user_vibe="Penang Hokkien")
+    key = main._analogy_key(d)
+
+    async def fn(client):
+        main.cache.set(key, {"slang_detected": "食飽未", "literal_translation": "Have you eaten?", "analogies": []})
+        return (await client.post("/generate_analogy", json=d.model_dump())).json()
+
+    body = call_app(fn)
+    assert body["source"] == "cache"
+    assert body["hokkien_romanization"] == get_hokkien_romanization("食飽未")
+    assert "hokkien_romanization" not in main.cache.get(key)
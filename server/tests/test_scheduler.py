@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from core import scheduler
+from core.scheduler import Scheduler, Overloaded
+
+
+def make(classes, capacity=100):
+    return Scheduler(classes=classes, capacity=lambda model: capacity)
+
+
+def test_backlogged_classes_share_by_weight():
+    async def main():
+        sched = make({"interactive": (3, 10, 10), "bulk": (1, 10, 10)}, capacity=1)
+        held = await sched.acquire("tts", "m")
+        order = []
+
+        async def call(endpoint):
+            slot = await sched.acquire(endpoint, "m")
+            order.append(endpoint)
+            await asyncio.sleep(0)
+            slot.release()
+
+        tasks = [asyncio.ensure_future(call(e)) for e in ["tts"] * 8 + ["live_translate"] * 8]
+        await asyncio.sleep(0)
+        held.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    # The held bulk call counts as a start: 8 starts split 3:1
+    first = (["tts"] + asyncio.run(main()))[:8]
+    assert first.count("live_translate") == 6 and first.count("tts") == 2
+
+
+def test_class_cap_queues_until_a_slot_frees():
+    async def main():
+        sched = make({"bulk": (1, 2, 10)})
+        slots = [await sched.acquire("tts", "m") for _ in range(2)]
+        third = asyncio.ensure_future(sched.acquire("tts", "m"))
+        await asyncio.sleep(0)
+        queued = (third.done(), sched.snapshot()["bulk"]["queued"], sched.classes["bulk"].in_flight)
+        slots[0].release()
+        slots[0].release()  # Idempotent
+        slots.append(await third)
+        running = sched.classes["bulk"].in_flight
+        for slot in slots[1:]:
+            slot.release()
+        return queued, running, sched
+
+    queued, running, sched = asyncio.run(main())
+    assert queued == (False, 1, 2)
+    assert running == 2
+    assert sched.classes["bulk"].in_flight == 0 and sched.in_flight == {"m": 0}
+
+
+def test_sheds_when_estimated_wait_is_too_long():
+    async def main():
+        sched = make({"interactive": (1, 1, 0.5)})
+        held = await sched.acquire("live_translate", "m")
+        sched.classes["interactive"].service_time = 2.0
+        with pytest.raises(Overloaded) as shed:
+            await sched.acquire("live_translate", "m")
+        held.release()
+        return shed.value, sched.snapshot()["interactive"]
+
+    error, stats = asyncio.run(main())
+    assert error.retry_after == 2
+    assert stats["shed"] == 1 and stats["queued"] == 0 and stats["in_flight"] == 0
+
+
+def test_expires_when_queued_past_max_wait():
+    async def main():
+        sched = make({"interactive": (1, 1, 0.05)})
+        held = await sched.acquire("live_translate", "m")
+        with pytest.raises(Overloaded):
+            await sched.acquire("live_translate", "m")
+        held.release()
+        return sched.snapshot()["interactive"]
+
+    stats = asyncio.run(main())
+    assert stats["expired"] == 1 and stats["queued"] == 0 and stats["in_flight"] == 0
+
+
+def test_promote_moves_queued_call_to_its_endpoint_class():
+    async def main():
+        sched = make({"interactive": (8, 4, 2), "background": (1, 1, 10)})
+        blocker = await sched.acquire("live_translate", "m")
+        with scheduler.traffic_class("background") as ticket:
+            first = await sched.acquire("generate_analogy", "m")
+            waiting = asyncio.ensure_future(sched.acquire("generate_analogy", "m"))
+        await asyncio.sleep(0)
+        assert sched.snapshot()["background"]["queued"] == 1
+
+        sched.promote(ticket)
+        slot = await asyncio.wait_for(waiting, 1)
+        for held in (slot, first, blocker):
+            held.release()
+        return slot, sched
+
+    slot, sched = asyncio.run(main())
+    assert slot.cls.name == "interactive"
+    assert all(cls.in_flight == 0 and not cls.queue for cls in sched.classes.values())
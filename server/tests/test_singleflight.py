@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from core.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", fn) for _ in range(3)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [("result", False), ("result", True), ("result", True)]
+    assert flight.snapshot() == {**flight.stats, "in_flight": 0}
+    assert (flight.stats["miss"], flight.stats["coalesced"]) == (1, 2)
+
+
+def test_error_reaches_every_caller_and_is_not_cached():
+    calls = []
+
+    async def fails():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(flight.do("key", fails), flight.do("key", fails), return_exceptions=True)
+        assert not flight.inflight
+        with pytest.raises(ValueError):
+            await flight.do("key", fails)  # The next caller tries again
+        return results
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert len(calls) == 2
+
+
+def test_cancelled_waiter_keeps_call_for_the_others():
+    async def fn():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        impatient = asyncio.ensure_future(flight.do("key", fn))
+        patient = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return flight, await patient
+
+    flight, result = asyncio.run(main())
+    assert result == ("result", True)
+    assert flight.stats["kept"] == 1
@@ -0,0 +1,60 @@
+import os
+import pytest
+import migrate_cache
+from core import cache as cache_module
+from core.cache import FileSystemCache, FRESH
+from core.cache_backends import DirectoryBackend, SQLiteBackend
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(migrate_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_sqlite_cache_round_trip(cache_dir):
+    cache = FileSystemCache(backend="sqlite", memory_entries=0)
+    cache.set("Hello  World", {"text": "你好", "n": [1, 2]})
+    cache.set_many({"a": {"v": 1}, "b": {"v": 2}})
+
+    reopened = FileSystemCache(backend="sqlite", memory_entries=0)
+    assert reopened.peek("hello world") == ({"text": "你好", "n": [1, 2]}, FRESH)
+    assert reopened.get_many(["a", "b", "missing"]) == {"a": {"v": 1}, "b": {"v": 2}}
+    assert os.path.exists(cache_dir / cache_module.CACHE_DB_FILE)
+    assert not list(cache_dir.glob("*.json"))
+
+
+def test_sqlite_stores_compact_json_and_tracks_size(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    assert backend.write("h1", "key", {"a": [1, 2], "b": "ü"}) == len('{"a":[1,2],"b":"ü"}'.encode())
+    assert backend.write("h1", "key", {"a": 1}) == len('{"a":1}') - len('{"a":[1,2],"b":"ü"}'.encode())
+    assert backend.total_bytes() == len('{"a":1}')
+    assert backend.delete("h1") == len('{"a":1}')
+    assert backend.read("h1") is None
+
+
+def test_sqlite_evicts_oldest_first(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    backend.import_rows((f"h{i}", None, {"i": i}, 1000.0 + i) for i in range(10))
+    size = backend.total_bytes() // 10
+    removed, remaining = backend.evict(size * 4)
+    assert removed == [f"h{i}" for i in range(6)]
+    assert remaining == size * 4
+    assert sorted(h for h, _ in backend.iter_hashes()) == [f"h{i}" for i in range(6, 10)]
+
+
+@pytest.mark.parametrize("delete", [False, True])
+def test_migrate_imports_json_files_with_their_timestamps(cache_dir, delete):
+    source = DirectoryBackend(str(cache_dir))
+    for i in range(7):
+        source.write(f"hash{i}", None, {"i": i})
+        os.utime(cache_dir / f"hash{i}.json", (1000.0 + i, 1000.0 + i))
+
+    migrate_cache.migrate("migrated.db", batch_size=3, delete=delete)
+    migrate_cache.migrate("migrated.db", batch_size=3, delete=delete)  # Re-running is safe
+
+    target = SQLiteBackend(str(cache_dir / "migrated.db"))
+    assert sorted(target.iter_hashes()) == [(f"hash{i}", 1000.0 + i) for i in range(7)]
+    assert target.read("hash3")[0] == {"i": 3}
+    assert bool(list(cache_dir.glob("*.json"))) is not delete
@@ -0,0 +1,46 @@
+import json
+from core.stream import JsonFieldStream, sse
+
+DOC = {
+    "original": 'say "no cap", {really}',
+    "score": 0.75,
+    "meta": {"tags": ["a", "b"], "ok": True},
+    "words": [{"w": "rizz", "n": 1}, "plain, text", 3],
+    "empty": [],
+    "last": None,
+}
+EXPECTED = [
+    ("field", "original", DOC["original"]),
+    ("field", "score", 0.75),
+    ("field", "meta", DOC["meta"]),
+    ("item", "words", 0, {"w": "rizz", "n": 1}),
+    ("item", "words", 1, "plain, text"),
+    ("item", "words", 2, 3),
+    ("field", "words", DOC["words"]),
+    ("field", "empty", []),
+    ("field", "last", None),
+]
+
+
+def _events(chunks):
+    stream = JsonFieldStream()
+    return [event for chunk in chunks for event in stream.feed(chunk)]
+
+
+def test_whole_document():
+    assert _events([json.dumps(DOC, indent=2)]) == EXPECTED
+
+
+def test_any_chunk_size_gives_the_same_events():
+    text = json.dumps(DOC, ensure_ascii=False)
+    for size in range(1, len(text) + 1):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert _events(chunks) == EXPECTED, size
+
+
+def test_escaped_quote_split_across_chunks():
+    assert _events(['{"a": "x\\', '"y"}']) == [("field", "a", 'x"y')]
+
+
+def test_sse_frame():
+    assert sse("field", {"text": "é"}) == 'event: field\ndata: {"text": "é"}\n\n'
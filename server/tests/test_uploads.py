@@ -0,0 +1,130 @@
+import io
+import wave
+import asyncio
+import hashlib
+import uuid
+import httpx
+import pytest
+from array import array
+from fastapi import FastAPI, File, Request, UploadFile
+import main
+from core import uploads
+from core.audio_prep import prepare_audio, AUDIO_SILENCE_PAD_MS
+from core.uploads import UploadLimitMiddleware, UploadRoute, digest_upload
+
+RATE = 16000
+
+
+def _wav(frames, channels=1, width=2, rate=RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    return buffer.getvalue()
+
+
+def _speech(silence_s=1.0, sound_s=0.2):
+    """Quiet, then a square wave, then quiet again, as 16-bit mono samples."""
+    quiet = [0] * int(RATE * silence_s)
+    sound = [8000 if (i // 20) % 2 else -8000 for i in range(int(RATE * sound_s))]
+    return array('h', quiet + sound + quiet)
+
+
+def _post(app, path, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def upload_app():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, paths=["/upload"], max_bytes=1000)
+    app.router.route_class = UploadRoute
+
+    @app.post("/upload")
+    async def upload(request: Request, file: UploadFile = File(...)):
+        digest, size = await digest_upload(file)
+        return {"digest": digest, "size": size, "on_disk": file.file._rolled, "first": (await file.read(4)).hex()}
+
+    return app
+
+
+def test_declared_oversized_body_is_rejected(upload_app):
+    response = _post(upload_app, "/upload", files={"file": ("a.wav", b"x" * 2000)})
+    assert response.status_code == 413
+
+
+def test_streamed_oversized_body_is_cut_off(upload_app):
+    request = httpx.Request("POST", "http://test/upload", files={"file": ("a.wav", b"x" * 5000)})
+    payload = request.read()
+
+    async def body():
+        for i in range(0, len(payload), 500):
+            yield payload[i:i + 500]  # No Content-Length: only counting the stream can catch it
+
+    response = _post(upload_app, "/upload", content=body(), headers={"content-type": request.headers["content-type"]})
+    assert response.status_code == 413
+
+
+def test_large_files_spool_to_disk(upload_app, monkeypatch):
+    monkeypatch.setattr(uploads._UploadParser, "spool_max_size", 100)
+    small = _post(upload_app, "/upload", files={"file": ("a.wav", b"\x01" * 50)}).json()
+    large = _post(upload_app, "/upload", files={"file": ("a.wav", b"\x02" * 500)}).json()
+    assert (small["on_disk"], large["on_disk"]) == (False, True)
+    assert large["digest"] == hashlib.sha256(b"\x02" * 500).hexdigest() and large["size"] == 500
+    assert large["first"] == "02020202"  # Rewound after hashing
+
+
+def test_wav_is_trimmed_and_downmixed():
+    mono = _speech()
+    stereo = array('h', (s for sample in mono for s in (sample, sample)))
+    prepared, mime_type = prepare_audio(_wav(stereo.tobytes(), channels=2), "audio/x-wav")
+    assert mime_type == "audio/wav"
+
+    with wave.open(io.BytesIO(prepared), 'rb') as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, RATE)
+        seconds = w.getnframes() / RATE
+    expected = 0.2 + 2 * AUDIO_SILENCE_PAD_MS / 1000
+    assert expected <= seconds <= expected + 0.02
+
+
+def test_8_bit_wav_is_understood():
+    unsigned = bytes((s >> 8) + 128 for s in _speech())
+    prepared, _ = prepare_audio(_wav(unsigned, width=1), "audio/wav")
+    with wave.open(io.BytesIO(prepared), 'rb') as w:
+        assert w.getnframes() < len(unsigned) / 2
+
+
+@pytest.mark.parametrize("audio, mime_type", [
+    (b"\x00\x00\x00\x20ftypM4A " + bytes(100), "audio/mp4"),  # Not WAV
+    (b"RIFF\x00\x00\x00\x00WAVEjunk", "audio/wav"),  # Unparsable WAV
+    (_wav(bytes(RATE * 2)), "audio/wav"),  # All quiet: nothing to trim
+])
+def test_other_audio_passes_through(audio, mime_type):
+    assert prepare_audio(audio, mime_type) == (audio, mime_type)
+
+
+def test_the_model_gets_the_trimmed_clip(call_app, monkeypatch):
+    clips = []
+    real = main.live_translate_audio
+
+    async def live_translate_audio(audio_bytes, mime_type, *args):
+        clips.append((len(audio_bytes), mime_type))
+        return await real(audio_bytes, mime_type, *args)
+
+    monkeypatch.setattr(main, "live_translate_audio", live_translate_audio)
+    samples = _speech()
+    samples[0] = uuid.uuid4().int % 400  # A clip the cache hasn't seen (still below the silence threshold)
+    clip = _wav(samples.tobytes())
+
+    async def fn(client):
+        return await client.post("/live_translate_audio", data={"user_vibe": "chill"},
+                                 files={"file": ("clip.wav", clip, "audio/wav")})
+
+    assert call_app(fn).status_code == 200
+    [(size, mime_type)] = clips
+    assert mime_type == "audio/wav" and size < len(clip) / 3
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import uuid
+import pytest
+from core.words import WordStore, WordVersions, InvalidCursor, encode_cursor, decode_cursor
+
+
+def test_versions_are_exact_and_shared_between_workers(tmp_path):
+    path = str(tmp_path / "versions.log")
+    here, there = WordVersions(path), WordVersions(path)
+    here.bump("UserA")
+    assert there.get("UserA") == here.get("UserA") > 0
+    assert there.get("usera") == 0  # Firebase UIDs are case-sensitive
+    assert WordVersions(path).get("UserA") == here.get("UserA")  # Survives a restart
+
+
+def test_bump_in_another_worker_drops_cached_pages(tmp_path):
+    path = str(tmp_path / "versions.log")
+    queries = []
+
+    class Store(WordStore):
+        async def _query(self, user_id, limit, start_after):
+            queries.append(user_id)
+            return {"words": [], "next_cursor": None}
+
+    here, there = Store(WordVersions(path)), Store(WordVersions(path))
+
+    async def main():
+        cached = [(await here.page("UserA"))[1], (await here.page("UserA"))[1]]
+        there.invalidate("UserA")
+        cached.append((await here.page("UserA"))[1])
+        return cached
+
+    assert asyncio.run(main()) == [False, True, False]
+    assert len(queries) == 2
+
+
+def test_firebase_init_runs_off_the_event_loop(monkeypatch):
+    from core import firebase
+    threads = []
+
+    def init_firebase():
+        threads.append(threading.get_ident())
+        return False
+
+    monkeypatch.setattr(firebase, "FIRESTORE_BACKEND", "firebase")
+    monkeypatch.setattr(firebase, "_async_db", None)
+    monkeypatch.setattr(firebase, "init_firebase", init_firebase)
+
+    async def run():
+        return await firebase.async_db(), threading.get_ident()
+
+    db, loop_thread = asyncio.run(run())
+    assert db is None
+    assert threads and threads[0] != loop_thread
+
+
+def test_cursor_round_trip_and_garbage():
+    cursor = encode_cursor("2026-01-02T03:04:05+00:00", "doc-1")
+    saved_at, doc_id = decode_cursor(cursor)
+    assert (saved_at.isoformat(), doc_id) == ("2026-01-02T03:04:05+00:00", "doc-1")
+    for garbage in ("", "not base64!", encode_cursor("yesterday", "x"), "e30"):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(garbage)
+
+
+def test_pages_walk_every_word_once_newest_first(tmp_path):
+    store = WordStore(WordVersions(str(tmp_path / "versions.log")))
+    user_id = f"user-{uuid.uuid4().hex}"
+    entries = [store.new_entry(user_id, f"word {i}", "lit", "analogy") for i in range(7)]
+    for i, entry in enumerate(entries):
+        # Pairs share a timestamp, so the document id has to break ties
+        entry["saved_at"] = f"2026-01-01T00:00:0{i // 2}+00:00"
+
+    async def main():
+        await store.write_batch(entries)
+        pages, cursor = [], None
+        while True:
+            page, _ = await store.page(user_id, limit=3, cursor=cursor)
+            pages.append([w["slang_word"] for w in page["words"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(main())
+    assert [len(page) for page in pages] == [3, 3, 1]
+    seen = [word for page in pages for word in page]
+    assert sorted(seen) == sorted(e["slang_word"] for e in entries)
+    assert seen[0] == "word 6" and seen[-1] in ("word 0", "word 1")
+
+
+def test_get_words_rejects_a_bad_cursor(call_app):
+    async def fn(client):
+        return await client.get("/api/get_words/someone", params={"cursor": "not a cursor"})
+
+    assert call_app(fn).status_code == 400
+
+
+def test_a_saved_word_is_listed_before_it_is_flushed(call_app):
+    user_id = f"user-{uuid.uuid4().hex}"
+    word = {"user_id": user_id, "slang_word": "rizz", "literal_translation": "charm", "successful_analogy": "..."}
+
+    async def fn(client):
+        saved = (await client.post("/api/save_word", json=word)).json()
+        listed = (await client.get(f"/api/get_words/{user_id}")).json()
+        return saved, listed
+
+    saved, listed = call_app(fn)
+    assert [w["id"] for w in listed["words"]] == [saved["id"]]
+    assert listed["words"][0]["slang_word"] == "rizz"
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from core import metrics
+from core.write_behind import WriteBehindQueue
+
+
+def _queue(tmp_path, batches, fail=False):
+    async def flush_fn(batch):
+        if fail:
+            raise RuntimeError("firestore down")
+        batches.append([entry["id"] for entry in batch])
+    return WriteBehindQueue("test_saves", flush_fn, directory=str(tmp_path), batch_size=2, interval=60)
+
+
+def _depth():
+    return metrics.WRITE_BEHIND_QUEUE_DEPTH._values[("test_saves",)]
+
+
+def _flushes(outcome):
+    series = metrics.WRITE_BEHIND_FLUSH_LATENCY._values.get(("test_saves", outcome))
+    return series[2] if series else 0
+
+
+def test_flush_batches_and_exports_depth_and_latency(tmp_path):
+    batches = []
+
+    async def main():
+        queue = _queue(tmp_path, batches)
+        await queue.start()
+        for i in range(3):
+            queue.enqueue({"id": f"e{i}"})
+        queue.enqueue({"id": "e0", "retry": True})  # Same id: overwritten, not duplicated
+        depth_before = _depth()
+        flushes_before = _flushes("ok")
+        await queue.flush()
+        result = depth_before, _depth(), _flushes("ok") - flushes_before
+        await queue.close()
+        return result
+
+    assert asyncio.run(main()) == (3, 0, 2)
+    assert batches == [["e1", "e2"], ["e0"]]
+    assert "verbabridge_write_behind_queue_depth" in metrics.render()
+
+
+def test_unflushed_entries_survive_a_restart(tmp_path):
+    batches = []
+
+    async def crash():
+        queue = _queue(tmp_path, [], fail=True)
+        await queue.start()
+        queue.enqueue({"id": "kept"})
+        with pytest.raises(RuntimeError):
+            await queue.flush()
+        failures = _flushes("error")
+        await queue.close()  # Final flush fails too: the spool is kept
+        return failures
+
+    async def restart():
+        queue = _queue(tmp_path, batches)
+        await queue.start()
+        recovered = queue.stats["recovered"]
+        await queue.close()
+        return recovered
+
+    assert asyncio.run(crash()) >= 1
+    assert asyncio.run(restart()) == 1
+    assert batches == [["kept"]]